@@ -1,17 +1,218 @@
 """Database configuration and session management."""
+import asyncio
+import os
+import secrets
+import weakref
+from typing import Callable, Iterable
+from urllib.parse import quote
+
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy import event, inspect, make_url
+from sqlalchemy.engine import URL
+from sqlalchemy.orm import DeclarativeBase, Session
+from sqlalchemy.util import await_only
 
 from app.config import settings
 
-engine = create_async_engine(settings.DATABASE_URL, echo=False)
+
+def database_url(raw: str) -> URL:
+    """``DATABASE_URL`` with the async driver filled in for a bare ``postgresql://`` / ``sqlite://``."""
+    url = make_url(raw)
+    drivers = {"postgresql": "postgresql+asyncpg", "postgres": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+    return url.set(drivername=drivers.get(url.drivername, url.drivername))
+
+
+def engine_options(url: URL) -> dict:
+    """Pool sizing for server databases; SQLite keeps SQLAlchemy's defaults."""
+    if url.get_backend_name() != "postgresql":
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "connect_args": {"prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE},
+    }
+
+
+def read_database_url(url: URL) -> URL | None:
+    """Where read-only sessions connect: ``READ_DATABASE_URL`` (e.g. a PostgreSQL replica),
+    else a SQLite database file opened with ``mode=ro``. None means the main engine."""
+    if settings.READ_DATABASE_URL:
+        return database_url(settings.READ_DATABASE_URL)
+    if url.get_backend_name() == "sqlite" and url.database and url.database != ":memory:" and not url.query.get("uri"):
+        return url.set(database=f"file:{quote(os.path.abspath(url.database))}", query={"mode": "ro", "uri": "true"})
+    return None
+
+
+_url = database_url(settings.DATABASE_URL)
+engine = create_async_engine(_url, echo=False, **engine_options(_url))
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+_read_url = read_database_url(_url)
+read_engine = engine if _read_url is None else create_async_engine(
+    _read_url, echo=False, **engine_options(_read_url),
+    **({"execution_options": {"postgresql_readonly": True}} if _read_url.get_backend_name() == "postgresql" else {}),
+)
+read_session = async_sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
+
+
+# ── SQLite: per-connection pragmas and one writer at a time ──
+#
+# WAL lets readers proceed while a write transaction is open; busy_timeout
+# makes a writer wait for another process's write lock instead of failing.
+# Within this process, write transactions also queue on an asyncio lock,
+# taken before a session's first flush or DML statement and released when
+# its transaction ends. So concurrent imports, alert sweeps and requests
+# take turns without tying up connections in SQLite's busy loop, and a long
+# import (which commits per chunk) never starves other writers for more
+# than one chunk.
+
+def _sqlite_pragmas(writable: bool):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if writable and settings.SQLITE_WAL:
+            cursor.execute("PRAGMA journal_mode=WAL")  # persistent; read-only connections inherit it
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        cursor.execute(f"PRAGMA cache_size={-int(settings.SQLITE_CACHE_SIZE_KB)}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.close()
+    return on_connect
+
+
+if engine.dialect.name == "sqlite":
+    event.listen(engine.sync_engine, "connect", _sqlite_pragmas(writable=True))
+if read_engine is not engine and read_engine.dialect.name == "sqlite":
+    event.listen(read_engine.sync_engine, "connect", _sqlite_pragmas(writable=False))
+
+_writer_locks: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()  # event loop -> asyncio.Lock
+
+
+def _serialized(session: Session) -> bool:
+    return (
+        settings.SQLITE_SERIALIZE_WRITES
+        and engine.dialect.name == "sqlite"
+        and session.bind is engine.sync_engine
+    )
+
+
+async def _acquire(lock: asyncio.Lock):
+    try:
+        async with asyncio.timeout(settings.SQLITE_WRITE_TIMEOUT):
+            await lock.acquire()
+    except TimeoutError:
+        raise TimeoutError(f"waited {settings.SQLITE_WRITE_TIMEOUT}s for the database writer lock") from None
+
+
+def _begin_write(session: Session):
+    """Take the writer lock for this session's transaction (runs inside the async session's greenlet)."""
+    if "writer_lock" in session.info or not _serialized(session):
+        return
+    loop = asyncio.get_running_loop()
+    lock = _writer_locks.get(loop)
+    if lock is None:
+        lock = _writer_locks[loop] = asyncio.Lock()
+    await_only(_acquire(lock))
+    session.info["writer_lock"] = lock
+    try:
+        session.connection()  # begin the transaction whose end releases the lock
+    except Exception:
+        session.info.pop("writer_lock").release()
+        raise
+
+
+@event.listens_for(Session, "before_flush")
+def _before_flush(session: Session, flush_context, instances):
+    _begin_write(session)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _end_write(session: Session, transaction):
+    if transaction.parent is None and "writer_lock" in session.info:
+        session.info.pop("writer_lock").release()
+
 
 class Base(DeclarativeBase):
     pass
 
 
+class ChangeVersions:
+    """Which tables changed, and when, as seen by this process.
+
+    Every commit that wrote to a table takes the next number of one
+    process-wide sequence, and that becomes the table's version. So a
+    version only grows, and ``version(*tables)`` (the newest of them) tells
+    in O(1) whether any of ``tables`` changed since a value was read.
+    Numbering restarts with the process; ``epoch`` tells processes apart.
+
+    Writes are noted by the session events below, so routers, seeds and
+    background jobs are all covered, ORM flushes and Core DML alike.
+    Subscribers get the changed table names after each commit.
+    """
+
+    def __init__(self):
+        self.epoch = secrets.token_hex(4)
+        self.sequence = 0
+        self._versions: dict[str, int] = {}
+        self._listeners: list[Callable[[set[str]], None]] = []
+
+    def version(self, *tables: str) -> int:
+        return max((self._versions.get(t, 0) for t in tables), default=0)
+
+    def snapshot(self) -> dict[str, int]:
+        return dict(sorted(self._versions.items()))
+
+    def subscribe(self, listener: Callable[[set[str]], None]):
+        self._listeners.append(listener)
+
+    def bump(self, tables: Iterable[str]):
+        tables = set(tables)
+        if not tables:
+            return
+        self.sequence += 1
+        for table in tables:
+            self._versions[table] = self.sequence
+        for listener in self._listeners:
+            listener(tables)
+
+
+change_versions = ChangeVersions()
+
+
+def _note_tables(session: Session, tables: Iterable[str]):
+    session.info.setdefault("changed_tables", set()).update(tables)
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session: Session, flush_context):
+    _note_tables(session, (
+        obj.__table__.name for obj in (*session.new, *session.dirty, *session.deleted)
+        if hasattr(obj, "__table__")
+    ))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _on_execute(state):
+    # Core / bulk DML through a session (bulk loader, upserts, grouped updates)
+    if state.is_insert or state.is_update or state.is_delete:
+        _begin_write(state.session)
+        table = getattr(state.statement, "table", None)
+        if table is not None:
+            _note_tables(state.session, (table.name,))
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session):
+    change_versions.bump(session.info.pop("changed_tables", ()))
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session):
+    session.info.pop("changed_tables", None)
+
+
 async def get_db():
     """Dependency to get database session."""
     async with async_session() as session:
@@ -23,7 +224,34 @@ async def get_db():
             raise
 
 
+async def get_read_db():
+    """Dependency for read-only endpoints (dashboard, reports, listings, stats).
+
+    Sessions come from ``read_engine`` and are closed without a commit. On
+    SQLite in WAL mode the read-only connection sees every committed write
+    at once; a PostgreSQL replica lags by its replication delay.
+    """
+    async with read_session() as session:
+        yield session
+
+
 async def init_db():
-    """Create all tables."""
+    """Create all tables, and any indexes missing from tables created by older versions."""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        created = await conn.run_sync(ensure_indexes)
+    if created:
+        print(f"[OK] Created {len(created)} missing indexes: {', '.join(created)}")
+
+
+def ensure_indexes(sync_conn) -> list[str]:
+    """create_all skips indexes of tables that already exist; add them here."""
+    inspector = inspect(sync_conn)
+    existing = {table: {ix["name"] for ix in inspector.get_indexes(table)} for table in inspector.get_table_names()}
+    created = []
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name not in existing.get(table.name, set()):
+                index.create(sync_conn)
+                created.append(index.name)
+    return created
@@ -2,15 +2,22 @@
 import traceback
 from pathlib import Path
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Depends
 from fastapi.responses import JSONResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import settings
 from app.database import init_db, async_session
-from app.routers import auth, projects, budget, expenditures, dashboard, simulation, alerts, reports, cashflow, procurement
+from app.models.user import User
+from app.routers import auth, projects, budget, expenditures, dashboard, simulation, alerts, reports, cashflow, procurement, exports
 from app.services.seed_data import seed_initial_data
+from app.services.spend_aggregate import ensure_aggregates
+from app.services.sim_jobs import fail_interrupted_jobs, shutdown_executor, start_heartbeat
+from app.services import alert_scheduler, material_search, import_jobs
+from app.utils.pagination import PAGE_HEADERS
+from app.utils.response_cache import CACHE_HEADERS, response_cache
+from app.utils.security import require_role, shutdown_hash_executor
 
 STATIC_DIR = Path(__file__).resolve().parent.parent / "static"
 
@@ -18,11 +25,26 @@ STATIC_DIR = Path(__file__).resolve().parent.parent / "static"
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application startup and shutdown."""
+    response_cache.open()
     await init_db()
     async with async_session() as db:
         await seed_initial_data(db)
+        await ensure_aggregates(db)
+        await material_search.ensure_index(db)
+        await fail_interrupted_jobs(db)
+        await alert_scheduler.ensure_state_row(db)
+        interrupted_imports = await import_jobs.requeue_interrupted(db)
         await db.commit()
+    alert_scheduler.start()
+    import_jobs.start()
+    start_heartbeat()
+    for job_id in interrupted_imports:
+        import_jobs.enqueue(job_id)
     yield
+    await alert_scheduler.shutdown()
+    await import_jobs.shutdown()
+    shutdown_executor()
+    shutdown_hash_executor()
 
 
 app = FastAPI(
@@ -38,6 +60,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=PAGE_HEADERS + CACHE_HEADERS,
 )
 
 # ── API routers (must be registered BEFORE the static catch-all) ──
@@ -51,6 +74,7 @@ app.include_router(alerts.router)
 app.include_router(reports.router)
 app.include_router(cashflow.router)
 app.include_router(procurement.router)
+app.include_router(exports.router)
 
 
 @app.exception_handler(Exception)
@@ -65,6 +89,12 @@ async def health_check():
     return {"status": "ok", "app": settings.APP_NAME, "version": settings.APP_VERSION}
 
 
+@app.get("/api/cache/stats")
+async def cache_stats(user: User = Depends(require_role("admin"))):
+    """响应缓存命中率与各表变更版本（仅管理员）"""
+    return response_cache.stats()
+
+
 # ── Serve Vue SPA static files (only when built frontend exists) ──
 if STATIC_DIR.is_dir():
     app.mount("/assets", StaticFiles(directory=STATIC_DIR / "assets"), name="assets")
@@ -1,8 +1,8 @@
 """Database models."""
 from app.models.user import User
 from app.models.project import Project, SubProject, MilestoneNode, ProgressRecord
-from app.models.budget import BudgetCategory, CostItem, Expenditure
-from app.models.alert import AlertLog
+from app.models.budget import BudgetCategory, CostItem, Expenditure, ExpenditureAggregate, ExpenditureImport
+from app.models.alert import AlertLog, AlertScanState
 from app.models.simulation import Simulation, SimScenario
 from app.models.cashflow import CashFlow
 from app.models.procurement import (
@@ -12,8 +12,8 @@ from app.models.procurement import (
 __all__ = [
     "User",
     "Project", "SubProject", "MilestoneNode", "ProgressRecord",
-    "BudgetCategory", "CostItem", "Expenditure",
-    "AlertLog",
+    "BudgetCategory", "CostItem", "Expenditure", "ExpenditureAggregate", "ExpenditureImport",
+    "AlertLog", "AlertScanState",
     "Simulation", "SimScenario",
     "CashFlow",
     "CivilSettlement", "ProcurementMonthlySummary", "ProcurementRecord", "WarehouseOutbound",
@@ -1,12 +1,19 @@
 """Alert log model."""
 import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, Index
 from app.database import Base
 
 
 class AlertLog(Base):
     """System alert/warning log."""
     __tablename__ = "alert_logs"
+    __table_args__ = (
+        Index("ix_alert_logs_open_key", "alert_type", "related_type", "related_id", "is_resolved"),
+        Index("ix_alert_logs_resolved_level", "is_resolved", "level"),
+        Index("ix_alert_logs_resolved_created", "is_resolved", "created_at"),
+        Index("ix_alert_logs_level_created", "level", "created_at"),
+        Index("ix_alert_logs_created_at", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     alert_type = Column(String(50), nullable=False)  # budget_overrun, schedule_delay, burn_rate, reserve_usage
@@ -20,3 +27,14 @@ class AlertLog(Base):
     is_resolved = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     resolved_at = Column(DateTime, nullable=True)
+
+
+class AlertScanState(Base):
+    """Single-row state of the scheduled alert scan: leader lease and change watermark."""
+    __tablename__ = "alert_scan_state"
+
+    id = Column(Integer, primary_key=True)
+    leader = Column(String(100), nullable=True)  # hostname:pid of the worker holding the lease
+    lease_until = Column(DateTime, nullable=True)
+    watermark = Column(String(200), nullable=True)  # input fingerprint at the last completed scan
+    last_run_at = Column(DateTime, nullable=True)
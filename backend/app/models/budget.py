@@ -1,6 +1,6 @@
 """Budget category, cost item, and expenditure models."""
 import datetime
-from sqlalchemy import Column, Integer, String, Float, DateTime, Date, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, Date, ForeignKey, Text, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -25,6 +25,10 @@ class BudgetCategory(Base):
 class CostItem(Base):
     """Specific cost item linking sub-project to budget category."""
     __tablename__ = "cost_items"
+    __table_args__ = (
+        Index("ix_cost_items_sub_project", "sub_project_id"),
+        Index("ix_cost_items_category", "category_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     sub_project_id = Column(Integer, ForeignKey("sub_projects.id"), nullable=False)
@@ -46,6 +50,13 @@ class CostItem(Base):
 class Expenditure(Base):
     """Individual expenditure records."""
     __tablename__ = "expenditures"
+    __table_args__ = (
+        # Each filter of the expenditure list, with record_date for its ORDER BY
+        Index("ix_expenditures_sub_project_date", "sub_project_id", "record_date"),
+        Index("ix_expenditures_cost_item_date", "cost_item_id", "record_date"),
+        Index("ix_expenditures_category_date", "category_id", "record_date"),
+        Index("ix_expenditures_record_date", "record_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     cost_item_id = Column(Integer, ForeignKey("cost_items.id"), nullable=True)
@@ -61,3 +72,58 @@ class Expenditure(Base):
 
     cost_item = relationship("CostItem", back_populates="expenditures")
     sub_project = relationship("SubProject", back_populates="expenditures")
+
+
+class ExpenditureAggregate(Base):
+    """Materialized spend per (sub-project, category, cost item, month).
+
+    Maintained incrementally on every expenditure write. category_id and
+    cost_item_id store 0 for "none" so the composite key stays unique in
+    SQLite, where NULLs never collide.
+    """
+    __tablename__ = "expenditure_aggregates"
+    __table_args__ = (
+        UniqueConstraint("sub_project_id", "category_id", "cost_item_id", "month", name="uq_expenditure_aggregate_key"),
+        # Covering indexes for the month-sliced report reads and per-category / per-cost-item sums
+        Index("ix_expenditure_aggregates_month_cover", "month", "sub_project_id", "category_id", "amount"),
+        Index("ix_expenditure_aggregates_category_cover", "category_id", "amount"),
+        Index("ix_expenditure_aggregates_cost_item_cover", "cost_item_id", "amount"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    sub_project_id = Column(Integer, nullable=False)
+    category_id = Column(Integer, nullable=False, default=0)
+    cost_item_id = Column(Integer, nullable=False, default=0)
+    month = Column(String(7), nullable=False)  # YYYY-MM
+    amount = Column(Float, nullable=False, default=0)  # 万元
+    record_count = Column(Integer, nullable=False, default=0)
+
+
+class ExpenditureImport(Base):
+    """An expenditure import job and its checkpoint.
+
+    rows_done, the counters and the affected ids are committed in the same
+    transaction as each inserted batch, so an interrupted import resumes
+    exactly where its last batch ended.
+    """
+    __tablename__ = "expenditure_imports"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(20), nullable=False, default="stream")  # stream, upload, batch
+    file_hash = Column(String(64), nullable=True, unique=True)  # sha256 of a streamed file, which may be imported once
+    filename = Column(String(255), nullable=True)
+    spool_path = Column(String(500), nullable=True)  # queued jobs' input, kept until the job completes
+    status = Column(String(20), nullable=False, default="running")  # queued, running, completed, failed
+    rows_done = Column(Integer, nullable=False, default=0)  # data rows consumed, valid or rejected
+    inserted = Column(Integer, nullable=False, default=0)
+    rejected = Column(Integer, nullable=False, default=0)
+    rows_per_sec = Column(Float, nullable=True)  # throughput of the current / last run
+    errors = Column(Text, nullable=True)  # first rejected rows, one message per line
+    sub_project_ids = Column(Text, nullable=True)  # comma-separated ids whose totals need a refresh
+    cost_item_ids = Column(Text, nullable=True)
+    message = Column(String(500), nullable=True)
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
@@ -1,6 +1,6 @@
 """Cash flow management model."""
 import datetime
-from sqlalchemy import Column, Integer, String, Float, DateTime, Date, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, Date, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -8,6 +8,12 @@ from app.database import Base
 class CashFlow(Base):
     """Cash flow record - tracks money in (拨款) and out (支出)."""
     __tablename__ = "cash_flows"
+    __table_args__ = (
+        Index("ix_cash_flows_type_status_date", "flow_type", "status", "record_date"),
+        # Covers the monthly inflow/outflow rollup (status != 'cancelled' grouped by month, type)
+        Index("ix_cash_flows_status_cover", "status", "record_date", "flow_type", "amount"),
+        Index("ix_cash_flows_record_date", "record_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
@@ -1,6 +1,6 @@
 """Procurement, warehouse outbound, and civil settlement models."""
 import datetime
-from sqlalchemy import Column, Integer, String, Float, DateTime, Date, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, Date, ForeignKey, Text, Index
 from app.database import Base
 
 
@@ -37,6 +37,7 @@ class ProcurementMonthlySummary(Base):
 class ProcurementRecord(Base):
     """塔国采购明细记录。"""
     __tablename__ = "procurement_records"
+    __table_args__ = (Index("ix_procurement_records_month_seq", "month", "seq"),)
 
     id = Column(Integer, primary_key=True, index=True)
     month = Column(Integer, nullable=False)  # 1-12
@@ -62,6 +63,10 @@ class ProcurementRecord(Base):
 class WarehouseOutbound(Base):
     """来塔物资出库明细记录。"""
     __tablename__ = "warehouse_outbound"
+    __table_args__ = (
+        Index("ix_warehouse_outbound_apply_date", "apply_date"),
+        Index("ix_warehouse_outbound_team_amount", "team", "amount"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     team = Column(String(100), nullable=True)  # 使用区队
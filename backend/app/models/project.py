@@ -1,6 +1,6 @@
 """Project and sub-project models."""
 import datetime
-from sqlalchemy import Column, Integer, String, Float, DateTime, Date, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, Date, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -55,6 +55,7 @@ class SubProject(Base):
 class MilestoneNode(Base):
     """Milestone nodes for sub-projects."""
     __tablename__ = "milestone_nodes"
+    __table_args__ = (Index("ix_milestone_nodes_sub_project", "sub_project_id", "sort_order"),)
 
     id = Column(Integer, primary_key=True, index=True)
     sub_project_id = Column(Integer, ForeignKey("sub_projects.id"), nullable=False)
@@ -71,6 +72,7 @@ class MilestoneNode(Base):
 class ProgressRecord(Base):
     """Monthly progress records for sub-projects."""
     __tablename__ = "progress_records"
+    __table_args__ = (Index("ix_progress_records_sub_project_date", "sub_project_id", "record_date"),)
 
     id = Column(Integer, primary_key=True, index=True)
     sub_project_id = Column(Integer, ForeignKey("sub_projects.id"), nullable=False)
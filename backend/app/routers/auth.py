@@ -7,7 +7,7 @@ from app.database import get_db
 from app.models.user import User
 from app.schemas.user import UserCreate, UserResponse, LoginRequest, TokenResponse, UserUpdate
 from app.utils.security import (
-    hash_password, verify_password, create_access_token,
+    hash_password, verify_and_update_password, create_access_token,
     get_current_user, require_role,
 )
 
@@ -19,10 +19,13 @@ async def login(req: LoginRequest, db: AsyncSession = Depends(get_db)):
     """用户登录"""
     result = await db.execute(select(User).where(User.username == req.username))
     user = result.scalar_one_or_none()
-    if not user or not verify_password(req.password, user.password_hash):
+    valid, new_hash = await verify_and_update_password(req.password, user.password_hash) if user else (False, None)
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="用户名或密码错误")
     if not user.is_active:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="账户已禁用")
+    if new_hash:
+        user.password_hash = new_hash  # BCRYPT_ROUNDS changed; committed with the request
 
     token = create_access_token({"sub": str(user.id), "role": user.role})
     return TokenResponse(
@@ -61,7 +64,7 @@ async def create_user(
     user = User(
         username=req.username,
         full_name=req.full_name,
-        password_hash=hash_password(req.password),
+        password_hash=await hash_password(req.password),
         role=req.role,
         department=req.department,
     )
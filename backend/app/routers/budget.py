@@ -1,7 +1,7 @@
 """Budget categories and cost items router."""
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select
 
 from app.database import get_db
 from app.models.user import User
@@ -10,6 +10,9 @@ from app.schemas.budget import (
     BudgetCategoryCreate, BudgetCategoryUpdate, BudgetCategoryResponse,
     CostItemCreate, CostItemUpdate, CostItemResponse,
 )
+from app.services import spend_aggregate
+from app.services.category_rollup import load_category_rollup
+from app.utils.response_cache import conditional
 from app.utils.security import get_current_user, require_role
 
 router = APIRouter(prefix="/api/budget", tags=["概算科目管理"])
@@ -18,51 +21,19 @@ router = APIRouter(prefix="/api/budget", tags=["概算科目管理"])
 # ===== Budget Categories =====
 
 @router.get("/categories", response_model=list[BudgetCategoryResponse])
+@conditional("budget", "expenditure")
 async def list_categories(db: AsyncSession = Depends(get_db), user: User = Depends(get_current_user)):
     """获取概算科目列表（树形结构）"""
-    result = await db.execute(select(BudgetCategory).order_by(BudgetCategory.level, BudgetCategory.sort_order))
-    categories = result.scalars().all()
-
-    # Calculate actual spent for each category
-    cat_list = []
-    for cat in categories:
-        exp_result = await db.execute(
-            select(func.coalesce(func.sum(Expenditure.amount), 0))
-            .where(Expenditure.category_id == cat.id)
-        )
-        actual_spent = float(exp_result.scalar())
-        cr = BudgetCategoryResponse(
-            id=cat.id, name=cat.name, code=cat.code, parent_id=cat.parent_id,
-            level=cat.level, budget_amount=cat.budget_amount,
-            description=cat.description, sort_order=cat.sort_order,
-            actual_spent=actual_spent, children=[],
-        )
-        cat_list.append(cr)
-
-    # Build tree structure
-    return _build_tree(cat_list)
+    categories, rolled = await load_category_rollup(db)
+    return _build_tree(_to_responses(categories, rolled))
 
 
 @router.get("/categories/flat", response_model=list[BudgetCategoryResponse])
+@conditional("budget", "expenditure")
 async def list_categories_flat(db: AsyncSession = Depends(get_db), user: User = Depends(get_current_user)):
     """获取概算科目平铺列表"""
-    result = await db.execute(select(BudgetCategory).order_by(BudgetCategory.level, BudgetCategory.sort_order))
-    categories = result.scalars().all()
-    cat_list = []
-    for cat in categories:
-        exp_result = await db.execute(
-            select(func.coalesce(func.sum(Expenditure.amount), 0))
-            .where(Expenditure.category_id == cat.id)
-        )
-        actual_spent = float(exp_result.scalar())
-        cr = BudgetCategoryResponse(
-            id=cat.id, name=cat.name, code=cat.code, parent_id=cat.parent_id,
-            level=cat.level, budget_amount=cat.budget_amount,
-            description=cat.description, sort_order=cat.sort_order,
-            actual_spent=actual_spent, children=[],
-        )
-        cat_list.append(cr)
-    return cat_list
+    categories, rolled = await load_category_rollup(db)
+    return _to_responses(categories, rolled)
 
 
 @router.post("/categories", response_model=BudgetCategoryResponse)
@@ -178,10 +149,27 @@ async def delete_cost_item(
     ci = result.scalar_one_or_none()
     if not ci:
         raise HTTPException(status_code=404, detail="成本项不存在")
+    # Expenditures cascade with the cost item; take them out of the aggregates first
+    sp_ids = await spend_aggregate.retract_matching(db, Expenditure.cost_item_id == ci_id)
     await db.delete(ci)
+    await db.flush()
+    await spend_aggregate.refresh_totals(db, sp_ids)
     return {"message": "删除成功"}
 
 
+def _to_responses(categories: list[BudgetCategory], rolled: dict[int, float]) -> list[BudgetCategoryResponse]:
+    """Convert categories to responses, with actual spent rolled up over each subtree."""
+    return [
+        BudgetCategoryResponse(
+            id=cat.id, name=cat.name, code=cat.code, parent_id=cat.parent_id,
+            level=cat.level, budget_amount=cat.budget_amount,
+            description=cat.description, sort_order=cat.sort_order,
+            actual_spent=rolled.get(cat.id, 0.0), children=[],
+        )
+        for cat in categories
+    ]
+
+
 def _build_tree(categories: list[BudgetCategoryResponse]) -> list[BudgetCategoryResponse]:
     """Build tree from flat category list."""
     cat_map = {c.id: c for c in categories}
@@ -1,15 +1,17 @@
 """Cash flow management router."""
 import datetime
-import io
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models.user import User
 from app.models.cashflow import CashFlow
 from app.schemas.cashflow import CashFlowCreate, CashFlowUpdate, CashFlowResponse, CashFlowSummary
+from app.services import table_export
+from app.utils.dialect import month_bucket
+from app.utils.response_cache import cached
 from app.utils.security import get_current_user, require_role
 
 router = APIRouter(prefix="/api/cashflow", tags=["现金流管理"])
@@ -105,8 +107,9 @@ async def approve_cashflow(
 
 
 @router.get("/summary", response_model=CashFlowSummary)
+@cached("cashflow.summary", ttl=60, tags=("cashflow",))
 async def cashflow_summary(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     user: User = Depends(get_current_user),
 ):
     """现金流汇总统计"""
@@ -128,7 +131,7 @@ async def cashflow_summary(
     pending_count = pending_result.scalar() or 0
 
     monthly_query = select(
-        func.strftime('%Y-%m', CashFlow.record_date).label('month'),
+        month_bucket(CashFlow.record_date).label('month'),
         CashFlow.flow_type,
         func.sum(CashFlow.amount).label('amount'),
     ).where(CashFlow.status != "cancelled").group_by('month', CashFlow.flow_type).order_by('month')
@@ -153,60 +156,12 @@ async def cashflow_summary(
 
 @router.get("/export")
 async def export_cashflow(
-    db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user),
 ):
-    """导出现金流数据为Excel"""
-    try:
-        from openpyxl import Workbook
-    except ImportError:
-        from io import StringIO
-        import json
-        result = await db.execute(select(CashFlow).order_by(CashFlow.record_date.desc()))
-        records = result.scalars().all()
-        data = []
-        for cf in records:
-            data.append({
-                "日期": str(cf.record_date),
-                "类型": "流入(拨款)" if cf.flow_type == "inflow" else "流出(支出)",
-                "金额(万元)": cf.amount,
-                "收款方": cf.payee or "",
-                "用途": cf.category or "",
-                "说明": cf.description or "",
-                "凭证号": cf.voucher_no or "",
-                "状态": cf.status,
-            })
-        content = json.dumps(data, ensure_ascii=False, indent=2)
-        return StreamingResponse(
-            io.BytesIO(content.encode("utf-8")),
-            media_type="application/json",
-            headers={"Content-Disposition": "attachment; filename=cashflow_export.json"},
-        )
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "现金流记录"
-    headers = ["日期", "类型", "金额(万元)", "收款方", "用途", "说明", "凭证号", "状态"]
-    ws.append(headers)
-
-    result = await db.execute(select(CashFlow).order_by(CashFlow.record_date.desc()))
-    for cf in result.scalars().all():
-        ws.append([
-            str(cf.record_date),
-            "流入(拨款)" if cf.flow_type == "inflow" else "流出(支出)",
-            cf.amount,
-            cf.payee or "",
-            cf.category or "",
-            cf.description or "",
-            cf.voucher_no or "",
-            cf.status,
-        ])
-
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
+    """导出现金流数据为Excel（流式生成，未安装 openpyxl 时导出 NDJSON）"""
+    fmt = "xlsx" if table_export.xlsx_available() else "ndjson"
     return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": "attachment; filename=cashflow_export.xlsx"},
+        table_export.stream("cashflow", fmt),
+        media_type=table_export.FORMATS[fmt],
+        headers={"Content-Disposition": f"attachment; filename=cashflow_export.{fmt}"},
     )
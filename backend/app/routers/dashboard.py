@@ -4,13 +4,16 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 
-from app.database import get_db
+from app.database import get_read_db
 from app.models.user import User
 from app.models.project import Project, SubProject
-from app.models.budget import BudgetCategory, Expenditure, CostItem
+from app.models.budget import BudgetCategory, ExpenditureAggregate, CostItem
 from app.models.alert import AlertLog
 from app.models.cashflow import CashFlow
 from app.schemas.simulation import DashboardSummary
+from app.services.category_rollup import load_category_rollup
+from app.utils.dialect import month_bucket
+from app.utils.response_cache import cached, conditional
 from app.utils.security import get_current_user
 from app.config import settings
 
@@ -18,7 +21,9 @@ router = APIRouter(prefix="/api/dashboard", tags=["领导驾驶舱"])
 
 
 @router.get("/summary", response_model=DashboardSummary)
-async def get_dashboard_summary(db: AsyncSession = Depends(get_db), user: User = Depends(get_current_user)):
+@conditional("expenditure", "budget", "project", "alert", "cashflow")
+@cached("dashboard.summary", ttl=30, tags=("expenditure", "budget", "project", "alert", "cashflow"))
+async def get_dashboard_summary(db: AsyncSession = Depends(get_read_db), user: User = Depends(get_current_user)):
     """获取驾驶舱总览数据"""
     # Get main project
     proj_result = await db.execute(select(Project).order_by(Project.id).limit(1))
@@ -28,7 +33,7 @@ async def get_dashboard_summary(db: AsyncSession = Depends(get_db), user: User =
     reserve_rate = project.reserve_rate if project else settings.DEFAULT_RESERVE_RATE
 
     # Total spent
-    spent_result = await db.execute(select(func.coalesce(func.sum(Expenditure.amount), 0)))
+    spent_result = await db.execute(select(func.coalesce(func.sum(ExpenditureAggregate.amount), 0)))
     total_spent = float(spent_result.scalar())
 
     # Reserve budget
@@ -46,26 +51,13 @@ async def get_dashboard_summary(db: AsyncSession = Depends(get_db), user: User =
     total_allocated = sum(sp.allocated_budget for sp in sub_projects) or 1
     overall_progress = sum(sp.progress_percent * sp.allocated_budget for sp in sub_projects) / total_allocated
 
-    # Category breakdown
-    cat_result = await db.execute(select(BudgetCategory).where(BudgetCategory.level == 1).order_by(BudgetCategory.sort_order))
-    categories = cat_result.scalars().all()
+    # Category breakdown (level-1 totals include the whole subtree)
+    categories, rolled = await load_category_rollup(db)
     category_breakdown = []
     for cat in categories:
-        exp_result = await db.execute(
-            select(func.coalesce(func.sum(Expenditure.amount), 0)).where(Expenditure.category_id == cat.id)
-        )
-        cat_spent = float(exp_result.scalar())
-        # Also sum child categories
-        child_result = await db.execute(
-            select(BudgetCategory.id).where(BudgetCategory.parent_id == cat.id)
-        )
-        child_ids = [r[0] for r in child_result.all()]
-        if child_ids:
-            child_exp_result = await db.execute(
-                select(func.coalesce(func.sum(Expenditure.amount), 0)).where(Expenditure.category_id.in_(child_ids))
-            )
-            cat_spent += float(child_exp_result.scalar())
-
+        if cat.level != 1:
+            continue
+        cat_spent = rolled.get(cat.id, 0.0)
         category_breakdown.append({
             "id": cat.id,
             "name": cat.name,
@@ -90,9 +82,9 @@ async def get_dashboard_summary(db: AsyncSession = Depends(get_db), user: User =
 
     # Monthly trend
     monthly_query = select(
-        func.strftime('%Y-%m', Expenditure.record_date).label('month'),
-        func.sum(Expenditure.amount).label('amount'),
-    ).group_by('month').order_by('month')
+        ExpenditureAggregate.month,
+        func.sum(ExpenditureAggregate.amount).label('amount'),
+    ).group_by(ExpenditureAggregate.month).order_by(ExpenditureAggregate.month)
     monthly_result = await db.execute(monthly_query)
     monthly_trend = [{"month": r.month, "amount": float(r.amount)} for r in monthly_result.all()]
 
@@ -120,7 +112,7 @@ async def get_dashboard_summary(db: AsyncSession = Depends(get_db), user: User =
 
     cf_monthly = await db.execute(
         select(
-            func.strftime('%Y-%m', CashFlow.record_date).label('month'),
+            month_bucket(CashFlow.record_date).label('month'),
             CashFlow.flow_type,
             func.sum(CashFlow.amount).label('amount'),
         ).where(CashFlow.status != "cancelled")
@@ -158,7 +150,7 @@ async def get_dashboard_summary(db: AsyncSession = Depends(get_db), user: User =
 @router.get("/alerts")
 async def get_recent_alerts(
     limit: int = 10,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     user: User = Depends(get_current_user),
 ):
     """获取最近预警"""
@@ -1,15 +1,20 @@
 """Expenditure management router."""
+import asyncio
+import json
+import os
 from datetime import date
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, UploadFile, File
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 
 from app.database import get_db
 from app.models.user import User
-from app.models.budget import Expenditure, CostItem
-from app.models.project import SubProject
-from app.schemas.budget import ExpenditureCreate, ExpenditureResponse, ExpenditureBatchImport
+from app.models.budget import Expenditure, ExpenditureAggregate, ExpenditureImport
+from app.schemas.budget import ExpenditureCreate, ExpenditureResponse, ExpenditureBatchImport, ExpenditureImportResponse
+from app.services import spend_aggregate, alert_engine, expenditure_import, import_jobs
+from app.utils.pagination import fetch_page
 from app.utils.security import get_current_user, require_role
 
 router = APIRouter(prefix="/api/expenditures", tags=["支出管理"])
@@ -17,6 +22,7 @@ router = APIRouter(prefix="/api/expenditures", tags=["支出管理"])
 
 @router.get("", response_model=list[ExpenditureResponse])
 async def list_expenditures(
+    response: Response,
     sub_project_id: Optional[int] = Query(None),
     cost_item_id: Optional[int] = Query(None),
     category_id: Optional[int] = Query(None),
@@ -25,10 +31,12 @@ async def list_expenditures(
     source: Optional[str] = Query(None),
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None),
+    include_total: bool = Query(False),
     db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user),
 ):
-    """获取支出记录列表（支持筛选、分页）"""
+    """获取支出记录列表（支持筛选、分页；传入上一页响应头 X-Next-Cursor 的 cursor 按游标翻页）"""
     query = select(Expenditure)
     if sub_project_id:
         query = query.where(Expenditure.sub_project_id == sub_project_id)
@@ -43,9 +51,11 @@ async def list_expenditures(
     if source:
         query = query.where(Expenditure.source == source)
 
-    query = query.order_by(Expenditure.record_date.desc()).offset((page - 1) * page_size).limit(page_size)
-    result = await db.execute(query)
-    return [ExpenditureResponse.model_validate(e) for e in result.scalars().all()]
+    rows = await fetch_page(
+        db, query, [Expenditure.record_date, Expenditure.id], response,
+        descending=True, page_size=page_size, cursor=cursor, page=page, include_total=include_total,
+    )
+    return [ExpenditureResponse.model_validate(e) for e in rows]
 
 
 @router.get("/summary")
@@ -55,22 +65,17 @@ async def expenditure_summary(
     user: User = Depends(get_current_user),
 ):
     """获取支出汇总"""
-    query = select(func.coalesce(func.sum(Expenditure.amount), 0))
-    if sub_project_id:
-        query = query.where(Expenditure.sub_project_id == sub_project_id)
-    result = await db.execute(query)
-    total = float(result.scalar())
-
     # Monthly breakdown
     monthly_query = select(
-        func.strftime('%Y-%m', Expenditure.record_date).label('month'),
-        func.sum(Expenditure.amount).label('amount'),
+        ExpenditureAggregate.month,
+        func.sum(ExpenditureAggregate.amount).label('amount'),
     )
     if sub_project_id:
-        monthly_query = monthly_query.where(Expenditure.sub_project_id == sub_project_id)
-    monthly_query = monthly_query.group_by('month').order_by('month')
+        monthly_query = monthly_query.where(ExpenditureAggregate.sub_project_id == sub_project_id)
+    monthly_query = monthly_query.group_by(ExpenditureAggregate.month).order_by(ExpenditureAggregate.month)
     monthly_result = await db.execute(monthly_query)
     monthly = [{"month": r.month, "amount": float(r.amount)} for r in monthly_result.all()]
+    total = sum(m["amount"] for m in monthly)
 
     return {"total": total, "monthly": monthly}
 
@@ -85,101 +90,142 @@ async def create_expenditure(
     exp = Expenditure(**req.model_dump(), created_by=user.id)
     db.add(exp)
     await db.flush()
+    await spend_aggregate.apply_expenditures(db, [exp])
 
-    # Update cost item actual amount
-    if req.cost_item_id:
-        await _update_cost_item_total(db, req.cost_item_id)
-    # Update sub-project actual spent
-    await _update_sub_project_spent(db, req.sub_project_id)
+    await spend_aggregate.refresh_totals(db, [req.sub_project_id], [req.cost_item_id] if req.cost_item_id else [])
+    await alert_engine.on_spend_changed(db, [req.sub_project_id])
 
     await db.refresh(exp)
     return ExpenditureResponse.model_validate(exp)
 
 
-@router.post("/batch", response_model=dict)
+@router.post("/batch", response_model=ExpenditureImportResponse, status_code=202)
 async def batch_import_expenditures(
     req: ExpenditureBatchImport,
     db: AsyncSession = Depends(get_db),
     user: User = Depends(require_role("admin", "leader", "department")),
 ):
-    """批量导入支出记录"""
-    count = 0
-    sp_ids = set()
-    ci_ids = set()
-
-    for record in req.records:
-        exp = Expenditure(**record.model_dump(), created_by=user.id)
-        db.add(exp)
-        sp_ids.add(record.sub_project_id)
-        if record.cost_item_id:
-            ci_ids.add(record.cost_item_id)
-        count += 1
-
-    await db.flush()
-
-    # Update totals
-    for ci_id in ci_ids:
-        await _update_cost_item_total(db, ci_id)
-    for sp_id in sp_ids:
-        await _update_sub_project_spent(db, sp_id)
-
-    return {"message": f"成功导入 {count} 条记录", "count": count}
+    """批量导入支出记录（后台任务：立即返回任务，通过 /imports/{id} 查询进度）"""
+    if not req.records:
+        raise HTTPException(status_code=400, detail="至少需要一条记录")
+    path = await asyncio.to_thread(expenditure_import.spool_records, [r.model_dump() for r in req.records])
+    return await _submit_import(db, "batch", path, None, user)
 
 
-@router.post("/upload-excel")
+@router.post("/upload-excel", response_model=ExpenditureImportResponse, status_code=202)
 async def upload_excel(
     file: UploadFile = File(...),
     db: AsyncSession = Depends(get_db),
     user: User = Depends(require_role("admin", "leader", "department")),
 ):
-    """从Excel文件导入支出"""
+    """从Excel文件导入支出（后台任务：立即返回任务，通过 /imports/{id} 查询进度）"""
     if not file.filename.endswith(('.xlsx', '.xls', '.csv')):
         raise HTTPException(status_code=400, detail="仅支持 .xlsx, .xls, .csv 文件")
 
-    import pandas as pd
-    from io import BytesIO
+    path, _ = await expenditure_import.spool_upload(file)
+    try:
+        try:
+            columns = await asyncio.to_thread(expenditure_import.ledger_columns, path, file.filename)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"文件解析失败: {e}")
+        if expenditure_import.REQUIRED_COLUMNS - set(columns):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Excel必须包含以下列: {expenditure_import.REQUIRED_COLUMNS}. 当前列: {columns}"
+            )
+    except BaseException:
+        os.unlink(path)
+        raise
+    return await _submit_import(db, "upload", path, file.filename, user)
+
+
+async def _submit_import(db: AsyncSession, kind: str, path: str, filename: Optional[str], user: User):
+    job = await import_jobs.create_job(db, kind, path, filename, user.id)
+    # Workers read the job through their own sessions, so it must be visible first
+    await db.commit()
+    import_jobs.enqueue(job.id)
+    return import_jobs.job_response(job)
+
+
+@router.get("/imports/{job_id}", response_model=ExpenditureImportResponse)
+async def get_import_job(job_id: int, db: AsyncSession = Depends(get_db), user: User = Depends(get_current_user)):
+    """查询导入任务进度（已解析/已导入/已拒绝行数、每秒行数）"""
+    return import_jobs.job_response(await _load_import(db, job_id))
+
+
+@router.get("/imports/{job_id}/events")
+async def stream_import_job(job_id: int, db: AsyncSession = Depends(get_db), user: User = Depends(get_current_user)):
+    """以 SSE 推送导入任务进度：进度变化时发送 progress 事件，任务结束发送 done 事件"""
+    await _load_import(db, job_id)
+    return StreamingResponse(
+        import_jobs.events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-    content = await file.read()
-    if file.filename.endswith('.csv'):
-        df = pd.read_csv(BytesIO(content))
-    else:
-        df = pd.read_excel(BytesIO(content))
 
-    required_cols = {'子工程ID', '日期', '金额'}
-    if not required_cols.issubset(set(df.columns)):
-        raise HTTPException(
-            status_code=400,
-            detail=f"Excel必须包含以下列: {required_cols}. 当前列: {list(df.columns)}"
-        )
+@router.post("/imports/{job_id}/retry", response_model=ExpenditureImportResponse)
+async def retry_import_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(require_role("admin", "leader", "department")),
+):
+    """重试失败的导入任务，从最后一次提交的位置继续"""
+    job = await _load_import(db, job_id)
+    if not import_jobs.retry_job(job):
+        raise HTTPException(status_code=400, detail="仅可重试待导入文件仍在的失败任务")
+    await db.commit()
+    import_jobs.enqueue(job.id)
+    return import_jobs.job_response(job)
+
 
-    count = 0
-    sp_ids = set()
-    errors = []
+async def _load_import(db: AsyncSession, job_id: int) -> ExpenditureImport:
+    job = await db.get(ExpenditureImport, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="导入任务不存在")
+    return job
 
-    for idx, row in df.iterrows():
+
+@router.post("/upload-stream")
+async def upload_stream(
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(require_role("admin", "leader", "department")),
+):
+    """流式导入大体量支出台账（.xlsx / .csv）：分批提交，逐批返回进度（NDJSON）；中断后重新上传同一文件从断点续传"""
+    if not file.filename.endswith(expenditure_import.STREAM_SUFFIXES):
+        raise HTTPException(status_code=400, detail="流式导入仅支持 .xlsx, .csv 文件")
+
+    path, file_hash = await expenditure_import.spool_upload(file)
+    try:
         try:
-            exp = Expenditure(
-                sub_project_id=int(row['子工程ID']),
-                record_date=pd.to_datetime(row['日期']).date(),
-                amount=float(row['金额']),
-                description=str(row.get('描述', '')),
-                voucher_no=str(row.get('凭证号', '')) if pd.notna(row.get('凭证号')) else None,
-                category_id=int(row['科目ID']) if pd.notna(row.get('科目ID')) else None,
-                cost_item_id=int(row['成本项ID']) if pd.notna(row.get('成本项ID')) else None,
-                source="excel_import",
-                created_by=user.id,
-            )
-            db.add(exp)
-            sp_ids.add(int(row['子工程ID']))
-            count += 1
+            columns = await asyncio.to_thread(expenditure_import.ledger_columns, path, file.filename)
         except Exception as e:
-            errors.append(f"第{idx + 2}行: {str(e)}")
-
-    await db.flush()
-    for sp_id in sp_ids:
-        await _update_sub_project_spent(db, sp_id)
+            raise HTTPException(status_code=400, detail=f"文件解析失败: {e}")
+        if expenditure_import.REQUIRED_COLUMNS - set(columns):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Excel必须包含以下列: {expenditure_import.REQUIRED_COLUMNS}. 当前列: {columns}"
+            )
+        record, claimed = await expenditure_import.claim_import(db, file_hash, file.filename, user.id)
+        if not claimed:
+            if record.status == "completed":
+                raise HTTPException(status_code=409, detail=f"该文件已导入完成（导入记录 #{record.id}），请勿重复导入")
+            raise HTTPException(status_code=409, detail=f"该文件正在导入中（导入记录 #{record.id}）")
+        # The import runs in its own session; it must see the claim
+        await db.commit()
+    except BaseException:
+        os.unlink(path)
+        raise
+
+    async def body():
+        try:
+            async for event in expenditure_import.run_import(record.id, path, file.filename):
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        finally:
+            os.unlink(path)
 
-    return {"message": f"成功导入 {count} 条记录", "count": count, "errors": errors}
+    return StreamingResponse(body(), media_type="application/x-ndjson")
 
 
 @router.delete("/{exp_id}")
@@ -194,35 +240,9 @@ async def delete_expenditure(
         raise HTTPException(status_code=404, detail="记录不存在")
     sp_id = exp.sub_project_id
     ci_id = exp.cost_item_id
+    await spend_aggregate.apply_expenditures(db, [exp], sign=-1)
     await db.delete(exp)
     await db.flush()
-    if ci_id:
-        await _update_cost_item_total(db, ci_id)
-    await _update_sub_project_spent(db, sp_id)
+    await spend_aggregate.refresh_totals(db, [sp_id], [ci_id] if ci_id else [])
+    await alert_engine.on_spend_changed(db, [sp_id])
     return {"message": "删除成功"}
-
-
-async def _update_cost_item_total(db: AsyncSession, cost_item_id: int):
-    """Recalculate cost item actual amount from expenditures."""
-    result = await db.execute(
-        select(func.coalesce(func.sum(Expenditure.amount), 0))
-        .where(Expenditure.cost_item_id == cost_item_id)
-    )
-    total = float(result.scalar())
-    ci_result = await db.execute(select(CostItem).where(CostItem.id == cost_item_id))
-    ci = ci_result.scalar_one_or_none()
-    if ci:
-        ci.actual_amount = total
-
-
-async def _update_sub_project_spent(db: AsyncSession, sub_project_id: int):
-    """Recalculate sub-project actual spent from expenditures."""
-    result = await db.execute(
-        select(func.coalesce(func.sum(Expenditure.amount), 0))
-        .where(Expenditure.sub_project_id == sub_project_id)
-    )
-    total = float(result.scalar())
-    sp_result = await db.execute(select(SubProject).where(SubProject.id == sub_project_id))
-    sp = sp_result.scalar_one_or_none()
-    if sp:
-        sp.actual_spent = total
@@ -0,0 +1,40 @@
+"""Streaming data export router."""
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from app.models.user import User
+from app.services import table_export
+from app.utils.security import get_current_user
+
+router = APIRouter(prefix="/api/export", tags=["数据导出"])
+
+
+@router.get("/{dataset}")
+async def export_dataset(
+    dataset: str,
+    format: str = Query("csv"),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    month: Optional[int] = Query(None, ge=1, le=12),
+    user: User = Depends(get_current_user),
+):
+    """流式导出数据（expenditures / cashflow / procurement / warehouse，格式 csv / ndjson / xlsx）"""
+    spec = table_export.DATASETS.get(dataset)
+    if spec is None:
+        raise HTTPException(status_code=404, detail=f"数据集仅支持: {', '.join(table_export.DATASETS)}")
+    if format not in table_export.FORMATS:
+        raise HTTPException(status_code=400, detail=f"导出格式仅支持: {', '.join(table_export.FORMATS)}")
+    if format == "xlsx" and not table_export.xlsx_available():
+        raise HTTPException(status_code=400, detail="服务器未安装 openpyxl，无法导出 xlsx")
+    if (start_date or end_date) and spec["date"] is None:
+        raise HTTPException(status_code=400, detail="该数据集不支持按日期筛选")
+    if month and spec["month"] is None:
+        raise HTTPException(status_code=400, detail="该数据集不支持按月份筛选")
+
+    return StreamingResponse(
+        table_export.stream(dataset, format, start_date=start_date, end_date=end_date, month=month),
+        media_type=table_export.FORMATS[format],
+        headers={"Content-Disposition": f"attachment; filename={dataset}_export.{format}"},
+    )
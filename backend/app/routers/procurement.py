@@ -1,11 +1,11 @@
 """Procurement, warehouse outbound, and civil settlement API routes."""
 from datetime import date
 from typing import Optional
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models.user import User
 from app.models.project import SubProject
 from app.models.procurement import (
@@ -15,8 +15,11 @@ from app.schemas.procurement import (
     CivilSettlementResponse, ProcurementMonthlySummaryResponse,
     ProcurementRecordResponse, WarehouseOutboundResponse,
     ProcurementStatsResponse, WarehouseOutboundStatsResponse,
-    SettlementOverviewResponse,
+    SettlementOverviewResponse, MaterialSearchHit,
 )
+from app.services import material_search
+from app.utils.pagination import fetch_page
+from app.utils.response_cache import cached, conditional
 from app.utils.security import get_current_user
 
 router = APIRouter(prefix="/api/settlement", tags=["决算数据"])
@@ -25,8 +28,10 @@ router = APIRouter(prefix="/api/settlement", tags=["决算数据"])
 # ── Overview ──
 
 @router.get("/overview", response_model=SettlementOverviewResponse)
+@conditional("procurement", "project")
+@cached("settlement.overview", ttl=300, tags=("procurement", "project"))
 async def settlement_overview(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     user: User = Depends(get_current_user),
 ):
     """决算数据总览"""
@@ -61,8 +66,9 @@ async def settlement_overview(
 # ── Civil Settlement ──
 
 @router.get("/civil", response_model=list[CivilSettlementResponse])
+@conditional("procurement", "project")
 async def list_civil_settlements(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     user: User = Depends(get_current_user),
 ):
     """查询土建工程决算数据"""
@@ -103,8 +109,9 @@ async def list_civil_settlements(
 # ── Procurement ──
 
 @router.get("/procurement/monthly", response_model=list[ProcurementMonthlySummaryResponse])
+@conditional("procurement")
 async def list_procurement_monthly(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     user: User = Depends(get_current_user),
 ):
     """查询塔国采购月度汇总"""
@@ -115,16 +122,20 @@ async def list_procurement_monthly(
 
 
 @router.get("/procurement/records", response_model=list[ProcurementRecordResponse])
+@conditional("procurement")
 async def list_procurement_records(
+    response: Response,
     month: Optional[int] = Query(None, ge=1, le=12),
     project_name: Optional[str] = Query(None),
     material_name: Optional[str] = Query(None),
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=500),
-    db: AsyncSession = Depends(get_db),
+    cursor: Optional[str] = Query(None),
+    include_total: bool = Query(False),
+    db: AsyncSession = Depends(get_read_db),
     user: User = Depends(get_current_user),
 ):
-    """查询塔国采购明细（支持按月份、工程名称、物资名称筛选）"""
+    """查询塔国采购明细（支持按月份、工程名称、物资名称筛选；支持游标翻页）"""
     query = select(ProcurementRecord)
     if month:
         query = query.where(ProcurementRecord.month == month)
@@ -133,10 +144,11 @@ async def list_procurement_records(
     if material_name:
         query = query.where(ProcurementRecord.material_name.contains(material_name))
 
-    query = query.order_by(ProcurementRecord.month, ProcurementRecord.seq)
-    query = query.offset((page - 1) * page_size).limit(page_size)
-    result = await db.execute(query)
-    return [ProcurementRecordResponse.model_validate(r) for r in result.scalars().all()]
+    rows = await fetch_page(
+        db, query, [ProcurementRecord.month, ProcurementRecord.seq, ProcurementRecord.id], response,
+        descending=False, page_size=page_size, cursor=cursor, page=page, include_total=include_total,
+    )
+    return [ProcurementRecordResponse.model_validate(r) for r in rows]
 
 
 @router.get("/procurement/records/count")
@@ -144,7 +156,7 @@ async def count_procurement_records(
     month: Optional[int] = Query(None, ge=1, le=12),
     project_name: Optional[str] = Query(None),
     material_name: Optional[str] = Query(None),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     user: User = Depends(get_current_user),
 ):
     """获取采购明细总数"""
@@ -160,8 +172,10 @@ async def count_procurement_records(
 
 
 @router.get("/procurement/stats", response_model=ProcurementStatsResponse)
+@conditional("procurement")
+@cached("procurement.stats", ttl=300, tags=("procurement",))
 async def procurement_stats(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     user: User = Depends(get_current_user),
 ):
     """采购统计概览"""
@@ -191,10 +205,49 @@ async def procurement_stats(
     )
 
 
+# ── Material Search ──
+
+@router.get("/search", response_model=list[MaterialSearchHit])
+async def search_materials(
+    q: str = Query(..., min_length=1, max_length=100),
+    source: Optional[str] = Query(None),
+    month: Optional[int] = Query(None, ge=1, le=12),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    """物资全文检索（采购明细 + 出库明细，按相关度排序；月份仅筛采购，日期仅筛出库）"""
+    if source and source not in material_search.SOURCES:
+        raise HTTPException(status_code=400, detail=f"数据来源仅支持: {', '.join(material_search.SOURCES)}")
+    hits = await material_search.search(db, q, source, month, start_date, end_date, limit)
+    return [
+        MaterialSearchHit(
+            source=src,
+            id=rec.id,
+            score=score,
+            material_name=rec.material_name,
+            specification=rec.specification,
+            material_code=getattr(rec, "material_code", None),
+            project_name=rec.project_name,
+            team=getattr(rec, "team", None),
+            unit=rec.unit,
+            month=getattr(rec, "month", None),
+            apply_date=getattr(rec, "apply_date", None),
+            quantity=rec.purchase_quantity if src == "procurement" else rec.quantity,
+            amount_rmb=rec.amount_rmb if src == "procurement" else rec.amount,
+        )
+        for src, rec, score in hits
+    ]
+
+
 # ── Warehouse Outbound ──
 
 @router.get("/warehouse/outbound", response_model=list[WarehouseOutboundResponse])
+@conditional("procurement")
 async def list_warehouse_outbound(
+    response: Response,
     team: Optional[str] = Query(None),
     project_name: Optional[str] = Query(None),
     material_name: Optional[str] = Query(None),
@@ -202,10 +255,12 @@ async def list_warehouse_outbound(
     end_date: Optional[date] = Query(None),
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=500),
-    db: AsyncSession = Depends(get_db),
+    cursor: Optional[str] = Query(None),
+    include_total: bool = Query(False),
+    db: AsyncSession = Depends(get_read_db),
     user: User = Depends(get_current_user),
 ):
-    """查询来塔物资出库明细"""
+    """查询来塔物资出库明细（支持游标翻页）"""
     query = select(WarehouseOutbound)
     if team:
         query = query.where(WarehouseOutbound.team.contains(team))
@@ -218,9 +273,11 @@ async def list_warehouse_outbound(
     if end_date:
         query = query.where(WarehouseOutbound.apply_date <= end_date)
 
-    query = query.order_by(WarehouseOutbound.apply_date.desc()).offset((page - 1) * page_size).limit(page_size)
-    result = await db.execute(query)
-    return [WarehouseOutboundResponse.model_validate(r) for r in result.scalars().all()]
+    rows = await fetch_page(
+        db, query, [WarehouseOutbound.apply_date, WarehouseOutbound.id], response,
+        descending=True, page_size=page_size, cursor=cursor, page=page, include_total=include_total,
+    )
+    return [WarehouseOutboundResponse.model_validate(r) for r in rows]
 
 
 @router.get("/warehouse/outbound/count")
@@ -230,7 +287,7 @@ async def count_warehouse_outbound(
     material_name: Optional[str] = Query(None),
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     user: User = Depends(get_current_user),
 ):
     """获取出库明细总数"""
@@ -250,8 +307,10 @@ async def count_warehouse_outbound(
 
 
 @router.get("/warehouse/outbound/stats", response_model=WarehouseOutboundStatsResponse)
+@conditional("procurement")
+@cached("warehouse.outbound_stats", ttl=300, tags=("procurement",))
 async def warehouse_outbound_stats(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     user: User = Depends(get_current_user),
 ):
     """出库统计概览"""
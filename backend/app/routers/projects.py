@@ -8,13 +8,15 @@ from typing import Optional
 from app.database import get_db
 from app.models.user import User
 from app.models.project import Project, SubProject, MilestoneNode, ProgressRecord
-from app.models.budget import Expenditure
+from app.models.budget import CostItem, Expenditure
 from app.schemas.project import (
     ProjectCreate, ProjectUpdate, ProjectResponse,
     SubProjectCreate, SubProjectUpdate, SubProjectResponse,
     MilestoneCreate, MilestoneUpdate, MilestoneResponse,
     ProgressRecordCreate, ProgressRecordResponse,
 )
+from app.services import spend_aggregate, alert_engine
+from app.utils.response_cache import conditional
 from app.utils.security import get_current_user, require_role
 
 router = APIRouter(prefix="/api/projects", tags=["工程项目管理"])
@@ -79,7 +81,7 @@ async def update_project(
         raise HTTPException(status_code=404, detail="项目不存在")
     for field, value in req.model_dump(exclude_unset=True).items():
         setattr(project, field, value)
-    await db.flush()
+    await alert_engine.evaluate(db, project=True)
     await db.refresh(project)
     return ProjectResponse.model_validate(project)
 
@@ -87,6 +89,7 @@ async def update_project(
 # ===== Sub-project CRUD =====
 
 @router.get("/sub-projects/all", response_model=list[SubProjectResponse])
+@conditional("project")
 async def list_all_sub_projects(
     project_id: Optional[int] = Query(None),
     category: Optional[str] = Query(None),
@@ -117,6 +120,7 @@ async def create_sub_project(
     sp = SubProject(**req.model_dump())
     db.add(sp)
     await db.flush()
+    await alert_engine.evaluate(db, [sp.id])
     await db.refresh(sp)
     return await _enrich_sub_project(sp)
 
@@ -145,7 +149,7 @@ async def update_sub_project(
         raise HTTPException(status_code=404, detail="子工程不存在")
     for field, value in req.model_dump(exclude_unset=True).items():
         setattr(sp, field, value)
-    await db.flush()
+    await alert_engine.evaluate(db, [sp.id])
     await db.refresh(sp)
     return await _enrich_sub_project(sp)
 
@@ -161,7 +165,16 @@ async def delete_sub_project(
     sp = result.scalar_one_or_none()
     if not sp:
         raise HTTPException(status_code=404, detail="子工程不存在")
+    # Expenditures cascade with the sub-project and its cost items; take them out of the aggregates first
+    sp_ids = await spend_aggregate.retract_matching(
+        db,
+        Expenditure.sub_project_id == sp_id,
+        Expenditure.cost_item_id.in_(select(CostItem.id).where(CostItem.sub_project_id == sp_id)),
+    )
     await db.delete(sp)
+    await db.flush()
+    # Expenditures of other sub-projects booked against its cost items went too
+    await spend_aggregate.refresh_totals(db, sp_ids - {sp_id})
     return {"message": "删除成功"}
 
 
@@ -234,7 +247,7 @@ async def create_progress_record(
             sp.status = "in_progress"
         if req.percent >= 100:
             sp.status = "completed"
-    await db.flush()
+    await alert_engine.evaluate(db, [req.sub_project_id])
     await db.refresh(pr)
     return ProgressRecordResponse.model_validate(pr)
 
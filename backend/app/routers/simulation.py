@@ -6,12 +6,19 @@ from sqlalchemy import select, func
 from app.database import get_db
 from app.models.user import User
 from app.models.project import Project, SubProject
-from app.models.budget import BudgetCategory, CostItem, Expenditure
+from app.models.budget import BudgetCategory, CostItem, ExpenditureAggregate
 from app.models.simulation import Simulation, SimScenario
 from app.schemas.simulation import (
     WhatIfRequest, WhatIfResult,
     SimulationCreate, SimulationResponse,
     SensitivityRequest, SensitivityResult,
+    MonteCarloRequest, MonteCarloResult,
+    SimJobCreate, SimJobResponse,
+)
+from app.services.montecarlo import DISTRIBUTIONS, load_snapshot, run_montecarlo
+from app.services.sim_jobs import (
+    JOB_TYPES, ACTIVE_STATUSES, scenario_comparison, queued_state, submit_job, cancel_job,
+    live_status, job_state,
 )
 from app.utils.security import get_current_user, require_role
 
@@ -128,7 +135,7 @@ async def sensitivity_analysis(
     user: User = Depends(get_current_user),
 ):
     """敏感性分析：生成龙卷风图数据"""
-    spent_result = await db.execute(select(func.coalesce(func.sum(Expenditure.amount), 0)))
+    spent_result = await db.execute(select(func.coalesce(func.sum(ExpenditureAggregate.amount), 0)))
     base_total_cost = float(spent_result.scalar())
 
     sp_result = await db.execute(select(SubProject))
@@ -165,6 +172,27 @@ async def sensitivity_analysis(
     return SensitivityResult(items=items, base_total_cost=base_total_cost)
 
 
+@router.post("/montecarlo", response_model=MonteCarloResult)
+async def montecarlo_simulation(
+    req: MonteCarloRequest,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    """蒙特卡洛模拟：完工总成本分布、超概算概率、预备金动用期望"""
+    _check_montecarlo(req)
+    snapshot = await load_snapshot(db)
+    return MonteCarloResult(**run_montecarlo(snapshot, **req.model_dump()))
+
+
+def _check_montecarlo(req: MonteCarloRequest):
+    if req.distribution not in DISTRIBUTIONS:
+        raise HTTPException(status_code=400, detail=f"分布类型仅支持: {', '.join(DISTRIBUTIONS)}")
+    if not 1000 <= req.iterations <= 1000000:
+        raise HTTPException(status_code=400, detail="模拟次数需在 1000 - 1000000 之间")
+    if not 1 <= req.bins <= 200:
+        raise HTTPException(status_code=400, detail="直方图分组数需在 1 - 200 之间")
+
+
 @router.post("/scenarios", response_model=SimulationResponse)
 async def create_scenario_comparison(
     req: SimulationCreate,
@@ -186,29 +214,16 @@ async def create_scenario_comparison(
     await db.flush()
 
     for sc in req.scenarios:
-        budget_factor = sc.parameters.get("budget_factor", 1.0)
-        duration_factor = sc.parameters.get("duration_factor", 1.0)
-        efficiency_factor = sc.parameters.get("efficiency_factor", 1.0)
-
-        adjusted_cost = total_budget * budget_factor
-        estimated_return = total_budget * efficiency_factor * 1.2  # Simplified ROI model
-        roi = (estimated_return - adjusted_cost) / adjusted_cost * 100 if adjusted_cost > 0 else 0
-
+        outcome = scenario_comparison(total_budget, sc.parameters)
         scenario = SimScenario(
             simulation_id=sim.id,
             name=sc.name,
             description=sc.description,
             parameters=sc.parameters,
-            results={
-                "adjusted_total_budget": round(adjusted_cost, 2),
-                "estimated_duration_months": round(12 * duration_factor, 1),
-                "estimated_return": round(estimated_return, 2),
-                "budget_savings": round(total_budget - adjusted_cost, 2),
-                "efficiency_gain": round((efficiency_factor - 1) * 100, 2),
-            },
-            total_cost=round(adjusted_cost, 2),
-            total_return=round(estimated_return, 2),
-            roi=round(roi, 2),
+            results=outcome["results"],
+            total_cost=outcome["total_cost"],
+            total_return=outcome["total_return"],
+            roi=outcome["roi"],
         )
         db.add(scenario)
 
@@ -316,9 +331,106 @@ async def delete_simulation(
     sim = result.scalar_one_or_none()
     if not sim:
         raise HTTPException(status_code=404, detail="模拟不存在")
+    await cancel_job(db, sim.id)
     await db.delete(sim)
     return {"message": "删除成功"}
 
 
+@router.post("/jobs", response_model=SimJobResponse)
+async def submit_simulation_job(
+    req: SimJobCreate,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    """提交后台模拟任务：各方案在进程池中计算，立即返回任务编号"""
+    if req.job_type not in JOB_TYPES:
+        raise HTTPException(status_code=400, detail=f"任务类型仅支持: {', '.join(JOB_TYPES)}")
+    if not req.scenarios:
+        raise HTTPException(status_code=400, detail="至少需要一个方案")
+
+    parameters = []
+    for sc in req.scenarios:
+        if req.job_type == "montecarlo":
+            try:
+                mc = MonteCarloRequest(**sc.parameters)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"方案「{sc.name}」参数错误: {e}")
+            _check_montecarlo(mc)
+            parameters.append(mc.model_dump())
+        else:
+            parameters.append(sc.parameters)
+
+    snapshot = await load_snapshot(db)
+    sim = Simulation(name=req.name, description=req.description, sim_type=req.job_type, created_by=user.id)
+    db.add(sim)
+    await db.flush()
+    scenarios = [
+        SimScenario(
+            simulation_id=sim.id, name=sc.name, description=sc.description, parameters=params,
+            results=queued_state(),
+        )
+        for sc, params in zip(req.scenarios, parameters)
+    ]
+    db.add_all(scenarios)
+    # Workers write results through their own sessions, so the rows must be visible first
+    await db.commit()
+    submit_job(sim, scenarios, snapshot)
+    return _job_response(sim, scenarios)
+
+
+@router.get("/jobs/{job_id}", response_model=SimJobResponse)
+async def get_simulation_job(job_id: int, db: AsyncSession = Depends(get_db), user: User = Depends(get_current_user)):
+    """查询后台模拟任务进度与结果"""
+    sim, scenarios = await _load_job(db, job_id)
+    return _job_response(sim, scenarios)
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=SimJobResponse)
+async def cancel_simulation_job(job_id: int, db: AsyncSession = Depends(get_db), user: User = Depends(get_current_user)):
+    """取消后台模拟任务中尚未完成的方案"""
+    sim, scenarios = await _load_job(db, job_id)
+    await cancel_job(db, sim.id)  # updates the same identity-mapped rows
+    return _job_response(sim, scenarios)
+
+
+async def _load_job(db: AsyncSession, job_id: int):
+    result = await db.execute(select(Simulation).where(Simulation.id == job_id))
+    sim = result.scalar_one_or_none()
+    if not sim or sim.sim_type not in JOB_TYPES:
+        raise HTTPException(status_code=404, detail="模拟任务不存在")
+    sc_result = await db.execute(
+        select(SimScenario).where(SimScenario.simulation_id == sim.id).order_by(SimScenario.id)
+    )
+    return sim, sc_result.scalars().all()
+
+
+def _job_response(sim: Simulation, scenarios) -> SimJobResponse:
+    items, statuses = [], []
+    for s in scenarios:
+        results = dict(s.results or {})
+        status = live_status(sim.id, s.id, results.get("status"))
+        if status:
+            results["status"] = status
+        statuses.append(status)
+        items.append(ScenarioResponse(
+            id=s.id, simulation_id=s.simulation_id, name=s.name,
+            description=s.description, parameters=s.parameters,
+            results=results, total_cost=s.total_cost,
+            total_return=s.total_return, roi=s.roi, created_at=s.created_at,
+        ))
+    status, progress = job_state(statuses)
+    return SimJobResponse(
+        job_id=sim.id,
+        name=sim.name,
+        job_type=sim.sim_type,
+        status=status,
+        progress=progress,
+        total=len(statuses),
+        finished=sum(1 for st in statuses if st not in ACTIVE_STATUSES),
+        created_at=sim.created_at,
+        scenarios=items,
+    )
+
+
 # Import ScenarioResponse at module level to avoid issues
 from app.schemas.simulation import ScenarioResponse
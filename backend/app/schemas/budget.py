@@ -2,7 +2,7 @@
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import date
-from app.schemas.types import FormattedDatetime
+from app.schemas.types import FormattedDatetime, OptionalFormattedDatetime
 
 
 class BudgetCategoryCreate(BaseModel):
@@ -108,3 +108,20 @@ class ExpenditureResponse(BaseModel):
 class ExpenditureBatchImport(BaseModel):
     """Schema for batch importing expenditures from Excel."""
     records: List[ExpenditureCreate]
+
+
+class ExpenditureImportResponse(BaseModel):
+    """Background expenditure import job status."""
+    id: int
+    kind: str  # upload, batch, stream
+    filename: Optional[str] = None
+    status: str  # queued, running, completed, failed
+    rows: int  # rows parsed so far, valid or rejected
+    inserted: int
+    rejected: int
+    rows_per_sec: Optional[float] = None
+    message: Optional[str] = None
+    errors: List[str] = []  # first rejected rows
+    created_at: FormattedDatetime
+    started_at: OptionalFormattedDatetime = None
+    finished_at: OptionalFormattedDatetime = None
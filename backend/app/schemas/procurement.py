@@ -59,6 +59,23 @@ class ProcurementRecordResponse(BaseModel):
         from_attributes = True
 
 
+class MaterialSearchHit(BaseModel):
+    """One ranked material search hit (procurement or warehouse outbound record)."""
+    source: str  # procurement, warehouse
+    id: int
+    score: Optional[float] = None  # bm25, lower is better; None when FTS is unavailable
+    material_name: str
+    specification: Optional[str] = None
+    material_code: Optional[str] = None
+    project_name: Optional[str] = None
+    team: Optional[str] = None
+    unit: Optional[str] = None
+    month: Optional[int] = None
+    apply_date: Optional[date] = None
+    quantity: Optional[float] = None
+    amount_rmb: Optional[float] = None  # 人民币元
+
+
 class WarehouseOutboundResponse(BaseModel):
     id: int
     team: Optional[str]
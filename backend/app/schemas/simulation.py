@@ -1,5 +1,5 @@
 """Simulation schemas."""
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 from app.schemas.types import FormattedDatetime
 
@@ -85,6 +85,62 @@ class SensitivityResult(BaseModel):
     base_total_cost: float
 
 
+class MonteCarloRequest(BaseModel):
+    """Monte Carlo cost-overrun simulation request."""
+    iterations: int = 100000
+    distribution: str = "triangular"  # triangular, pert
+    optimistic_pct: float = Field(10, ge=0, le=100)  # remaining cost lower bound: -x%
+    pessimistic_pct: float = Field(30, ge=0, le=100)  # remaining cost upper bound: +x% (or cost trend if worse)
+    seed: Optional[int] = None
+    bins: int = 30
+
+
+class MonteCarloResult(BaseModel):
+    """Monte Carlo simulation result (amounts in 万元, probabilities in %)."""
+    iterations: int
+    distribution: str
+    unit_count: int
+    total_budget: float
+    usable_budget: float
+    reserve_budget: float
+    spent_to_date: float
+    mean_total_cost: float
+    std_total_cost: float
+    p50_total_cost: float
+    p80_total_cost: float
+    p95_total_cost: float
+    min_total_cost: float
+    max_total_cost: float
+    overrun_probability: float
+    reserve_usage_probability: float
+    expected_reserve_draw: float
+    expected_overrun: float
+    histogram: List[Dict[str, Any]]
+    top_uncertain_items: List[Dict[str, Any]]
+    elapsed_ms: float
+
+
+class SimJobCreate(BaseModel):
+    """Submit a background simulation job (one worker task per scenario)."""
+    name: str
+    description: Optional[str] = None
+    job_type: str = "montecarlo"  # montecarlo, scenario
+    scenarios: List[ScenarioCreate]  # parameters: MonteCarloRequest fields, or scenario factors
+
+
+class SimJobResponse(BaseModel):
+    """Background simulation job status."""
+    job_id: int
+    name: str
+    job_type: str
+    status: str  # queued, running, completed, failed, cancelled
+    progress: float  # % of scenarios finished
+    total: int
+    finished: int
+    created_at: FormattedDatetime
+    scenarios: List[ScenarioResponse] = []
+
+
 class DashboardSummary(BaseModel):
     """Dashboard overview data."""
     total_budget: float
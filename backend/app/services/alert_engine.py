@@ -0,0 +1,236 @@
+"""Incremental alert evaluation.
+
+Each rule looks at a single object (a sub-project or the project), so a write
+only re-evaluates what it touched: expenditure writes check the affected
+sub-projects and the project burn rate, progress and budget edits check one
+sub-project, and project edits check the burn rate. ``full_check`` still sweeps
+everything, for the manual check endpoint and for schedule delays, which grow
+with the calendar rather than with writes.
+
+Open alerts are indexed in memory by (alert_type, related_type, related_id),
+so finding the alert to update takes no query per candidate. The index is
+per process: each evaluation first picks up alerts created by other workers
+(ids above the index's high-water mark), an entry whose alert was rolled back
+or resolved elsewhere is dropped on first use, and every full check reloads it.
+Alerts created by a session enter the index only once that session commits;
+until then they are kept in the session's ``info``.
+"""
+import datetime
+from typing import Iterable, NamedTuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy import event, select, func
+
+from app.config import settings
+from app.models.project import Project, SubProject
+from app.models.budget import Expenditure, ExpenditureAggregate
+from app.models.alert import AlertLog
+
+AlertKey = tuple[str, str, int]  # (alert_type, related_type, related_id)
+
+_open_index: dict[AlertKey, int] | None = None
+_high_water = 0  # largest alert id seen by the index
+_PENDING = "pending_open_alerts"  # session.info key: alerts created in the open transaction
+
+
+class Finding(NamedTuple):
+    alert_type: str
+    level: str
+    title: str
+    message: str
+
+
+# ── Rules (pure) ──
+
+def budget_rule(sp: SubProject) -> Finding | None:
+    if not sp.allocated_budget or sp.allocated_budget <= 0:
+        return None
+    ratio = (sp.actual_spent or 0) / sp.allocated_budget
+    if ratio >= settings.ALERT_RED_THRESHOLD:
+        msg = f"子工程「{sp.name}」概算使用率已达 {ratio*100:.1f}%，概算 {sp.allocated_budget:.2f}万元，已支出 {sp.actual_spent:.2f}万元"
+        return Finding("budget_overrun", "red", "概算严重超支预警", msg)
+    if ratio >= settings.ALERT_YELLOW_THRESHOLD:
+        msg = f"子工程「{sp.name}」概算使用率已达 {ratio*100:.1f}%，请注意控制支出"
+        return Finding("budget_overrun", "yellow", "概算超支预警", msg)
+    return None
+
+
+def schedule_rule(sp: SubProject, today: datetime.date) -> Finding | None:
+    if sp.status not in ("in_progress", "not_started") or not (sp.planned_end and sp.planned_start):
+        return None
+    total_days = (sp.planned_end - sp.planned_start).days or 1
+    elapsed_days = (today - sp.planned_start).days
+    expected_progress = min(100, elapsed_days / total_days * 100)
+    lag = expected_progress - (sp.progress_percent or 0)
+    if lag <= settings.PROGRESS_DELAY_THRESHOLD * 100:
+        return None
+    level = "yellow" if lag < 20 else "red"
+    msg = f"子工程「{sp.name}」期望进度 {expected_progress:.1f}%，实际进度 {sp.progress_percent:.1f}%，落后 {lag:.1f}%"
+    return Finding("schedule_delay", level, "工期延误预警", msg)
+
+
+def burn_rate_rule(project: Project, total_spent: float, first_date, today: datetime.date) -> Finding | None:
+    if not project.end_date or not first_date:
+        return None
+    remaining_months = max(1, (project.end_date - today).days / 30)
+    months_elapsed = max(1, (today - first_date).days / 30)
+    monthly_burn = total_spent / months_elapsed
+    projected_total = total_spent + monthly_burn * remaining_months
+    if projected_total <= project.total_budget:
+        return None
+    level = "red" if projected_total > project.total_budget * 1.1 else "yellow"
+    msg = f"按当前月均消耗 {monthly_burn:.2f}万元/月，预计总支出将达 {projected_total:.2f}万元，超出概算 {projected_total - project.total_budget:.2f}万元"
+    return Finding("burn_rate", level, "消耗速率预警", msg)
+
+
+# ── Open-alert index ──
+
+async def _merge_open_alerts(db: AsyncSession, index: dict[AlertKey, int], after_id: int):
+    global _high_water
+    result = await db.execute(
+        select(AlertLog.id, AlertLog.alert_type, AlertLog.related_type, AlertLog.related_id)
+        .where(AlertLog.is_resolved == False, AlertLog.id > after_id)
+        .order_by(AlertLog.created_at, AlertLog.id)
+    )
+    own = set(db.info.get(_PENDING, {}).values())  # this transaction's, not committed yet
+    # Later rows win, matching the old "latest unresolved" lookup
+    for r in result.all():
+        if r.id in own:
+            continue
+        index[(r.alert_type, r.related_type, r.related_id)] = r.id
+        _high_water = max(_high_water, r.id)
+
+
+async def _load_index(db: AsyncSession) -> dict[AlertKey, int]:
+    global _open_index
+    _open_index = {}
+    await _merge_open_alerts(db, _open_index, 0)
+    return _open_index
+
+
+async def _index(db: AsyncSession) -> dict[AlertKey, int]:
+    if _open_index is None:
+        return await _load_index(db)
+    await _merge_open_alerts(db, _open_index, _high_water)
+    return _open_index
+
+
+def forget(alert: AlertLog):
+    """Drop a resolved alert from the index."""
+    if _open_index is None:
+        return
+    key = (alert.alert_type, alert.related_type, alert.related_id)
+    if _open_index.get(key) == alert.id:
+        del _open_index[key]
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session):
+    pending = session.info.pop(_PENDING, None)
+    if pending and _open_index is not None:
+        # _high_water is left alone: merging from it also picks up other workers' alerts
+        _open_index.update(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session):
+    session.info.pop(_PENDING, None)
+
+
+# ── Evaluation ──
+
+class _Run:
+    """Collects the outcome of one evaluation pass."""
+
+    def __init__(self, db: AsyncSession, index: dict[AlertKey, int]):
+        self.db = db
+        self.index = index
+        self.created: list[AlertLog] = []
+        self.updated: list[str] = []
+
+    async def apply(self, finding: Finding | None, related_type: str, related_id: int, related_name: str):
+        if finding is None:
+            return
+        key = (finding.alert_type, related_type, related_id)
+        alert = None
+        pending = self.db.info.get(_PENDING, {})
+        alert_id = pending.get(key, self.index.get(key))
+        if alert_id is not None:
+            alert = await self.db.get(AlertLog, alert_id)
+            if alert is None or alert.is_resolved or (alert.alert_type, alert.related_type, alert.related_id) != key:
+                pending.pop(key, None)
+                if self.index.get(key) == alert_id:
+                    del self.index[key]
+                alert = None
+        if alert is not None:
+            alert.level = finding.level
+            alert.message = finding.message
+            self.updated.append(alert.title)
+            return
+        alert = AlertLog(
+            alert_type=finding.alert_type, level=finding.level,
+            title=finding.title, message=finding.message,
+            related_type=related_type, related_id=related_id, related_name=related_name,
+        )
+        self.db.add(alert)
+        self.created.append(alert)
+
+    async def finish(self) -> dict:
+        await self.db.flush()
+        if self.created:
+            pending = self.db.info.setdefault(_PENDING, {})
+            for alert in self.created:
+                pending[(alert.alert_type, alert.related_type, alert.related_id)] = alert.id
+        return {"new": [a.title for a in self.created], "updated": self.updated}
+
+
+async def _evaluate_sub_projects(run: _Run, sub_projects: Iterable[SubProject], today: datetime.date):
+    sub_projects = list(sub_projects)
+    for sp in sub_projects:
+        await run.apply(budget_rule(sp), "sub_project", sp.id, sp.name)
+    for sp in sub_projects:
+        await run.apply(schedule_rule(sp, today), "sub_project", sp.id, sp.name)
+
+
+async def _evaluate_project(run: _Run, today: datetime.date):
+    proj_result = await run.db.execute(select(Project).order_by(Project.id).limit(1))
+    project = proj_result.scalar_one_or_none()
+    if not project or not project.end_date:
+        return
+    total_result = await run.db.execute(select(func.coalesce(func.sum(ExpenditureAggregate.amount), 0)))
+    first_result = await run.db.execute(select(func.min(Expenditure.record_date)))
+    finding = burn_rate_rule(project, float(total_result.scalar()), first_result.scalar(), today)
+    await run.apply(finding, "project", project.id, project.name)
+
+
+async def evaluate(db: AsyncSession, sub_project_ids: Iterable[int] = (), project: bool = False) -> dict:
+    """Re-evaluate the given sub-projects and, optionally, the project burn rate."""
+    run = _Run(db, await _index(db))
+    today = datetime.date.today()
+    ids = set(sub_project_ids)
+    if ids:
+        result = await db.execute(select(SubProject).where(SubProject.id.in_(ids)))
+        await _evaluate_sub_projects(run, result.scalars().all(), today)
+    if project:
+        await _evaluate_project(run, today)
+    return await run.finish()
+
+
+async def on_spend_changed(db: AsyncSession, sub_project_ids: Iterable[int]) -> dict:
+    """Hook for expenditure writes: spend moves both sub-project usage and the burn rate."""
+    return await evaluate(db, sub_project_ids, project=True)
+
+
+async def full_check(db: AsyncSession) -> dict:
+    """Evaluate every sub-project and the project with a freshly loaded index."""
+    index = await _load_index(db)
+    if index:
+        # Warm the identity map so updates below need no per-alert lookups
+        await db.execute(select(AlertLog).where(AlertLog.id.in_(list(index.values()))))
+    run = _Run(db, index)
+    today = datetime.date.today()
+    result = await db.execute(select(SubProject))
+    await _evaluate_sub_projects(run, result.scalars().all(), today)
+    await _evaluate_project(run, today)
+    return await run.finish()
@@ -0,0 +1,127 @@
+"""Scheduled alert scanning.
+
+Every uvicorn worker runs an APScheduler interval job, but only the holder of
+the lease in ``alert_scan_state`` sweeps; the lease is taken with a single
+conditional UPDATE and expires after two intervals, so another worker takes
+over if the leader dies. The leader skips the sweep when the change watermark
+(a fingerprint of every alert input, plus today's date for schedule delays)
+matches the one recorded by the last completed scan.
+"""
+import datetime
+import os
+import socket
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, func, or_
+
+from app.config import settings
+from app.database import async_session
+from app.models.project import Project, SubProject
+from app.models.budget import ExpenditureAggregate
+from app.models.alert import AlertScanState
+from app.services import alert_engine
+from app.utils.dialect import upsert
+
+STATE_ID = 1
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+_scheduler: AsyncIOScheduler | None = None
+
+
+async def ensure_state_row(db: AsyncSession):
+    """Create the state row once (safe when several workers start together)."""
+    await db.execute(upsert(db, AlertScanState).values(id=STATE_ID).on_conflict_do_nothing())
+
+
+async def acquire_lease(db: AsyncSession, ttl: datetime.timedelta) -> bool:
+    """Take or renew the leader lease. True if this worker is the leader."""
+    now = datetime.datetime.utcnow()
+    result = await db.execute(
+        update(AlertScanState)
+        .where(
+            AlertScanState.id == STATE_ID,
+            or_(
+                AlertScanState.leader == WORKER_ID,
+                AlertScanState.leader.is_(None),
+                AlertScanState.lease_until < now,
+            ),
+        )
+        .values(leader=WORKER_ID, lease_until=now + ttl)
+    )
+    return result.rowcount == 1
+
+
+async def release_lease(db: AsyncSession):
+    await db.execute(
+        update(AlertScanState)
+        .where(AlertScanState.id == STATE_ID, AlertScanState.leader == WORKER_ID)
+        .values(leader=None, lease_until=None)
+    )
+
+
+async def compute_watermark(db: AsyncSession) -> str:
+    """Fingerprint of the alert inputs; changes whenever a scan could change its outcome."""
+    result = await db.execute(select(
+        select(func.count(SubProject.id)).scalar_subquery(),
+        select(func.max(SubProject.updated_at)).scalar_subquery(),
+        select(func.max(Project.updated_at)).scalar_subquery(),
+        select(func.coalesce(func.sum(ExpenditureAggregate.record_count), 0)).scalar_subquery(),
+        select(func.coalesce(func.sum(ExpenditureAggregate.amount), 0)).scalar_subquery(),
+    ))
+    sp_count, sp_updated, proj_updated, records, amount = result.one()
+    return f"{datetime.date.today()}|{sp_count}|{sp_updated}|{proj_updated}|{records}|{float(amount):.4f}"
+
+
+async def scan_once() -> dict | None:
+    """One scheduled tick. Returns the sweep report, or None when skipped."""
+    ttl = datetime.timedelta(minutes=2 * settings.ALERT_SCAN_INTERVAL_MINUTES)
+    async with async_session() as db:
+        leader = await acquire_lease(db, ttl)
+        await db.commit()
+    if not leader:
+        return None
+
+    async with async_session() as db:
+        watermark = await compute_watermark(db)
+        state = await db.get(AlertScanState, STATE_ID)
+        if state.watermark == watermark:
+            return None
+        report = await alert_engine.full_check(db)
+        state.watermark = watermark
+        state.last_run_at = datetime.datetime.utcnow()
+        await db.commit()
+    print(f"[OK] Scheduled alert scan: {len(report['new'])} new, {len(report['updated'])} updated")
+    return report
+
+
+async def _tick():
+    try:
+        await scan_once()
+    except Exception as e:
+        print(f"[WARN] Scheduled alert scan failed: {e}")
+
+
+def start():
+    """Start the interval job (no-op when disabled)."""
+    global _scheduler
+    if not settings.ALERT_SCAN_ENABLED or _scheduler is not None:
+        return
+    _scheduler = AsyncIOScheduler()
+    _scheduler.add_job(
+        _tick, "interval", minutes=settings.ALERT_SCAN_INTERVAL_MINUTES,
+        id="alert_scan", max_instances=1, coalesce=True,
+    )
+    _scheduler.start()
+
+
+async def shutdown():
+    """Stop the job and hand the lease over right away instead of waiting for expiry."""
+    global _scheduler
+    if _scheduler is None:
+        return
+    _scheduler.shutdown(wait=False)
+    _scheduler = None
+    async with async_session() as db:
+        await release_lease(db)
+        await db.commit()
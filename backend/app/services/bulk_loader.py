@@ -0,0 +1,56 @@
+"""Bulk inserts for the seed and import pipelines.
+
+``BulkLoader.insert`` writes plain dicts with a Core ``insert()`` executed
+over batches of ``BATCH_ROWS`` parameter sets. SQLAlchemy renders each batch
+as one multi-row ``INSERT ... VALUES``, with no ORM unit of work and no flush
+per row. Column defaults (``created_at`` and the like) still apply.
+
+When asked, it returns the new primary keys in input order. On SQLite they
+are allocated up front as ``max(id) + 1 ...``, the same ids SQLite itself
+would assign. ``RETURNING`` with ``sort_by_parameter_order`` would fall back
+to one statement per row there. If a concurrent writer takes an id first,
+the insert fails with an IntegrityError; it never assigns the wrong id.
+Other backends use the sorted ``RETURNING``. Every call is timed so that a pipeline can report per-table row
+counts and timings when it finishes.
+"""
+import time
+
+from sqlalchemy import insert, select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.utils.dialect import dialect_name
+
+BATCH_ROWS = 1000
+
+
+class BulkLoader:
+    """Core bulk inserts through one session, with per-table row counts and timings."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.stats: dict[str, list] = {}  # table -> [rows, seconds]
+
+    async def insert(self, model, rows: list[dict], return_ids: bool = False) -> list[int]:
+        """Insert ``rows`` (all with the same keys). Returns their ids if ``return_ids``."""
+        table = model.__table__
+        stmt = insert(table)
+        start = time.perf_counter()
+        ids = []
+        returning = return_ids and dialect_name(self.db) != "sqlite"
+        if returning:
+            stmt = stmt.returning(table.c.id, sort_by_parameter_order=True)
+        elif return_ids and rows:
+            last = (await self.db.execute(select(func.coalesce(func.max(table.c.id), 0)))).scalar()
+            ids = list(range(last + 1, last + 1 + len(rows)))
+            rows = [dict(row, id=i) for row, i in zip(rows, ids)]
+        for i in range(0, len(rows), BATCH_ROWS):
+            result = await self.db.execute(stmt, rows[i:i + BATCH_ROWS])
+            if returning:
+                ids.extend(result.scalars().all())
+        entry = self.stats.setdefault(table.name, [0, 0.0])
+        entry[0] += len(rows)
+        entry[1] += time.perf_counter() - start
+        return ids
+
+    def report(self) -> str:
+        return ", ".join(f"{name} {n} rows {secs * 1000:.1f} ms" for name, (n, secs) in self.stats.items())
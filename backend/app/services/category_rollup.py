@@ -0,0 +1,54 @@
+"""Budget category spend rollup.
+
+Computes actual spend for every node of the category tree with one grouped
+query over the expenditure aggregates and an in-memory fold from the leaves up, so callers
+make a constant number of round trips regardless of tree size.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+
+from app.models.budget import BudgetCategory, ExpenditureAggregate
+from app.services.spend_aggregate import NO_REF
+
+
+def rollup_spend(categories: list[BudgetCategory], direct_spend: dict[int, float]) -> dict[int, float]:
+    """Fold direct spend up the tree: each node gets its own spend plus all descendants'."""
+    children: dict[int, list[int]] = {}
+    ids = {c.id for c in categories}
+    roots = []
+    for c in categories:
+        if c.parent_id and c.parent_id in ids:
+            children.setdefault(c.parent_id, []).append(c.id)
+        else:
+            roots.append(c.id)
+
+    rolled: dict[int, float] = {}
+    # Iterative post-order walk (no recursion limit on deep trees)
+    for root in roots:
+        stack = [(root, False)]
+        while stack:
+            node, visited = stack.pop()
+            if visited:
+                rolled[node] = direct_spend.get(node, 0.0) + sum(rolled[ch] for ch in children.get(node, []))
+            else:
+                stack.append((node, True))
+                stack.extend((ch, False) for ch in children.get(node, []))
+    return rolled
+
+
+async def load_direct_spend(db: AsyncSession) -> dict[int, float]:
+    """Spend booked directly against each category (one grouped query)."""
+    result = await db.execute(
+        select(ExpenditureAggregate.category_id, func.sum(ExpenditureAggregate.amount))
+        .where(ExpenditureAggregate.category_id != NO_REF)
+        .group_by(ExpenditureAggregate.category_id)
+    )
+    return {cat_id: float(total or 0) for cat_id, total in result.all()}
+
+
+async def load_category_rollup(db: AsyncSession) -> tuple[list[BudgetCategory], dict[int, float]]:
+    """Load all categories (ordered by level, sort_order) and their subtree spend."""
+    result = await db.execute(select(BudgetCategory).order_by(BudgetCategory.level, BudgetCategory.sort_order))
+    categories = list(result.scalars().all())
+    direct_spend = await load_direct_spend(db)
+    return categories, rollup_spend(categories, direct_spend)
@@ -0,0 +1,436 @@
+"""Vectorized expenditure import from Excel / CSV ledgers.
+
+A ledger is validated a whole column at a time: dates, amounts and ids are
+coerced with pandas, and ids are checked against the existing sub-project,
+cost item and category ids with ``isin`` set lookups. Each failing check adds
+its message to the error vector for the rows it rejects. The valid rows are
+then inserted with the bulk loader, and their aggregate deltas are applied
+from a single groupby. Nothing here walks the rows one at a time, so a
+100k-row ledger imports in seconds.
+
+Row numbers in error messages are spreadsheet rows: header on row 1, so the
+first data row (frame index 0) is row 2.
+
+Every import runs chunked (``run_import``), from streaming uploads and from
+the queued import jobs (``app.services.import_jobs``) alike. The input is
+spooled to a file and read ``CHUNK_ROWS`` rows at a time: CSV through pandas'
+chunked reader, XLSX through openpyxl's read-only mode. Each chunk is
+validated and inserted as above, then committed with the import's checkpoint
+row (``ExpenditureImport``). Memory is bounded by the chunk size whatever the
+file size, and an interrupted import resumes after its last committed chunk.
+"""
+import asyncio
+import datetime
+import hashlib
+import os
+import tempfile
+import time
+from typing import AsyncIterator, Iterator
+
+import anyio
+import pandas as pd
+from sqlalchemy import select, update, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session
+from app.models.budget import Expenditure, BudgetCategory, CostItem, ExpenditureImport
+from app.models.project import SubProject
+from app.services import spend_aggregate, alert_engine
+from app.services.bulk_loader import BulkLoader
+
+# Ledger header -> Expenditure column
+COLUMNS = {
+    "子工程ID": "sub_project_id",
+    "日期": "record_date",
+    "金额": "amount",
+    "描述": "description",
+    "凭证号": "voucher_no",
+    "科目ID": "category_id",
+    "成本项ID": "cost_item_id",
+    "来源": "source",
+}
+REQUIRED_COLUMNS = {"子工程ID", "日期", "金额"}
+TEXT_COLUMNS = {"描述": str, "凭证号": str, "来源": str}
+# Optional reference columns: header -> reference set name
+OPTIONAL_REFS = {"科目ID": "category", "成本项ID": "cost_item"}
+MAX_REPORTED_ERRORS = 200
+
+# Streaming mode
+STREAM_SUFFIXES = (".csv", ".xlsx")  # .xls has no streaming reader; queued jobs read it whole
+CHUNK_ROWS = 10000
+SPOOL_CHUNK = 1024 * 1024
+# A running import not checkpointed for this long is taken to be dead and may be resumed
+STALE_AFTER = datetime.timedelta(minutes=5)
+
+
+async def load_reference_ids(db: AsyncSession) -> dict[str, set[int]]:
+    """Existing ids the ledger may reference."""
+    refs = {}
+    for name, model in (("sub_project", SubProject), ("category", BudgetCategory), ("cost_item", CostItem)):
+        refs[name] = set((await db.execute(select(model.id))).scalars().all())
+    return refs
+
+
+def _id_column(raw: pd.Series, ref_ids: set[int], header: str, required: bool, problems: list):
+    """Coerce an id column; record invalid and unknown ids in ``problems``."""
+    ids = pd.to_numeric(raw, errors="coerce")
+    blank = raw.astype("string").str.strip().fillna("").eq("").astype(bool)
+    invalid = ~blank & (ids.isna() | (ids % 1 != 0))
+    unknown = ~blank & ~invalid & ~ids.isin(ref_ids)
+    if required:
+        problems.append((blank, f"{header}为空"))
+    problems.append((invalid, f"{header}无效"))
+    problems.append((unknown, f"{header}不存在: " + ids.where(unknown).astype("Int64").astype("string")))
+    return ids.where(~(blank | invalid | unknown))
+
+
+def validate_frame(df: pd.DataFrame, refs: dict[str, set[int]]) -> tuple[pd.DataFrame, pd.Series]:
+    """Split a ledger into (valid rows in Expenditure columns, per-row error messages).
+
+    The error Series is indexed like ``df`` and holds only the rejected rows.
+    """
+    problems: list[tuple[pd.Series, object]] = []
+
+    sp_ids = _id_column(df["子工程ID"], refs["sub_project"], "子工程ID", True, problems)
+    dates = _dates(df["日期"])
+    problems.append((dates.isna(), "日期无效"))
+    amounts = pd.to_numeric(df["金额"], errors="coerce")
+    problems.append((~amounts.abs().lt(float("inf")), "金额无效"))
+
+    optional = {}
+    for header, ref in OPTIONAL_REFS.items():
+        if header in df.columns:
+            optional[COLUMNS[header]] = _id_column(df[header], refs[ref], header, False, problems)
+        else:
+            optional[COLUMNS[header]] = pd.Series(float("nan"), index=df.index)
+
+    messages = pd.concat([
+        (msg[mask] if isinstance(msg, pd.Series) else pd.Series(msg, index=df.index[mask]))
+        for mask, msg in problems if mask.any()
+    ] or [pd.Series(dtype="string")])
+    errors = messages.groupby(level=0).agg("; ".join) if len(messages) else messages
+    ok = ~df.index.isin(errors.index)
+
+    valid = pd.DataFrame({
+        "sub_project_id": sp_ids[ok].astype("int64"),
+        "record_date": dates[ok].dt.date,
+        "amount": amounts[ok].astype("float64"),
+        "category_id": optional["category_id"][ok].astype("Int64"),
+        "cost_item_id": optional["cost_item_id"][ok].astype("Int64"),
+        "description": _text(df, "描述")[ok],
+        "voucher_no": _text(df, "凭证号")[ok],
+    })
+    if "来源" in df.columns:
+        valid["source"] = _text(df, "来源")[ok]
+    return valid, errors.sort_index()
+
+
+def _dates(raw: pd.Series) -> pd.Series:
+    # One inferred format for the whole column, then a per-value parse for the stragglers
+    dates = pd.to_datetime(raw, errors="coerce")
+    retry = dates.isna() & raw.notna()
+    if retry.any():
+        dates[retry] = pd.to_datetime(raw[retry].astype(str), errors="coerce", format="mixed")
+    return dates
+
+
+def _text(df: pd.DataFrame, header: str) -> pd.Series:
+    if header not in df.columns:
+        return pd.Series(None, index=df.index, dtype=object)
+    values = df[header].astype("string").str.strip()
+    return values.where(values.notna() & (values != ""), None).astype(object)
+
+
+def format_errors(errors: pd.Series, limit: int = MAX_REPORTED_ERRORS) -> list[str]:
+    head = errors.iloc[:limit]
+    return [f"第{idx + 2}行: {msg}" for idx, msg in zip(head.index, head.values)]
+
+
+async def insert_valid(db: AsyncSession, valid: pd.DataFrame, user_id: int | None, source: str = "excel_import") -> tuple[set[int], set[int]]:
+    """Bulk insert validated rows and apply their aggregates.
+
+    Returns the affected (sub_project_ids, cost_item_ids) so the caller can
+    refresh their denormalized totals.
+    """
+    if valid.empty:
+        return set(), set()
+    if "source" in valid.columns:
+        valid = valid.assign(source=valid["source"].where(valid["source"].notna(), source))
+    # Column-wise tolist() yields Python scalars far faster than to_dict("records")
+    names = list(valid.columns)
+    columns = [valid[c].astype(object).where(valid[c].notna(), None).tolist() for c in names]
+    rows = [
+        {"source": source, **dict(zip(names, values)), "created_by": user_id}
+        for values in zip(*columns)
+    ]
+    await BulkLoader(db).insert(Expenditure, rows)
+
+    dates = pd.to_datetime(valid["record_date"])
+    keys = pd.DataFrame({
+        "sub_project_id": valid["sub_project_id"],
+        "category_id": valid["category_id"].fillna(spend_aggregate.NO_REF),
+        "cost_item_id": valid["cost_item_id"].fillna(spend_aggregate.NO_REF),
+        "month": dates.dt.year * 100 + dates.dt.month,
+        "amount": valid["amount"],
+    })
+    grouped = keys.groupby(["sub_project_id", "category_id", "cost_item_id", "month"])["amount"].agg(["sum", "size"])
+    await spend_aggregate.apply_deltas(db, {
+        (int(sp), int(cat), int(ci), f"{month // 100:04d}-{month % 100:02d}"): [float(total), int(count)]
+        for (sp, cat, ci, month), total, count in zip(grouped.index, grouped["sum"], grouped["size"])
+    })
+    return set(valid["sub_project_id"].tolist()), set(valid["cost_item_id"].dropna().astype(int).tolist())
+
+
+
+# ---------------------------------------------------------------------------
+# Streaming mode
+# ---------------------------------------------------------------------------
+
+def _spool_file(suffix: str) -> tuple[int, str]:
+    return tempfile.mkstemp(suffix=suffix, prefix="ledger_", dir=settings.IMPORT_SPOOL_DIR or None)
+
+
+async def spool_upload(file) -> tuple[str, str]:
+    """Copy an upload to a spool file. Returns (path, sha256 hex digest)."""
+    suffix = os.path.splitext(file.filename or "")[1]
+    digest = hashlib.sha256()
+    fd, path = _spool_file(suffix)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await file.read(SPOOL_CHUNK):
+                digest.update(chunk)
+                await asyncio.to_thread(out.write, chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path, digest.hexdigest()
+
+
+def spool_records(records: list[dict]) -> str:
+    """Write ``ExpenditureCreate`` dicts to a spool file as a CSV ledger. Returns its path."""
+    headers = {column: header for header, column in COLUMNS.items()}
+    df = pd.DataFrame.from_records(records, columns=list(headers)).rename(columns=headers)
+    fd, path = _spool_file(".csv")
+    with os.fdopen(fd, "w", encoding="utf-8", newline="") as out:
+        df.to_csv(out, index=False)
+    return path
+
+
+def ledger_columns(path: str, filename: str) -> list[str]:
+    """Header row of a spooled ledger."""
+    if filename.endswith(".csv"):
+        return list(pd.read_csv(path, nrows=0).columns)
+    if filename.endswith(".xls"):
+        return list(pd.read_excel(path, nrows=0).columns)
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        return _xlsx_header(next(wb.active.iter_rows(max_row=1, values_only=True), ()))
+    finally:
+        wb.close()
+
+
+def _xlsx_header(values) -> list[str]:
+    return [str(v) if v is not None else f"Unnamed: {i}" for i, v in enumerate(values)]
+
+
+def iter_chunks(path: str, filename: str) -> Iterator[pd.DataFrame]:
+    """The ledger CHUNK_ROWS rows at a time, indexed by data row (0 = spreadsheet row 2)."""
+    if filename.endswith(".csv"):
+        # The reader's RangeIndex carries on across chunks
+        with pd.read_csv(path, dtype=TEXT_COLUMNS, chunksize=CHUNK_ROWS) as reader:
+            yield from reader
+        return
+    if filename.endswith(".xls"):
+        # Legacy format, at most 65536 rows: read whole, hand out in chunks
+        df = pd.read_excel(path, dtype=TEXT_COLUMNS)
+        for start in range(0, len(df), CHUNK_ROWS):
+            yield df.iloc[start:start + CHUNK_ROWS]
+        return
+
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = _xlsx_header(next(rows, ()))
+        width = len(header)
+        batch, index = [], []
+        for i, values in enumerate(rows):
+            # Read-only sheets can carry formatted but empty rows; skip them, keeping row numbers
+            if all(v is None for v in values):
+                continue
+            batch.append((tuple(values) + (None,) * width)[:width])
+            index.append(i)
+            if len(batch) == CHUNK_ROWS:
+                yield _xlsx_frame(header, batch, index)
+                batch, index = [], []
+        if batch:
+            yield _xlsx_frame(header, batch, index)
+    finally:
+        wb.close()
+
+
+def _xlsx_frame(header: list[str], batch: list[tuple], index: list[int]) -> pd.DataFrame:
+    df = pd.DataFrame(batch, columns=header, index=index)
+    for column in TEXT_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].map(str, na_action="ignore")
+    return df
+
+
+def _id_list(value: str | None) -> set[int]:
+    return {int(v) for v in value.split(",")} if value else set()
+
+
+def _id_text(ids: set[int]) -> str | None:
+    return ",".join(str(i) for i in sorted(ids)) or None
+
+
+async def claim_import(db: AsyncSession, file_hash: str, filename: str, user_id: int | None) -> tuple[ExpenditureImport, bool]:
+    """Get or create the checkpoint for a file and mark it running.
+
+    Returns (checkpoint, claimed). Not claimed when the file was already
+    imported, or while another request is still importing it.
+    """
+    now = datetime.datetime.utcnow()
+    result = await db.execute(select(ExpenditureImport).where(ExpenditureImport.file_hash == file_hash))
+    record = result.scalar_one_or_none()
+    if record is None:
+        record = ExpenditureImport(
+            file_hash=file_hash, filename=filename, status="running",
+            rows_done=0, inserted=0, rejected=0, created_by=user_id, updated_at=now,
+        )
+        try:
+            async with db.begin_nested():
+                db.add(record)
+                await db.flush()
+            return record, True
+        except IntegrityError:
+            # A concurrent first upload of the same file inserted it first: claim it like a resume
+            result = await db.execute(select(ExpenditureImport).where(ExpenditureImport.file_hash == file_hash))
+            record = result.scalar_one()
+    if record.status == "completed":
+        return record, False
+    # Conditional update, so two uploads of the same file cannot both resume it
+    result = await db.execute(
+        update(ExpenditureImport)
+        .where(ExpenditureImport.id == record.id)
+        .where(or_(ExpenditureImport.status != "running", ExpenditureImport.updated_at < now - STALE_AFTER))
+        .values(status="running", filename=filename, message=None, updated_at=now)
+    )
+    await db.refresh(record)
+    return record, result.rowcount == 1
+
+
+def progress(record: ExpenditureImport, started: float, resumed_from: int) -> dict:
+    elapsed = time.perf_counter() - started
+    return {
+        "import_id": record.id,
+        "status": record.status,
+        "rows": record.rows_done,
+        "inserted": record.inserted,
+        "rejected": record.rejected,
+        "resumed_from": resumed_from,
+        "elapsed": round(elapsed, 2),
+        "rows_per_sec": _throughput(record, started, resumed_from),
+    }
+
+
+def _throughput(record: ExpenditureImport, started: float, resumed_from: int) -> float:
+    elapsed = time.perf_counter() - started
+    return round((record.rows_done - resumed_from) / elapsed) if elapsed > 0 else 0
+
+
+async def run_import(import_id: int, path: str, filename: str) -> AsyncIterator[dict]:
+    """Import a spooled ledger chunk by chunk; yields a progress dict per committed chunk.
+
+    Each chunk commits together with the checkpoint and the refreshed
+    denormalized totals of the ids it touched, so a crash loses at most the
+    chunk in flight and never leaves totals behind the committed rows. Alerts
+    are evaluated once the import ends, for every sub-project it touched
+    across all its runs, also when it fails.
+
+    A cancelled import (client disconnect on the stream, shutdown of a job
+    worker) raises out after its bookkeeping: a stream import is marked failed
+    so re-uploading the file resumes at once; a job goes back to ``queued``.
+    The bookkeeping runs shielded, as the request's cancel scope would cancel
+    each of its awaits again.
+    """
+    started = time.perf_counter()
+    chunks = iter_chunks(path, filename)
+    loop = asyncio.get_running_loop()
+    reading = None  # the reader thread's pending ``next(chunks)``
+    async with async_session() as db:
+        record = await db.get(ExpenditureImport, import_id)
+        resumed_from = record.rows_done
+        record.started_at = datetime.datetime.utcnow()
+        sp_all, ci_all = _id_list(record.sub_project_ids), _id_list(record.cost_item_ids)
+        await db.commit()
+        try:
+            refs = await load_reference_ids(db)
+            errors = record.errors.split("\n") if record.errors else []
+            yield progress(record, started, resumed_from)
+
+            while True:
+                reading = loop.run_in_executor(None, next, chunks, None)
+                # Shielded: a cancel leaves the read running, so the thread must finish before ``chunks`` closes
+                chunk = await asyncio.shield(reading)
+                if chunk is None:
+                    break
+                if chunk.index[-1] < record.rows_done:
+                    continue  # committed by an earlier run
+                chunk = chunk[chunk.index >= record.rows_done]
+                valid, rejected = await asyncio.to_thread(validate_frame, chunk, refs)
+                sp_ids, ci_ids = await insert_valid(db, valid, record.created_by)
+                await spend_aggregate.refresh_totals(db, sp_ids, ci_ids)
+
+                sp_all |= sp_ids
+                ci_all |= ci_ids
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors += format_errors(rejected, MAX_REPORTED_ERRORS - len(errors))
+                record.rows_done = int(chunk.index[-1]) + 1
+                record.inserted += len(valid)
+                record.rejected += len(rejected)
+                record.errors = "\n".join(errors) or None
+                record.sub_project_ids = _id_text(sp_all)
+                record.cost_item_ids = _id_text(ci_all)
+                record.rows_per_sec = _throughput(record, started, resumed_from)
+                record.updated_at = datetime.datetime.utcnow()
+                await db.commit()
+                yield progress(record, started, resumed_from)
+
+            await alert_engine.on_spend_changed(db, sp_all)
+            record.status = "completed"
+            record.finished_at = record.updated_at = datetime.datetime.utcnow()
+            await db.commit()
+            yield {
+                **progress(record, started, resumed_from),
+                "message": f"成功导入 {record.inserted} 条记录",
+                "count": record.inserted,
+                "errors": errors,
+            }
+        except BaseException as e:
+            cancelled = not isinstance(e, Exception)  # CancelledError / GeneratorExit
+            with anyio.CancelScope(shield=True):
+                if reading is not None:
+                    await asyncio.wait([reading])
+                chunks.close()  # closes the workbook
+                await db.rollback()
+                record = await db.get(ExpenditureImport, import_id)
+                if cancelled and record.kind != "stream":
+                    record.status, record.message = "queued", None
+                else:
+                    record.status = "failed"
+                    record.message = ("连接已断开，重新上传同一文件可从中断处继续" if cancelled else str(e))[:500]
+                record.updated_at = datetime.datetime.utcnow()
+                await db.commit()
+                # Spend of the chunks already committed
+                await alert_engine.on_spend_changed(db, sp_all)
+                await db.commit()
+            if cancelled:
+                raise
+            yield {**progress(record, started, resumed_from), "message": f"导入中断: {e}"}
@@ -0,0 +1,183 @@
+"""Background expenditure import jobs.
+
+``/api/expenditures/upload-excel`` and ``/api/expenditures/batch`` do not
+import inside the request. They spool their input to a file, record an
+``ExpenditureImport`` row with status ``queued`` and return the job at once.
+A pool of ``IMPORT_WORKERS`` asyncio workers takes job ids off an in-process
+queue and runs each through the chunked import
+(``expenditure_import.run_import``). That import commits every chunk together
+with the job's counters, so the row is always the job's live status, from
+any process: polled, or pushed as server-sent events by ``events``.
+
+Workers claim a job with a conditional ``queued -> running`` update, so a job
+queued twice still runs once. On startup, jobs a previous process left queued
+or running are queued again and resume after their last committed chunk.
+A failed job keeps its spool file and can be retried the same way.
+"""
+import asyncio
+import datetime
+import os
+from typing import AsyncIterator
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, or_
+
+from app.config import settings
+from app.database import async_session
+from app.models.budget import ExpenditureImport
+from app.schemas.budget import ExpenditureImportResponse
+from app.services import expenditure_import
+
+JOB_KINDS = ("upload", "batch")
+ACTIVE_STATUSES = ("queued", "running")
+POLL_INTERVAL = 1.0  # seconds between status reads of an event stream
+KEEPALIVE_EVERY = 15  # polls without a change before a keep-alive comment
+
+_queue: asyncio.Queue | None = None
+_workers: list[asyncio.Task] = []
+
+
+async def create_job(db: AsyncSession, kind: str, path: str, filename: str | None, user_id: int | None) -> ExpenditureImport:
+    """Record a queued job for a spooled input; commit before ``enqueue``."""
+    job = ExpenditureImport(
+        kind=kind, filename=filename, spool_path=path, status="queued",
+        rows_done=0, inserted=0, rejected=0, created_by=user_id,
+        updated_at=datetime.datetime.utcnow(),
+    )
+    db.add(job)
+    await db.flush()
+    return job
+
+
+def start():
+    """Start the worker pool (idempotent)."""
+    global _queue
+    if _queue is None:
+        _queue = asyncio.Queue()
+    while len(_workers) < settings.IMPORT_WORKERS:
+        _workers.append(asyncio.create_task(_worker()))
+
+
+async def shutdown():
+    global _queue
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _queue = None
+
+
+def enqueue(job_id: int):
+    start()
+    _queue.put_nowait(job_id)
+
+
+async def _worker():
+    while True:
+        job_id = await _queue.get()
+        try:
+            await run_job(job_id)
+        except Exception as e:
+            print(f"[WARN] Import job {job_id} failed: {type(e).__name__}: {e}")
+        finally:
+            _queue.task_done()
+
+
+async def run_job(job_id: int):
+    """Claim a queued job and import it; its row records progress and outcome."""
+    now = datetime.datetime.utcnow()
+    async with async_session() as db:
+        claimed = await db.execute(
+            update(ExpenditureImport)
+            .where(ExpenditureImport.id == job_id, ExpenditureImport.status == "queued")
+            .values(status="running", updated_at=now)
+        )
+        job = await db.get(ExpenditureImport, job_id)
+        await db.commit()
+    if claimed.rowcount != 1:
+        return  # finished, or taken by another worker
+
+    async for _ in expenditure_import.run_import(job.id, job.spool_path, job.filename or job.spool_path):
+        pass
+
+    async with async_session() as db:
+        job = await db.get(ExpenditureImport, job_id)
+        if job.status == "completed":
+            _remove_spool(job.spool_path)
+            job.spool_path = None
+            await db.commit()
+
+
+def _remove_spool(path: str | None):
+    if path and os.path.exists(path):
+        os.unlink(path)
+
+
+def retry_job(job: ExpenditureImport) -> bool:
+    """Queue a failed job again from its last committed chunk. False if it cannot be retried."""
+    if job.status != "failed" or job.kind not in JOB_KINDS or not job.spool_path or not os.path.exists(job.spool_path):
+        return False
+    job.status = "queued"
+    job.message = None
+    job.updated_at = datetime.datetime.utcnow()
+    return True
+
+
+async def requeue_interrupted(db: AsyncSession) -> list[int]:
+    """Jobs a previous process left unfinished: back to ``queued``. Returns their ids to ``enqueue``.
+
+    Running jobs still checkpointing recently belong to a live worker
+    elsewhere and are left alone.
+    """
+    stale = datetime.datetime.utcnow() - expenditure_import.STALE_AFTER
+    result = await db.execute(
+        select(ExpenditureImport)
+        .where(ExpenditureImport.kind.in_(JOB_KINDS))
+        .where(or_(
+            ExpenditureImport.status == "queued",
+            (ExpenditureImport.status == "running") & (ExpenditureImport.updated_at < stale),
+        ))
+        .order_by(ExpenditureImport.id)
+    )
+    requeued = []
+    for job in result.scalars().all():
+        if job.spool_path and os.path.exists(job.spool_path):
+            job.status = "queued"
+            requeued.append(job.id)
+        else:
+            job.status = "failed"
+            job.message = "服务重启，待导入文件已丢失"
+    return requeued
+
+
+def job_response(job: ExpenditureImport) -> ExpenditureImportResponse:
+    return ExpenditureImportResponse(
+        id=job.id, kind=job.kind, filename=job.filename, status=job.status,
+        rows=job.rows_done, inserted=job.inserted, rejected=job.rejected,
+        rows_per_sec=job.rows_per_sec, message=job.message,
+        errors=job.errors.split("\n") if job.errors else [],
+        created_at=job.created_at, started_at=job.started_at, finished_at=job.finished_at,
+    )
+
+
+async def events(job_id: int) -> AsyncIterator[str]:
+    """Server-sent events: ``progress`` whenever the job's row changes, ``done`` when it ends."""
+    last, idle = None, 0
+    while True:
+        async with async_session() as db:
+            job = await db.get(ExpenditureImport, job_id)
+            state = job_response(job) if job else None
+        if state is None:
+            return
+        payload = state.model_dump_json()
+        if payload != last:
+            last, idle = payload, 0
+            finished = state.status not in ACTIVE_STATUSES
+            yield f"event: {'done' if finished else 'progress'}\ndata: {payload}\n\n"
+            if finished:
+                return
+        else:
+            idle += 1
+            if idle % KEEPALIVE_EVERY == 0:
+                yield ": keep-alive\n\n"
+        await asyncio.sleep(POLL_INTERVAL)
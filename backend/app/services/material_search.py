@@ -0,0 +1,289 @@
+"""Full-text material search over procurement and warehouse outbound records.
+
+Backed by an SQLite FTS5 table, ``material_search``. Chinese has no word
+boundaries, so text is n-gram tokenized before it reaches FTS: every run of
+CJK characters is stored as its overlapping bigrams plus its last character
+("无缝钢管" -> "无缝 缝钢 钢管 管"), and other runs are left to FTS's unicode61
+tokenizer. A query run becomes the phrase of its bigrams, which matches
+exactly the texts containing it as a substring; a single character becomes
+a prefix query. Hits are ranked with bm25, material name weighted highest.
+
+On PostgreSQL the same n-gram text goes into a plain ``material_search``
+table with a generated, field-weighted ``tsvector`` under a GIN index. The
+query becomes a ``tsquery``, the bigram run a ``<->`` phrase, and hits are
+ranked with ``ts_rank`` using the same field priorities.
+
+Seeders index what they import, and startup rebuilds the index whenever its
+row counts disagree with the source tables. When neither is available the
+search falls back to LIKE filters, unranked.
+"""
+import re
+from typing import Iterable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, text, or_, literal_column, table, column, and_
+
+from app.models.procurement import ProcurementRecord, WarehouseOutbound
+from app.utils.dialect import dialect_name
+
+SOURCES = ("procurement", "warehouse")
+INDEXED_FIELDS = ("material_name", "specification", "material_code", "project_name", "team")
+# bm25 weights, in table column order: source, ref_id, then INDEXED_FIELDS
+BM25_WEIGHTS = (0.0, 0.0, 10.0, 4.0, 6.0, 2.0, 2.0)
+# PostgreSQL: tsvector weight class per field, and ts_rank weights for {D, C, B, A}
+TS_WEIGHT_CLASSES = {"material_name": "A", "material_code": "B", "specification": "C", "project_name": "D", "team": "D"}
+TS_RANK_WEIGHTS = "'{0.2, 0.4, 0.6, 1.0}'::float4[]"
+
+_CJK_RUN = re.compile(r"[㐀-䶿一-鿿豈-﫿]+")
+
+_fts = table("material_search", column("source"), column("ref_id"), column("doc"))
+_fts_available: bool | None = None
+
+
+def _cjk_grams(run: str) -> list[str]:
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)] + [run[-1]]
+
+
+def ngram_text(value: str | None) -> str:
+    """Tokenized form of a field as stored in the index."""
+    if not value:
+        return ""
+    parts, pos = [], 0
+    for m in _CJK_RUN.finditer(value):
+        parts.append(value[pos:m.start()])
+        parts.extend(_cjk_grams(m.group()))
+        pos = m.end()
+    parts.append(value[pos:])
+    return " ".join(p.strip() for p in parts if p.strip())
+
+
+def _quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def match_expression(query: str) -> str | None:
+    """FTS5 MATCH expression for a user query (all terms must match)."""
+    clauses = []
+    for term in query.split():
+        pos = 0
+        for m in _CJK_RUN.finditer(term):
+            clauses.extend(_plain_clauses(term[pos:m.start()]))
+            run = m.group()
+            if len(run) == 1:
+                clauses.append(_quote(run) + "*")
+            else:
+                clauses.append(_quote(" ".join(run[i:i + 2] for i in range(len(run) - 1))))
+            pos = m.end()
+        clauses.extend(_plain_clauses(term[pos:]))
+    return " AND ".join(clauses) or None
+
+
+def _plain_clauses(chunk: str) -> list[str]:
+    # unicode61 splits on punctuation; only keep chunks that still contain a token character
+    chunk = chunk.strip()
+    return [_quote(chunk) + "*"] if re.search(r"\w", chunk) else []
+
+
+def tsquery_expression(query: str) -> str | None:
+    """PostgreSQL ``to_tsquery('simple', ...)`` text for a user query (all terms must match)."""
+    clauses = []
+    for term in query.split():
+        pos = 0
+        for m in _CJK_RUN.finditer(term):
+            clauses.extend(_ts_prefix(term[pos:m.start()]))
+            run = m.group()
+            if len(run) == 1:
+                clauses.append(_ts_quote(run) + ":*")
+            else:
+                clauses.append("(" + " <-> ".join(_ts_quote(run[i:i + 2]) for i in range(len(run) - 1)) + ")")
+            pos = m.end()
+        clauses.extend(_ts_prefix(term[pos:]))
+    return " & ".join(clauses) or None
+
+
+def _ts_quote(token: str) -> str:
+    return "'" + token.replace("'", "''").replace("\\", "\\\\") + "'"
+
+
+def _ts_prefix(chunk: str) -> list[str]:
+    return [_ts_quote(t.lower()) + ":*" for t in re.findall(r"\w+", chunk)]
+
+
+def _tsvector_sql() -> str:
+    return " || ".join(
+        f"setweight(to_tsvector('simple', coalesce({f}, '')), '{TS_WEIGHT_CLASSES[f]}')" for f in INDEXED_FIELDS
+    )
+
+
+async def _ensure_table(db: AsyncSession) -> bool:
+    global _fts_available
+    if _fts_available is None:
+        dialect = dialect_name(db)
+        if dialect not in ("sqlite", "postgresql"):
+            print(f"[WARN] No full-text index for {dialect}, material search falls back to LIKE")
+            _fts_available = False
+            return _fts_available
+        try:
+            if dialect == "sqlite":
+                await db.execute(text(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS material_search USING fts5("
+                    "source UNINDEXED, ref_id UNINDEXED, " + ", ".join(INDEXED_FIELDS) + ", tokenize='unicode61')"
+                ))
+            else:
+                # In a savepoint: a failed DDL must not abort the caller's transaction
+                async with db.begin_nested():
+                    await db.execute(text(
+                        "CREATE TABLE IF NOT EXISTS material_search (source varchar(16) NOT NULL, ref_id integer NOT NULL, "
+                        + ", ".join(f"{f} text" for f in INDEXED_FIELDS)
+                        + f", doc tsvector GENERATED ALWAYS AS ({_tsvector_sql()}) STORED)"
+                    ))
+                    await db.execute(text(
+                        "CREATE INDEX IF NOT EXISTS ix_material_search_doc ON material_search USING gin (doc)"
+                    ))
+            _fts_available = True
+        except Exception as e:
+            print(f"[WARN] Full-text index unavailable, material search falls back to LIKE: {e}")
+            _fts_available = False
+    return _fts_available
+
+
+def _row(source: str, rec) -> dict:
+    get = rec.get if isinstance(rec, dict) else lambda f: getattr(rec, f, None)
+    return {
+        "source": source, "ref_id": get("id"),
+        **{f: ngram_text(get(f)) for f in INDEXED_FIELDS},
+    }
+
+
+async def index_records(db: AsyncSession, source: str, records: Iterable):
+    """Add freshly inserted records (flushed ORM objects or dicts with ``id``) to the index."""
+    if not await _ensure_table(db):
+        return
+    rows = [_row(source, r) for r in records]
+    if rows:
+        await db.execute(text(
+            "INSERT INTO material_search (source, ref_id, " + ", ".join(INDEXED_FIELDS) + ") "
+            "VALUES (:source, :ref_id, " + ", ".join(f":{f}" for f in INDEXED_FIELDS) + ")"
+        ), rows)
+
+
+async def rebuild_index(db: AsyncSession) -> int:
+    """Re-derive the whole index from the source tables. Returns the row count."""
+    if not await _ensure_table(db):
+        return 0
+    await db.execute(text("DELETE FROM material_search"))
+    total = 0
+    for source, model in (("procurement", ProcurementRecord), ("warehouse", WarehouseOutbound)):
+        result = await db.execute(select(model))
+        records = result.scalars().all()
+        await index_records(db, source, records)
+        total += len(records)
+    return total
+
+
+async def ensure_index(db: AsyncSession):
+    """Rebuild on startup when the index is missing rows (new DB or pre-index data)."""
+    if not await _ensure_table(db):
+        return
+    indexed = dict((await db.execute(
+        select(_fts.c.source, func.count()).select_from(_fts).group_by(_fts.c.source)
+    )).all())
+    expected = {
+        "procurement": (await db.execute(select(func.count(ProcurementRecord.id)))).scalar(),
+        "warehouse": (await db.execute(select(func.count(WarehouseOutbound.id)))).scalar(),
+    }
+    if any(indexed.get(s, 0) != n for s, n in expected.items()):
+        total = await rebuild_index(db)
+        print(f"[OK] Rebuilt material search index: {total} records")
+
+
+async def search(
+    db: AsyncSession,
+    query: str,
+    source: str | None = None,
+    month: int | None = None,
+    start_date=None,
+    end_date=None,
+    limit: int = 50,
+) -> list[tuple[str, object, float | None]]:
+    """Ranked (source, record, score) hits; lower score is a better match (bm25, or negated ts_rank).
+
+    ``month`` only matches procurement records and the date range only
+    matches warehouse records, so giving either narrows the search to that
+    source.
+    """
+    sources = _sources_for(source, month, start_date, end_date)
+    if not sources:
+        return []
+    if not await _ensure_table(db):
+        return await _like_search(db, query, sources, month, start_date, end_date, limit)
+    postgresql = dialect_name(db) == "postgresql"
+    expr = tsquery_expression(query) if postgresql else match_expression(query)
+    if expr is None:
+        return []
+
+    p, w = ProcurementRecord, WarehouseOutbound
+    if postgresql:
+        tsquery = func.to_tsquery("simple", expr)
+        matched = _fts.c.doc.op("@@")(tsquery)
+        score = (-func.ts_rank(literal_column(TS_RANK_WEIGHTS), _fts.c.doc, tsquery)).label("score")
+    else:
+        matched = text("material_search MATCH :expr").bindparams(expr=expr)
+        score = func.bm25(literal_column("material_search"), *BM25_WEIGHTS).label("score")
+    stmt = (
+        select(_fts.c.source, _fts.c.ref_id, score)
+        .select_from(
+            _fts.outerjoin(p, and_(_fts.c.source == "procurement", p.id == _fts.c.ref_id))
+            .outerjoin(w, and_(_fts.c.source == "warehouse", w.id == _fts.c.ref_id))
+        )
+        .where(matched, _fts.c.source.in_(sources))
+    )
+    if month:
+        stmt = stmt.where(p.month == month)
+    if start_date:
+        stmt = stmt.where(w.apply_date >= start_date)
+    if end_date:
+        stmt = stmt.where(w.apply_date <= end_date)
+    ranked = (await db.execute(stmt.order_by(score).limit(limit))).all()
+
+    records = {}
+    for src, model in (("procurement", p), ("warehouse", w)):
+        ids = [r.ref_id for r in ranked if r.source == src]
+        if ids:
+            result = await db.execute(select(model).where(model.id.in_(ids)))
+            records.update({(src, rec.id): rec for rec in result.scalars().all()})
+    return [
+        (r.source, records[(r.source, r.ref_id)], round(float(r.score), 4))
+        for r in ranked if (r.source, r.ref_id) in records
+    ]
+
+
+def _sources_for(source, month, start_date, end_date) -> list[str]:
+    sources = [source] if source else list(SOURCES)
+    if month:
+        sources = [s for s in sources if s == "procurement"]
+    if start_date or end_date:
+        sources = [s for s in sources if s == "warehouse"]
+    return sources
+
+
+async def _like_search(db, query, sources, month, start_date, end_date, limit):
+    hits = []
+    for src, model in (("procurement", ProcurementRecord), ("warehouse", WarehouseOutbound)):
+        if src not in sources:
+            continue
+        fields = [getattr(model, f) for f in INDEXED_FIELDS if hasattr(model, f)]
+        stmt = select(model)
+        for term in query.split():
+            stmt = stmt.where(or_(*(f.contains(term) for f in fields)))
+        if month:
+            stmt = stmt.where(model.month == month)
+        if start_date:
+            stmt = stmt.where(model.apply_date >= start_date)
+        if end_date:
+            stmt = stmt.where(model.apply_date <= end_date)
+        result = await db.execute(stmt.order_by(model.id).limit(limit - len(hits)))
+        hits.extend((src, rec, None) for rec in result.scalars().all())
+    return hits
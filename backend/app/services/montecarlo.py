@@ -0,0 +1,272 @@
+"""Monte Carlo cost-at-completion simulation.
+
+Each cost unit (a cost item, or a sub-project without cost items) finishes
+at its spend to date plus a random remaining cost. The remaining cost is
+triangular or PERT distributed around the planned cost of the outstanding
+work, ``budget * (1 - progress)``, with the upper bound stretched to the
+sub-project's cost-performance trend (spend per unit of progress) when it
+is running over.
+
+Sampling is fully vectorized. Triangular draws use the two-uniform form
+``(1 - m) * min(U1, U2) + m * max(U1, U2)`` (Stein & Keblis, 2009), so the
+per-iteration sum over units collapses into two matrix-vector products.
+PERT draws use inverse-transform sampling on a table. Each unit's Beta
+distribution is split into ``PERT_CELLS`` equally likely cells and tabulated
+as the mean of each cell, and a uniform draw picks its cell. numpy has no Beta
+inverse CDF, so the table comes from the density integrated on a grid. The
+draws keep the exact mean, lose only the spread within a cell, and cost one
+table read each. The draws run in unit-major blocks, so each unit's draws
+read one small, cache-resident table row. This is faster than the triangular
+path; numpy's beta sampler was several times slower.
+"""
+import time
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+
+from app.config import settings
+from app.models.project import Project, SubProject
+from app.models.budget import CostItem
+
+DISTRIBUTIONS = ("triangular", "pert")
+BLOCK_ELEMENTS = 1 << 18  # samples per block (iterations x units), bounds memory
+PERT_CELLS = 1024  # equally likely cells per unit's PERT table (a power of two, see _sample_totals)
+
+
+async def load_snapshot(db: AsyncSession) -> dict:
+    """Plain-data snapshot of the project, sub-projects and cost items (picklable)."""
+    proj_result = await db.execute(select(Project).order_by(Project.id).limit(1))
+    project = proj_result.scalar_one_or_none()
+    sp_result = await db.execute(select(
+        SubProject.id, SubProject.name, SubProject.allocated_budget,
+        SubProject.actual_spent, SubProject.progress_percent,
+    ))
+    ci_result = await db.execute(select(
+        CostItem.id, CostItem.sub_project_id, CostItem.name,
+        CostItem.budget_amount, CostItem.actual_amount,
+    ))
+    return {
+        "total_budget": project.total_budget if project else settings.TOTAL_BUDGET,
+        "reserve_rate": project.reserve_rate if project else settings.DEFAULT_RESERVE_RATE,
+        "sub_projects": [dict(r._mapping) for r in sp_result.all()],
+        "cost_items": [dict(r._mapping) for r in ci_result.all()],
+    }
+
+
+def build_units(sub_projects: list[dict], cost_items: list[dict]) -> dict:
+    """Flatten sub-projects and cost items into cost units.
+
+    Cost items inherit their sub-project's progress and cost factor (actual
+    spend over the budgeted cost of the work done). A sub-project with cost
+    items keeps a residual unit for any budget/spend not covered by them.
+    """
+    items_by_sp: dict[int, list[dict]] = {}
+    for ci in cost_items:
+        items_by_sp.setdefault(ci["sub_project_id"], []).append(ci)
+
+    types, ids, names, budgets, spents, progresses, factors = [], [], [], [], [], [], []
+
+    def add(unit_type, unit_id, name, budget, spent, progress, factor):
+        types.append(unit_type)
+        ids.append(unit_id)
+        names.append(name)
+        budgets.append(budget or 0.0)
+        spents.append(spent or 0.0)
+        progresses.append(progress)
+        factors.append(factor)
+
+    for sp in sub_projects:
+        items = items_by_sp.get(sp["id"], [])
+        allocated = sp["allocated_budget"] or 0
+        spent = sp["actual_spent"] or 0
+        progress = sp["progress_percent"] or 0
+        earned = allocated * progress / 100
+        factor = spent / earned if earned > 0 else 1.0
+        if not items:
+            add("sub_project", sp["id"], sp["name"], allocated, spent, progress, factor)
+            continue
+        for ci in items:
+            add("cost_item", ci["id"], ci["name"], ci["budget_amount"], ci["actual_amount"], progress, factor)
+        residual_budget = allocated - sum(ci["budget_amount"] or 0 for ci in items)
+        residual_spent = spent - sum(ci["actual_amount"] or 0 for ci in items)
+        if residual_budget > 0 or residual_spent > 0:
+            add("sub_project", sp["id"], sp["name"], max(residual_budget, 0), max(residual_spent, 0), progress, factor)
+
+    return {
+        "type": types, "id": ids, "name": names,
+        "budget": np.asarray(budgets, dtype=np.float64),
+        "spent": np.asarray(spents, dtype=np.float64),
+        "progress": np.clip(np.asarray(progresses, dtype=np.float64) / 100, 0, 1),
+        "cost_factor": np.asarray(factors, dtype=np.float64),
+    }
+
+
+def remaining_cost_ranges(units: dict, optimistic_pct: float, pessimistic_pct: float):
+    """(low, mode, high) of each unit's remaining cost.
+
+    With both percentages in [0, 100], ``0 <= low <= mode <= high``.
+    """
+    mode = np.maximum(units["budget"] * (1 - units["progress"]), 0)
+    low = mode * (1 - optimistic_pct / 100)
+    high = mode * np.maximum(1 + pessimistic_pct / 100, units["cost_factor"])
+    return low, mode, high
+
+
+def _pert_cell_means(m: np.ndarray) -> np.ndarray:
+    """Mean of Beta(1 + 4m, 1 + 4(1 - m)) over each of PERT_CELLS equally likely cells, per unit.
+
+    The CDF and the partial first moment are integrated on one grid (two
+    n_units x grid buffers, reused in place). The moment is then read at
+    every unit's cell edges in a single ``np.interp``. The cell means of a
+    unit telescope to the mean of the gridded density.
+    """
+    n_units = len(m)
+    x = np.linspace(0, 1, PERT_CELLS + 1)
+    cdf = np.power(x, 4 * m[:, None])
+    cdf *= np.power(1 - x, 4 * (1 - m[:, None]))  # density, integrated in place below
+    moment = cdf * x
+    for a in (cdf, moment):
+        a[:, 1:] += a[:, :-1]  # trapezoid sums (numpy reads the overlapping operand first)
+        a[:, 0] = 0
+        np.cumsum(a, axis=1, out=a)
+    moment /= cdf[:, -1:]
+    cdf /= cdf[:, -1:]
+    # Row j of the CDFs shifted to [2j, 2j + 1]: increasing when flattened, so one interp serves every unit
+    shift = 2 * np.arange(n_units)[:, None]
+    cdf += shift
+    edges = np.linspace(0, 1, PERT_CELLS + 1) + shift
+    partial = np.interp(edges.ravel(), cdf.ravel(), moment.ravel()).reshape(n_units, -1)
+    means = np.diff(partial, axis=1)
+    means *= PERT_CELLS
+    # The grid misses a little of the steep edge of the density when 4m or 4(1 - m) < 1;
+    # restore each unit's exact mean, weighted away from the bounds
+    u = (np.arange(PERT_CELLS) + 0.5) / PERT_CELLS
+    w = u * (1 - u)
+    w /= w.mean()
+    means += ((1 + 4 * m) / 6 - means.mean(axis=1))[:, None] * w
+    return means
+
+
+def _sample_totals(rng, low, mode, high, iterations: int, distribution: str) -> np.ndarray:
+    """Total remaining cost per iteration."""
+    span = high - low
+    stochastic = span > 0
+    base = float(low.sum())
+    span = span[stochastic]
+    m = np.clip((mode[stochastic] - low[stochastic]) / span, 0, 1)
+    totals = np.full(iterations, base)
+    n_units = len(span)
+    if n_units == 0:
+        return totals
+
+    rows = max(1, BLOCK_ELEMENTS // n_units)
+    if distribution == "pert":
+        # Flat table of scaled cell means; a draw u of unit j reads table[j * PERT_CELLS + floor(u * PERT_CELLS)]
+        table = (_pert_cell_means(m) * span[:, None]).astype(np.float32).ravel()
+        offsets = (np.arange(n_units, dtype=np.int32) * PERT_CELLS)[:, None]
+        u = np.empty(rows * n_units, dtype=np.float32)
+        cells = np.empty(rows * n_units, dtype=np.int32)
+        sample = np.empty_like(u)
+        for start in range(0, iterations, rows):
+            n = min(rows, iterations - start)
+            # Unit-major blocks: consecutive draws read the same small table row
+            block_u = u[:n * n_units].reshape(n_units, n)
+            block_cells = cells[:n * n_units].reshape(n_units, n)
+            block = sample[:n * n_units].reshape(n_units, n)
+            rng.random(dtype=np.float32, out=block_u)
+            block_u *= PERT_CELLS  # exact for a power of two, so below PERT_CELLS
+            np.copyto(block_cells, block_u, casting="unsafe")
+            block_cells += offsets
+            np.take(table, block_cells, out=block, mode="clip")
+            totals[start:start + n] += block.sum(axis=0, dtype=np.float64)
+    else:
+        w_min = ((1 - m) * span).astype(np.float32)
+        w_max = (m * span).astype(np.float32)
+        u1 = np.empty((rows, n_units), dtype=np.float32)
+        u2 = np.empty_like(u1)
+        for start in range(0, iterations, rows):
+            n = min(rows, iterations - start)
+            a, b = u1[:n], u2[:n]
+            rng.random(dtype=np.float32, out=a)
+            rng.random(dtype=np.float32, out=b)
+            lo = np.minimum(a, b)
+            np.maximum(a, b, out=b)
+            totals[start:start + n] += lo @ w_min + b @ w_max
+    return totals
+
+
+def _unit_std(low, mode, high, distribution: str) -> np.ndarray:
+    if distribution == "pert":
+        mean = (low + 4 * mode + high) / 6
+        return np.sqrt(np.maximum((mean - low) * (high - mean) / 7, 0))
+    var = (low ** 2 + mode ** 2 + high ** 2 - low * mode - low * high - mode * high) / 18
+    return np.sqrt(np.maximum(var, 0))
+
+
+def run_montecarlo(
+    snapshot: dict,
+    iterations: int = 100_000,
+    distribution: str = "triangular",
+    optimistic_pct: float = 10,
+    pessimistic_pct: float = 30,
+    seed: int | None = None,
+    bins: int = 30,
+) -> dict:
+    """Simulate total cost at completion and its impact on budget and reserve."""
+    t0 = time.perf_counter()
+    units = build_units(snapshot["sub_projects"], snapshot["cost_items"])
+    low, mode, high = remaining_cost_ranges(units, optimistic_pct, pessimistic_pct)
+    spent_to_date = float(units["spent"].sum())
+
+    rng = np.random.default_rng(seed)
+    totals = spent_to_date + _sample_totals(rng, low, mode, high, iterations, distribution)
+
+    total_budget = snapshot["total_budget"]
+    reserve_budget = total_budget * snapshot["reserve_rate"]
+    usable_budget = total_budget - reserve_budget
+    p50, p80, p95 = np.percentile(totals, [50, 80, 95])
+    reserve_draw = np.clip(totals - usable_budget, 0, reserve_budget)
+
+    counts, edges = np.histogram(totals, bins=bins)
+    std = _unit_std(low, mode, high, distribution)
+    top = np.argsort(std)[::-1][:10]
+
+    return {
+        "iterations": iterations,
+        "distribution": distribution,
+        "unit_count": len(units["id"]),
+        "total_budget": round(total_budget, 2),
+        "usable_budget": round(usable_budget, 2),
+        "reserve_budget": round(reserve_budget, 2),
+        "spent_to_date": round(spent_to_date, 2),
+        "mean_total_cost": round(float(totals.mean()), 2),
+        "std_total_cost": round(float(totals.std()), 2),
+        "p50_total_cost": round(float(p50), 2),
+        "p80_total_cost": round(float(p80), 2),
+        "p95_total_cost": round(float(p95), 2),
+        "min_total_cost": round(float(totals.min()), 2),
+        "max_total_cost": round(float(totals.max()), 2),
+        "overrun_probability": round(float((totals > total_budget).mean()) * 100, 2),
+        "reserve_usage_probability": round(float((totals > usable_budget).mean()) * 100, 2),
+        "expected_reserve_draw": round(float(reserve_draw.mean()), 2),
+        "expected_overrun": round(float(np.maximum(totals - total_budget, 0).mean()), 2),
+        "histogram": [
+            {"from": round(float(edges[i]), 2), "to": round(float(edges[i + 1]), 2), "count": int(counts[i])}
+            for i in range(len(counts))
+        ],
+        "top_uncertain_items": [
+            {
+                "type": units["type"][i],
+                "id": units["id"][i],
+                "name": units["name"][i],
+                "spent": round(float(units["spent"][i]), 2),
+                "remaining_low": round(float(low[i]), 2),
+                "remaining_mode": round(float(mode[i]), 2),
+                "remaining_high": round(float(high[i]), 2),
+                "std": round(float(std[i]), 2),
+            }
+            for i in top if std[i] > 0
+        ],
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+    }
@@ -0,0 +1,356 @@
+"""Monthly report engine.
+
+Builds the monthly assessment report from a fixed number of queries: the
+sub-project table, the month's spend slice and the cumulative spend slice are
+each pulled once into a pandas frame, and every per-sub-project and
+per-category column is computed in vectorized form. Cumulative figures,
+per sub-project included, count spend up to the end of the report month, so a
+past month's report shows that month's position rather than today's.
+"""
+import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+
+from app.config import settings
+from app.models.project import Project, SubProject
+from app.models.budget import BudgetCategory, ExpenditureAggregate
+from app.models.alert import AlertLog
+from app.services.category_rollup import rollup_spend
+from app.services.spend_aggregate import NO_REF
+from app.utils.dialect import month_bucket
+
+SP_COLUMNS = [
+    "id", "name", "category", "allocated_budget", "progress_percent",
+    "status", "planned_start", "planned_end", "sort_order",
+]
+
+
+def month_key(year: int, month: int) -> str:
+    return f"{year:04d}-{month:02d}"
+
+
+def month_bounds(year: int, month: int) -> tuple[datetime.date, datetime.date]:
+    """First day of the month and first day of the next month."""
+    start = datetime.date(year, month, 1)
+    end = datetime.date(year + 1, 1, 1) if month == 12 else datetime.date(year, month + 1, 1)
+    return start, end
+
+
+def _records(df: pd.DataFrame, columns: list[str]) -> list[dict]:
+    """DataFrame rows as dicts of native Python values (JSON-serializable)."""
+    values = [df[c].tolist() for c in columns]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+async def load_sub_project_frame(db: AsyncSession) -> pd.DataFrame:
+    """All sub-projects as a frame, in report order."""
+    result = await db.execute(
+        select(*(getattr(SubProject, c) for c in SP_COLUMNS)).order_by(SubProject.sort_order, SubProject.id)
+    )
+    df = pd.DataFrame(result.all(), columns=SP_COLUMNS)
+    for col in ("allocated_budget", "progress_percent"):
+        df[col] = df[col].astype(float).fillna(0.0)
+    return df
+
+
+async def load_month_frame(db: AsyncSession, key: str) -> pd.DataFrame:
+    """The month's spend by (sub_project_id, category_id)."""
+    result = await db.execute(
+        select(
+            ExpenditureAggregate.sub_project_id,
+            ExpenditureAggregate.category_id,
+            func.sum(ExpenditureAggregate.amount).label("amount"),
+        )
+        .where(ExpenditureAggregate.month == key)
+        .group_by(ExpenditureAggregate.sub_project_id, ExpenditureAggregate.category_id)
+    )
+    df = pd.DataFrame(result.all(), columns=["sub_project_id", "category_id", "amount"])
+    df["amount"] = df["amount"].astype(float)
+    return df
+
+
+async def load_cumulative_frame(db: AsyncSession, key: str) -> pd.DataFrame:
+    """Spend by (category_id, month) for every month up to and including ``key``."""
+    result = await db.execute(
+        select(
+            ExpenditureAggregate.category_id,
+            ExpenditureAggregate.month,
+            func.sum(ExpenditureAggregate.amount).label("amount"),
+        )
+        .where(ExpenditureAggregate.month <= key)
+        .group_by(ExpenditureAggregate.category_id, ExpenditureAggregate.month)
+    )
+    df = pd.DataFrame(result.all(), columns=["category_id", "month", "amount"])
+    df["amount"] = df["amount"].astype(float)
+    return df
+
+
+async def load_sub_project_spend(db: AsyncSession, key: str) -> pd.Series:
+    """Spend per sub_project_id up to and including month ``key``."""
+    result = await db.execute(
+        select(ExpenditureAggregate.sub_project_id, func.sum(ExpenditureAggregate.amount))
+        .where(ExpenditureAggregate.month <= key)
+        .group_by(ExpenditureAggregate.sub_project_id)
+    )
+    return pd.Series(dict(result.all()), dtype=float)
+
+
+def sub_project_columns(
+    sps: pd.DataFrame, month_spent: pd.Series, cumulative_spent: pd.Series, period_end: datetime.date,
+) -> pd.DataFrame:
+    """Variance, usage, schedule-status and risk columns for every sub-project at once."""
+    df = sps.copy()
+    alloc = df["allocated_budget"]
+    spent = df["id"].map(cumulative_spent).fillna(0.0).astype(float)
+
+    df["monthly_spent"] = df["id"].map(month_spent).fillna(0.0).astype(float)
+    df["cumulative_spent"] = spent
+    df["budget_remaining"] = np.where(alloc != 0, alloc - spent, 0.0)
+    usage = np.where(alloc > 0, spent / alloc.where(alloc > 0, 1.0) * 100, 0.0)
+    df["budget_usage_rate"] = np.round(usage, 2)
+
+    # Schedule variance against linear expected progress
+    start = pd.to_datetime(df["planned_start"])
+    end = pd.to_datetime(df["planned_end"])
+    has_plan = start.notna() & end.notna()
+    total_days = (end - start).dt.days.fillna(1).replace(0, 1)
+    elapsed = (end.where(end < pd.Timestamp(period_end), pd.Timestamp(period_end)) - start).dt.days.fillna(0)
+    expected = (elapsed / total_days * 100).clip(0, 100)
+    progress = df["progress_percent"]
+    df["schedule_status"] = np.select(
+        [has_plan & (progress < expected - 10), has_plan & (progress > expected + 10)],
+        ["滞后", "超前"],
+        default="正常",
+    )
+    df["risk_level"] = np.select([usage >= 90, usage >= 80], ["red", "yellow"], default="green")
+    return df
+
+
+def _booked(by_category: pd.Series) -> dict[int, float]:
+    return by_category[by_category.index != NO_REF].to_dict()
+
+
+def category_summary(
+    categories: list[BudgetCategory], month_spend: pd.DataFrame, cumulative_by_category: pd.Series,
+) -> list[dict]:
+    """Level-1 category monthly and cumulative spend, rolled up over each subtree."""
+    monthly = rollup_spend(categories, _booked(month_spend.groupby("category_id")["amount"].sum()))
+    cumulative = rollup_spend(categories, _booked(cumulative_by_category))
+    summary = []
+    for cat in categories:
+        if cat.level != 1:
+            continue
+        cumulative_val = cumulative.get(cat.id, 0.0)
+        summary.append({
+            "name": cat.name,
+            "budget": cat.budget_amount,
+            "monthly_spent": monthly.get(cat.id, 0.0),
+            "cumulative_spent": cumulative_val,
+            "usage_rate": round(cumulative_val / cat.budget_amount * 100, 2) if cat.budget_amount > 0 else 0,
+        })
+    return summary
+
+
+def generate_recommendations(sp_details, total_budget, cumulative_spent, reserve_rate):
+    """Generate automated recommendations based on data analysis."""
+    recommendations = []
+
+    over_budget_items = [sp for sp in sp_details if sp["risk_level"] == "red"]
+    if over_budget_items:
+        names = "、".join(sp["name"] for sp in over_budget_items[:3])
+        recommendations.append(f"⚠️ 以下工程概算使用率超过90%，建议重点关注并控制支出：{names}")
+
+    delayed_items = [sp for sp in sp_details if sp["schedule_status"] == "滞后"]
+    if delayed_items:
+        names = "、".join(sp["name"] for sp in delayed_items[:3])
+        recommendations.append(f"⏰ 以下工程进度滞后，建议加大投入或调整计划：{names}")
+
+    usage_rate = cumulative_spent / total_budget
+    if usage_rate > (1 - reserve_rate):
+        recommendations.append(f"💰 总体概算已超过可用概算线（{(1-reserve_rate)*100:.0f}%），正在使用弹性预备金")
+
+    if not recommendations:
+        recommendations.append("✅ 当前各项指标正常，请继续保持")
+
+    return recommendations
+
+
+def assemble_report(
+    year: int,
+    month: int,
+    project: Project | None,
+    sps: pd.DataFrame,
+    categories: list[BudgetCategory],
+    month_spend: pd.DataFrame,
+    cumulative_by_category: pd.Series,
+    cumulative_by_sub_project: pd.Series,
+    prev_total: float,
+    alert_counts: dict[str, int],
+) -> dict:
+    """Assemble one month's report from preloaded data.
+
+    ``month_spend`` holds the month's (sub_project_id, category_id, amount)
+    rows, ``cumulative_by_category`` and ``cumulative_by_sub_project`` the
+    spend per category_id / sub_project_id up to the end of the month, and
+    ``prev_total`` the previous month's total spend.
+    """
+    _, end_date = month_bounds(year, month)
+    monthly_total = float(month_spend["amount"].sum())
+    cumulative_total = float(cumulative_by_category.sum())
+
+    month_spent = month_spend.groupby("sub_project_id")["amount"].sum()
+    sp_df = sub_project_columns(sps, month_spent, cumulative_by_sub_project, end_date)
+    sp_details = _records(sp_df, [
+        "id", "name", "category", "allocated_budget", "cumulative_spent", "monthly_spent",
+        "budget_remaining", "budget_usage_rate", "progress_percent", "status",
+        "schedule_status", "risk_level",
+    ])
+
+    forecast_next = (monthly_total + prev_total) / 2 if prev_total > 0 else monthly_total
+    total_budget = project.total_budget if project else settings.TOTAL_BUDGET
+    reserve_rate = project.reserve_rate if project else settings.DEFAULT_RESERVE_RATE
+
+    return {
+        "report_period": f"{year}年{month}月",
+        "generated_at": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "overview": {
+            "total_budget": total_budget,
+            "reserve_budget": total_budget * reserve_rate,
+            "usable_budget": total_budget * (1 - reserve_rate),
+            "monthly_spent": monthly_total,
+            "cumulative_spent": cumulative_total,
+            "budget_remaining": total_budget - cumulative_total,
+            "budget_usage_rate": round(cumulative_total / total_budget * 100, 2),
+        },
+        "sub_projects": sp_details,
+        "category_summary": category_summary(categories, month_spend, cumulative_by_category),
+        "alerts_count": {
+            "total": sum(alert_counts.values()),
+            "red": alert_counts.get("red", 0),
+            "yellow": alert_counts.get("yellow", 0),
+        },
+        "forecast": {
+            "next_month_estimated": round(forecast_next, 2),
+            "remaining_months_budget": round((total_budget - cumulative_total) / max(1, monthly_total), 1) if monthly_total > 0 else None,
+        },
+        "recommendations": generate_recommendations(sp_details, total_budget, cumulative_total, reserve_rate),
+    }
+
+
+async def build_monthly_report(db: AsyncSession, year: int, month: int) -> dict:
+    """Build one monthly report in a constant number of queries."""
+    start_date, end_date = month_bounds(year, month)
+
+    proj_result = await db.execute(select(Project).order_by(Project.id).limit(1))
+    project = proj_result.scalar_one_or_none()
+    sps = await load_sub_project_frame(db)
+    cat_result = await db.execute(select(BudgetCategory).order_by(BudgetCategory.level, BudgetCategory.sort_order))
+    categories = list(cat_result.scalars().all())
+    key = month_key(year, month)
+    month_spend = await load_month_frame(db, key)
+    cumulative_spend = await load_cumulative_frame(db, key)
+    prev = start_date - datetime.timedelta(days=1)
+    prev_total = float(cumulative_spend.loc[cumulative_spend["month"] == month_key(prev.year, prev.month), "amount"].sum())
+    cumulative_by_category = cumulative_spend.groupby("category_id")["amount"].sum()
+    cumulative_by_sub_project = await load_sub_project_spend(db, key)
+
+    alert_result = await db.execute(
+        select(AlertLog.level, func.count(AlertLog.id))
+        .where(
+            AlertLog.created_at >= datetime.datetime.combine(start_date, datetime.time()),
+            AlertLog.created_at < datetime.datetime.combine(end_date, datetime.time()),
+        )
+        .group_by(AlertLog.level)
+    )
+    alert_counts = {level: count for level, count in alert_result.all()}
+
+    return assemble_report(
+        year, month, project, sps, categories, month_spend,
+        cumulative_by_category, cumulative_by_sub_project, prev_total, alert_counts,
+    )
+
+
+def month_range(start: tuple[int, int], end: tuple[int, int]) -> list[tuple[int, int]]:
+    """Inclusive list of (year, month) from start to end."""
+    months = []
+    year, month = start
+    while (year, month) <= end:
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+async def iter_monthly_reports(db: AsyncSession, start: tuple[int, int], end: tuple[int, int]):
+    """Build reports for every month in [start, end] from one pass over the data.
+
+    All queries run up front (spend through the last month, alert counts for
+    the whole range); the returned generator then assembles one month at a
+    time, carrying cumulative spend (per category and per sub-project) forward
+    as running sums.
+    """
+    months = month_range(start, end)
+    first_start, _ = month_bounds(*months[0])
+    _, last_end = month_bounds(*months[-1])
+
+    proj_result = await db.execute(select(Project).order_by(Project.id).limit(1))
+    project = proj_result.scalar_one_or_none()
+    sps = await load_sub_project_frame(db)
+    cat_result = await db.execute(select(BudgetCategory).order_by(BudgetCategory.level, BudgetCategory.sort_order))
+    categories = list(cat_result.scalars().all())
+
+    # Single pass over spend: everything up to the last month of the range
+    spend_result = await db.execute(
+        select(
+            ExpenditureAggregate.sub_project_id,
+            ExpenditureAggregate.category_id,
+            ExpenditureAggregate.month,
+            func.sum(ExpenditureAggregate.amount).label("amount"),
+        )
+        .where(ExpenditureAggregate.month <= month_key(*months[-1]))
+        .group_by(ExpenditureAggregate.sub_project_id, ExpenditureAggregate.category_id, ExpenditureAggregate.month)
+    )
+    spend = pd.DataFrame(spend_result.all(), columns=["sub_project_id", "category_id", "month", "amount"])
+    spend["amount"] = spend["amount"].astype(float)
+
+    # Single pass over alerts: counts per (month, level) for the whole range
+    alert_month = month_bucket(AlertLog.created_at)
+    alert_result = await db.execute(
+        select(alert_month.label("month"), AlertLog.level, func.count(AlertLog.id))
+        .where(
+            AlertLog.created_at >= datetime.datetime.combine(first_start, datetime.time()),
+            AlertLog.created_at < datetime.datetime.combine(last_end, datetime.time()),
+        )
+        .group_by("month", AlertLog.level)
+    )
+    alert_counts: dict[str, dict[str, int]] = {}
+    for m, level, count in alert_result.all():
+        alert_counts.setdefault(m, {})[level] = count
+
+    # Spend before the range seeds the running sums
+    first_key = month_key(*months[0])
+    before = spend[spend["month"] < first_key]
+    running = before.groupby("category_id")["amount"].sum()
+    running_sp = before.groupby("sub_project_id")["amount"].sum()
+    prev = first_start - datetime.timedelta(days=1)
+    prev_total = float(before.loc[before["month"] == month_key(prev.year, prev.month), "amount"].sum())
+    by_month = {m: frame for m, frame in spend[spend["month"] >= first_key].groupby("month")}
+    empty = spend.iloc[0:0]
+
+    def generate():
+        nonlocal running, running_sp, prev_total
+        for year, month in months:
+            key = month_key(year, month)
+            month_spend = by_month.get(key, empty)
+            running = running.add(month_spend.groupby("category_id")["amount"].sum(), fill_value=0.0)
+            running_sp = running_sp.add(month_spend.groupby("sub_project_id")["amount"].sum(), fill_value=0.0)
+            yield assemble_report(
+                year, month, project, sps, categories,
+                month_spend[["sub_project_id", "category_id", "amount"]], running, running_sp, prev_total,
+                alert_counts.get(key, {}),
+            )
+            prev_total = float(month_spend["amount"].sum())
+
+    return generate()
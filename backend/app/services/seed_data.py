@@ -6,7 +6,7 @@ from sqlalchemy import select
 from app.models.user import User
 from app.models.project import Project, SubProject
 from app.models.budget import BudgetCategory, CostItem
-from app.utils.security import hash_password
+from app.services.bulk_loader import BulkLoader
 
 from app.services.seed_mining_data import get_mining_subprojects
 from app.services.seed_civil_data import get_civil_subprojects
@@ -26,17 +26,22 @@ async def seed_initial_data(db: AsyncSession):
     if result.scalar_one_or_none():
         return
 
+    loader = BulkLoader(db)
+
     # ── Users ──
+    # Precomputed bcrypt (cost 12) hashes of admin123 / leader123 / eng123 /
+    # view123, so seeding does not hash at startup; login rehashes them if
+    # BCRYPT_ROUNDS differs.
     users = [
-        User(username="admin", full_name="系统管理员", password_hash=hash_password("admin123"), role="admin", department="信息技术部"),
-        User(username="leader", full_name="矿领导", password_hash=hash_password("leader123"), role="leader", department="矿领导层"),
-        User(username="engineer", full_name="工程部员工", password_hash=hash_password("eng123"), role="department", department="工程部"),
-        User(username="viewer", full_name="普通员工", password_hash=hash_password("view123"), role="viewer", department="综合办"),
+        dict(username="admin", full_name="系统管理员", password_hash="$2b$12$71bXeEDtlI4lV4ElDDK6HuuJYvaP/wYwazfSOKMjYfiTl/5a6XbFi", role="admin", department="信息技术部"),
+        dict(username="leader", full_name="矿领导", password_hash="$2b$12$DhyKlFhwBEwnsAJiEs2M..gaq6ZUptU4E5OfUvsl9ycp2oNoYUG1u", role="leader", department="矿领导层"),
+        dict(username="engineer", full_name="工程部员工", password_hash="$2b$12$9gYylgxJv7OtlrIGJyjb1eZMQGURLkmI3/ZHAP77zouS09EzirL6u", role="department", department="工程部"),
+        dict(username="viewer", full_name="普通员工", password_hash="$2b$12$g9XYxQepPOIfSW7g9cGMherdkz/Vzb9tyl5BY5k4vNJUV2Cr/TpDK", role="viewer", department="综合办"),
     ]
-    db.add_all(users)
+    await loader.insert(User, users)
 
     # ── Project ──
-    project = Project(
+    [project_id] = await loader.insert(Project, [dict(
         name="平煤神马塔能伊斯法拉公司煤矿（原舒拉8号井）技术改造项目",
         description="根据平煤神马集团批复，项目建设总投资56397.84万元的技术改造工程",
         total_budget=56397.84,
@@ -44,9 +49,7 @@ async def seed_initial_data(db: AsyncSession):
         start_date=datetime.date(2025, 3, 1),
         end_date=datetime.date(2027, 12, 31),
         status="in_progress",
-    )
-    db.add(project)
-    await db.flush()
+    )], return_ids=True)
 
     # ── L1 Budget Categories ──
     l1_data = [
@@ -57,15 +60,16 @@ async def seed_initial_data(db: AsyncSession):
         ("其他费用", "QT", 4574.25, 5),
         ("工程预备费", "YB", 1201.91, 6),
     ]
-    l1_cats = {}
-    for name, code, amount, order in l1_data:
-        cat = BudgetCategory(name=name, code=code, level=1, budget_amount=amount, sort_order=order)
-        db.add(cat)
-        await db.flush()
-        l1_cats[code] = cat
+    l1_ids = dict(zip(
+        [code for _, code, _, _ in l1_data],
+        await loader.insert(BudgetCategory, [
+            dict(name=name, code=code, level=1, budget_amount=amount, sort_order=order)
+            for name, code, amount, order in l1_data
+        ], return_ids=True),
+    ))
 
     # ── L2 Budget Categories ──
-    l2_map = {}
+    l2_rows = []
 
     # 矿建工程 L2
     mj_l2 = [
@@ -74,11 +78,10 @@ async def seed_initial_data(db: AsyncSession):
         ("排水系统", "MJ-03", 772.58, 3),
         ("供电系统", "MJ-04", 157.15, 4),
     ]
-    for name, code, amount, order in mj_l2:
-        c = BudgetCategory(name=name, code=code, level=2, parent_id=l1_cats["MJ"].id, budget_amount=amount, sort_order=order)
-        db.add(c)
-        await db.flush()
-        l2_map[code] = c
+    l2_rows.extend(
+        dict(name=name, code=code, level=2, parent_id=l1_ids["MJ"], budget_amount=amount, sort_order=order)
+        for name, code, amount, order in mj_l2
+    )
 
     # 土建工程 L2
     tj_l2 = [
@@ -94,11 +97,10 @@ async def seed_initial_data(db: AsyncSession):
         ("通风系统", "TJ-10", 152.43, 10),
         ("安全技术及控制系统", "TJ-11", 143.00, 11),
     ]
-    for name, code, amount, order in tj_l2:
-        c = BudgetCategory(name=name, code=code, level=2, parent_id=l1_cats["TJ"].id, budget_amount=amount, sort_order=order)
-        db.add(c)
-        await db.flush()
-        l2_map[code] = c
+    l2_rows.extend(
+        dict(name=name, code=code, level=2, parent_id=l1_ids["TJ"], budget_amount=amount, sort_order=order)
+        for name, code, amount, order in tj_l2
+    )
 
     # 安装工程 L2
     az_l2 = [
@@ -118,11 +120,10 @@ async def seed_initial_data(db: AsyncSession):
         ("辅助厂房及仓库", "AZ-14", 13.97, 14),
         ("利旧设备安装", "AZ-15", 415.28, 15),
     ]
-    for name, code, amount, order in az_l2:
-        c = BudgetCategory(name=name, code=code, level=2, parent_id=l1_cats["AZ"].id, budget_amount=amount, sort_order=order)
-        db.add(c)
-        await db.flush()
-        l2_map[code] = c
+    l2_rows.extend(
+        dict(name=name, code=code, level=2, parent_id=l1_ids["AZ"], budget_amount=amount, sort_order=order)
+        for name, code, amount, order in az_l2
+    )
 
     # 设备购置 L2
     sb_l2 = [
@@ -152,10 +153,7 @@ async def seed_initial_data(db: AsyncSession):
                 break
         else:
             amount = 0
-        c = BudgetCategory(name=name, code=code, level=2, parent_id=l1_cats["SB"].id, budget_amount=amount, sort_order=order)
-        db.add(c)
-        await db.flush()
-        l2_map[code] = c
+        l2_rows.append(dict(name=name, code=code, level=2, parent_id=l1_ids["SB"], budget_amount=amount, sort_order=order))
 
     # 其他费用 L2
     qt_l2 = [
@@ -166,13 +164,15 @@ async def seed_initial_data(db: AsyncSession):
         ("安全评价费", "QT-05", 0, 5),
         ("应急预案编制费", "QT-06", 10.00, 6),
     ]
-    for name, code, amount, order in qt_l2:
-        c = BudgetCategory(name=name, code=code, level=2, parent_id=l1_cats["QT"].id, budget_amount=amount, sort_order=order)
-        db.add(c)
-        await db.flush()
-        l2_map[code] = c
+    l2_rows.extend(
+        dict(name=name, code=code, level=2, parent_id=l1_ids["QT"], budget_amount=amount, sort_order=order)
+        for name, code, amount, order in qt_l2
+    )
 
-    await db.flush()
+    l2_ids = dict(zip(
+        [row["code"] for row in l2_rows],
+        await loader.insert(BudgetCategory, l2_rows, return_ids=True),
+    ))
 
     # ── Sub-projects ──
     all_sp_data = []
@@ -188,10 +188,10 @@ async def seed_initial_data(db: AsyncSession):
         "其他费用": "其他费用",
     }
 
-    sp_objects = {}
+    sp_rows = []
     for i, sp_data in enumerate(all_sp_data):
-        sp = SubProject(
-            project_id=project.id,
+        sp_rows.append(dict(
+            project_id=project_id,
             name=sp_data["name"],
             category=sp_data["category"],
             allocated_budget=sp_data["allocated_budget"],
@@ -202,14 +202,11 @@ async def seed_initial_data(db: AsyncSession):
             planned_end=datetime.date(2027, 12, 31),
             description=sp_data.get("description", ""),
             sort_order=i + 1,
-        )
-        db.add(sp)
-        await db.flush()
-        sp_objects[sp_data["name"]] = sp
+        ))
 
     # Create a virtual sub-project for equipment purchase
-    equipment_sp = SubProject(
-        project_id=project.id,
+    sp_rows.append(dict(
+        project_id=project_id,
         name="设备购置",
         category="设备购置",
         allocated_budget=14116.51,
@@ -220,13 +217,11 @@ async def seed_initial_data(db: AsyncSession):
         planned_end=datetime.date(2027, 12, 31),
         description="全部设备采购（含357+项设备明细）",
         sort_order=len(all_sp_data) + 1,
-    )
-    db.add(equipment_sp)
-    await db.flush()
+    ))
 
     # Create sub-project for reuse equipment installation
-    reuse_sp = SubProject(
-        project_id=project.id,
+    sp_rows.append(dict(
+        project_id=project_id,
         name="利旧设备安装",
         category="安装工程",
         allocated_budget=415.28,
@@ -237,18 +232,18 @@ async def seed_initial_data(db: AsyncSession):
         planned_end=datetime.date(2027, 6, 30),
         description="33条利旧设备安装工程",
         sort_order=len(all_sp_data) + 2,
-    )
-    db.add(reuse_sp)
-    await db.flush()
+    ))
+    sp_ids = await loader.insert(SubProject, sp_rows, return_ids=True)
+    equipment_sp_id, reuse_sp_id = sp_ids[-2], sp_ids[-1]
 
     # ── Equipment CostItems ──
+    ci_rows = []
     eq_items = get_equipment_items()
     for item in eq_items:
         l2_code = EQUIPMENT_GROUP_TO_L2.get(item["group"])
-        cat_id = l2_map[l2_code].id if l2_code and l2_code in l2_map else None
-        ci = CostItem(
-            sub_project_id=equipment_sp.id,
-            category_id=cat_id,
+        ci_rows.append(dict(
+            sub_project_id=equipment_sp_id,
+            category_id=l2_ids.get(l2_code) if l2_code else None,
             name=item["name"],
             budget_amount=item["budget_amount"],
             actual_amount=0,
@@ -256,15 +251,13 @@ async def seed_initial_data(db: AsyncSession):
             quantity=item.get("quantity", 1),
             unit_price=item.get("unit_price", 0),
             note=item.get("model", ""),
-        )
-        db.add(ci)
+        ))
 
     # ── Reuse Equipment CostItems ──
-    reuse_cat_id = l2_map.get("AZ-15")
-    reuse_cat_id = reuse_cat_id.id if reuse_cat_id else None
+    reuse_cat_id = l2_ids.get("AZ-15")
     for item in get_reuse_equipment():
-        ci = CostItem(
-            sub_project_id=reuse_sp.id,
+        ci_rows.append(dict(
+            sub_project_id=reuse_sp_id,
             category_id=reuse_cat_id,
             name=f"[利旧]{item['name']}",
             budget_amount=item.get("install_fee", 0),
@@ -273,11 +266,11 @@ async def seed_initial_data(db: AsyncSession):
             quantity=item.get("quantity", 1),
             unit_price=item.get("install_fee", 0) / max(1, item.get("quantity", 1)),
             note=f"{item['model']} 原值:{item.get('original_value', 0)}万 净值:{item.get('net_value', 0)}万",
-        )
-        db.add(ci)
+        ))
+    await loader.insert(CostItem, ci_rows)
 
-    await db.flush()
     print(f"[OK] Seeded: {len(all_sp_data)+2} sub-projects, {len(eq_items)} equipment items, {len(get_reuse_equipment())} reuse items")
+    print(f"[OK] Bulk insert: {loader.report()}")
 
     # ── Settlement & Procurement Data ──
     await seed_civil_settlement(db)
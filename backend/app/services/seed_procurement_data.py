@@ -9,6 +9,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from app.models.procurement import ProcurementRecord, ProcurementMonthlySummary
+from app.services import material_search
+from app.services.bulk_loader import BulkLoader
 
 MONTHLY_TOTALS_SOMONI = {
     1: 461410.65,
@@ -132,12 +134,16 @@ async def seed_procurement_data(db: AsyncSession):
     if result.scalar_one_or_none():
         return
 
+    loader = BulkLoader(db)
+
     # Monthly summaries
-    for month, total in MONTHLY_TOTALS_SOMONI.items():
-        db.add(ProcurementMonthlySummary(month=month, amount_somoni=total))
+    await loader.insert(ProcurementMonthlySummary, [
+        dict(month=month, amount_somoni=total) for month, total in MONTHLY_TOTALS_SOMONI.items()
+    ])
 
     # Parse each monthly file
     total_records = 0
+    seeded = []
     for month in range(1, 13):
         filepath = _find_data_file(month)
         if not filepath:
@@ -145,10 +151,11 @@ async def seed_procurement_data(db: AsyncSession):
             continue
 
         records = _parse_monthly_file(filepath, month)
-        for rec in records:
-            db.add(ProcurementRecord(**rec))
+        seeded.extend(records)
         total_records += len(records)
         print(f"  Month {month}: {len(records)} records from {os.path.basename(filepath)}")
 
-    await db.flush()
+    ids = await loader.insert(ProcurementRecord, seeded, return_ids=True)
+    await material_search.index_records(db, "procurement", [dict(rec, id=i) for rec, i in zip(seeded, ids)])
     print(f"[OK] Seeded: 12 monthly summaries, {total_records} procurement detail records")
+    print(f"[OK] Bulk insert: {loader.report()}")
@@ -10,6 +10,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from app.models.procurement import WarehouseOutbound
+from app.services import material_search
+from app.services.bulk_loader import BulkLoader
 
 
 def _parse_number(s: str):
@@ -110,9 +112,9 @@ async def seed_warehouse_outbound(db: AsyncSession):
         return
 
     records = _parse_outbound_file(filepath)
-    for rec in records:
-        db.add(WarehouseOutbound(**rec))
-
-    await db.flush()
+    loader = BulkLoader(db)
+    ids = await loader.insert(WarehouseOutbound, records, return_ids=True)
+    await material_search.index_records(db, "warehouse", [dict(rec, id=i) for rec, i in zip(records, ids)])
     total_amount = sum(r["amount"] or 0 for r in records)
     print(f"[OK] Seeded: {len(records)} warehouse outbound records, total {total_amount:.2f} 元")
+    print(f"[OK] Bulk insert: {loader.report()}")
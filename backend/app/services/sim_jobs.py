@@ -0,0 +1,231 @@
+"""Background simulation jobs.
+
+A job is a ``Simulation`` whose scenarios run in a process pool instead of
+the request handler. Submission snapshots the sub-project and cost-item data
+once; each scenario is computed from that snapshot in a worker process and
+its outcome is written back to ``SimScenario.results``:
+
+    {"status": "queued" | "running" | "completed" | "failed" | "cancelled",
+     "progress": 0-100, "submitted_at": ..., "finished_at": ..., ...result}
+
+Queued scenarios are cancelled outright; a scenario already running in a
+worker cannot be interrupted, so its result is discarded when it arrives.
+
+Every ``HEARTBEAT_INTERVAL`` seconds each process touches the
+``Simulation.updated_at`` of the jobs in its pool. Unfinished scenarios of a
+job that has gone ``STALE_AFTER`` without a heartbeat belonged to a process
+that has exited and are failed, at startup and by every later heartbeat, so a
+job submitted just before a restart is failed once it goes stale. Jobs of
+other running workers (several uvicorn workers, a rolling restart) are left
+alone.
+
+The pool uses the ``spawn`` start method: forking from inside the running
+event loop would copy locks held by its threads (aiosqlite, the password
+hash pool) into the children.
+"""
+import asyncio
+import datetime
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
+
+from app.config import settings
+from app.database import async_session
+from app.models.simulation import Simulation, SimScenario
+from app.services.montecarlo import run_montecarlo
+
+JOB_TYPES = ("montecarlo", "scenario")
+ACTIVE_STATUSES = ("queued", "running")
+HEARTBEAT_INTERVAL = 30  # seconds between touches of this process's unfinished jobs
+STALE_AFTER = datetime.timedelta(minutes=2)  # no heartbeat for this long: the owning process is gone
+
+_executor: ProcessPoolExecutor | None = None
+_futures: dict[int, dict[int, Future]] = {}  # sim_id -> {scenario_id: pool future}
+_tasks: set[asyncio.Task] = set()  # outcome writers; the event loop only holds weak references
+_heartbeat_task: asyncio.Task | None = None
+
+
+def scenario_comparison(total_budget: float, parameters: dict) -> dict:
+    """Budget / duration / efficiency factor model used by scenario comparison."""
+    budget_factor = parameters.get("budget_factor", 1.0)
+    duration_factor = parameters.get("duration_factor", 1.0)
+    efficiency_factor = parameters.get("efficiency_factor", 1.0)
+
+    adjusted_cost = total_budget * budget_factor
+    estimated_return = total_budget * efficiency_factor * 1.2  # Simplified ROI model
+    roi = (estimated_return - adjusted_cost) / adjusted_cost * 100 if adjusted_cost > 0 else 0
+    return {
+        "results": {
+            "adjusted_total_budget": round(adjusted_cost, 2),
+            "estimated_duration_months": round(12 * duration_factor, 1),
+            "estimated_return": round(estimated_return, 2),
+            "budget_savings": round(total_budget - adjusted_cost, 2),
+            "efficiency_gain": round((efficiency_factor - 1) * 100, 2),
+        },
+        "total_cost": round(adjusted_cost, 2),
+        "total_return": round(estimated_return, 2),
+        "roi": round(roi, 2),
+    }
+
+
+def run_scenario(job_type: str, snapshot: dict, parameters: dict) -> dict:
+    """Worker entry point (runs in a child process; arguments and result are pickled)."""
+    if job_type == "montecarlo":
+        result = run_montecarlo(snapshot, **parameters)
+        return {"results": result, "total_cost": result["mean_total_cost"]}
+    return scenario_comparison(snapshot["total_budget"], parameters)
+
+
+def _now() -> str:
+    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def queued_state() -> dict:
+    """Initial ``SimScenario.results`` of a submitted scenario."""
+    return {"status": "queued", "progress": 0, "submitted_at": _now()}
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.SIM_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def submit_job(sim: Simulation, scenarios: list[SimScenario], snapshot: dict):
+    """Queue every scenario of a committed job on the process pool."""
+    executor = _get_executor()
+    futures = _futures.setdefault(sim.id, {})
+    for sc in scenarios:
+        fut = executor.submit(run_scenario, sim.sim_type, snapshot, sc.parameters or {})
+        futures[sc.id] = fut
+        watcher = asyncio.wrap_future(fut)
+        watcher.add_done_callback(
+            lambda w, sim_id=sim.id, sc_id=sc.id: _spawn(_store_outcome(sim_id, sc_id, w))
+        )
+
+
+def _spawn(coro):
+    task = asyncio.create_task(coro)
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+def start_heartbeat():
+    """Start the heartbeat for the life of the process (called at startup)."""
+    global _heartbeat_task
+    if _heartbeat_task is None or _heartbeat_task.done():
+        _heartbeat_task = asyncio.create_task(_heartbeat())
+
+
+async def _heartbeat():
+    """Keep this process's jobs fresh and fail jobs whose process is gone."""
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        try:
+            async with async_session() as db:
+                if _futures:
+                    await db.execute(
+                        update(Simulation)
+                        .where(Simulation.id.in_(list(_futures)))
+                        .values(updated_at=datetime.datetime.utcnow())
+                    )
+                await fail_interrupted_jobs(db)
+                await db.commit()
+        except Exception as e:
+            print(f"[WARN] Simulation heartbeat failed: {type(e).__name__}: {e}")
+
+
+async def _store_outcome(sim_id: int, scenario_id: int, fut: asyncio.Future):
+    """Write a finished scenario's result (or error) back to its row."""
+    futures = _futures.get(sim_id, {})
+    futures.pop(scenario_id, None)
+    if not futures:
+        _futures.pop(sim_id, None)
+    if fut.cancelled():
+        return  # cancel_job already recorded it
+
+    error = fut.exception()
+    async with async_session() as db:
+        sc = await db.get(SimScenario, scenario_id)
+        state = (sc.results or {}) if sc is not None else {}
+        if state.get("status") not in ACTIVE_STATUSES:
+            return  # deleted or cancelled while running
+        done = {"submitted_at": state.get("submitted_at"), "finished_at": _now(), "progress": 100}
+        if error is None:
+            outcome = fut.result()
+            sc.results = {**outcome["results"], **done, "status": "completed"}
+            sc.total_cost = outcome.get("total_cost")
+            sc.total_return = outcome.get("total_return")
+            sc.roi = outcome.get("roi")
+        else:
+            sc.results = {**done, "status": "failed", "error": f"{type(error).__name__}: {error}"}
+        await db.commit()
+
+
+def live_status(sim_id: int, scenario_id: int, stored: str | None) -> str | None:
+    """Stored status, upgraded to 'running' while a worker holds the scenario."""
+    fut = _futures.get(sim_id, {}).get(scenario_id)
+    if stored == "queued" and fut is not None and fut.running():
+        return "running"
+    return stored
+
+
+def job_state(statuses: list[str | None]) -> tuple[str, float]:
+    """Overall (status, progress %) of a job from its scenario statuses."""
+    total = len(statuses)
+    finished = sum(1 for st in statuses if st not in ACTIVE_STATUSES)
+    progress = round(finished / total * 100, 1) if total else 100.0
+    if finished < total:
+        started = finished > 0 or "running" in statuses
+        return ("running" if started else "queued"), progress
+    if total and all(st == "cancelled" for st in statuses):
+        return "cancelled", progress
+    if "failed" in statuses:
+        return "failed", progress
+    return "completed", progress
+
+
+async def cancel_job(db: AsyncSession, sim_id: int) -> int:
+    """Cancel every unfinished scenario of a job. Returns how many were cancelled."""
+    result = await db.execute(select(SimScenario).where(SimScenario.simulation_id == sim_id))
+    cancelled = 0
+    for sc in result.scalars().all():
+        state = sc.results or {}
+        if state.get("status") not in ACTIVE_STATUSES:
+            continue
+        fut = _futures.get(sim_id, {}).get(sc.id)
+        if fut is not None:
+            fut.cancel()  # no-op once a worker has started it
+        sc.results = {**state, "status": "cancelled", "progress": 0, "finished_at": _now()}
+        cancelled += 1
+    return cancelled
+
+
+async def fail_interrupted_jobs(db: AsyncSession):
+    """Mark queued/running scenarios of jobs without a recent heartbeat as failed."""
+    stale = datetime.datetime.utcnow() - STALE_AFTER
+    result = await db.execute(
+        select(SimScenario)
+        .join(Simulation, SimScenario.simulation_id == Simulation.id)
+        .where(SimScenario.results["status"].as_string().in_(ACTIVE_STATUSES))
+        .where(Simulation.updated_at < stale)
+    )
+    for sc in result.scalars().all():
+        if sc.simulation_id in _futures:
+            continue  # ours, still in the pool
+        sc.results = {**sc.results, "status": "failed", "progress": 100, "error": "执行进程已退出，任务中断"}
+
+
+def shutdown_executor():
+    global _executor, _heartbeat_task
+    if _heartbeat_task is not None:
+        _heartbeat_task.cancel()
+        _heartbeat_task = None
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
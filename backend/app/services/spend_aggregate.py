@@ -0,0 +1,259 @@
+"""Materialized expenditure aggregates.
+
+Every expenditure write applies its delta to ``expenditure_aggregates`` in the
+same transaction, so read paths sum O(groups) rows instead of O(vouchers).
+The denormalized ``CostItem.actual_amount`` / ``SubProject.actual_spent`` are
+then recomputed from the aggregates for the touched ids (``refresh_totals``).
+
+Verify, rebuild or reconcile from the command line (run from ``backend/``)::
+
+    python -m app.services.spend_aggregate check      # aggregates and totals, read-only
+    python -m app.services.spend_aggregate rebuild    # re-derive aggregates, then reconcile totals
+    python -m app.services.spend_aggregate reconcile  # repair drifted totals across the project
+"""
+import asyncio
+import sys
+from typing import Iterable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, delete, update, or_, tuple_
+
+from app.models.budget import Expenditure, ExpenditureAggregate, CostItem
+from app.models.project import SubProject
+from app.utils.dialect import month_bucket, upsert
+
+NO_REF = 0  # category_id / cost_item_id placeholder for "none"
+AMOUNT_TOLERANCE = 1e-6
+
+_agg = ExpenditureAggregate.__table__
+
+
+def _month_key(record_date) -> str:
+    return f"{record_date.year:04d}-{record_date.month:02d}"
+
+
+def _raw_groups_query():
+    """Grouped SELECT over raw expenditures shaped like the aggregate table."""
+    return select(
+        Expenditure.sub_project_id,
+        func.coalesce(Expenditure.category_id, NO_REF).label("category_id"),
+        func.coalesce(Expenditure.cost_item_id, NO_REF).label("cost_item_id"),
+        month_bucket(Expenditure.record_date).label("month"),
+        func.sum(Expenditure.amount).label("amount"),
+        func.count(Expenditure.id).label("record_count"),
+    ).group_by(Expenditure.sub_project_id, "category_id", "cost_item_id", "month")
+
+
+async def apply_expenditures(db: AsyncSession, expenditures: Iterable, sign: int = 1):
+    """Add (sign=1) or remove (sign=-1) expenditures from the aggregate table.
+
+    Accepts anything with sub_project_id, category_id, cost_item_id,
+    record_date and amount attributes (ORM rows or request schemas).
+    """
+    deltas: dict[tuple, list] = {}
+    for e in expenditures:
+        key = (e.sub_project_id, e.category_id or NO_REF, e.cost_item_id or NO_REF, _month_key(e.record_date))
+        d = deltas.setdefault(key, [0.0, 0])
+        d[0] += sign * float(e.amount)
+        d[1] += sign
+    await apply_deltas(db, deltas)
+
+
+async def apply_deltas(db: AsyncSession, deltas: dict[tuple, list]):
+    """Upsert pre-grouped deltas: (sub_project_id, category_id, cost_item_id, "YYYY-MM") -> [amount, count].
+
+    Missing category/cost item ids must already be NO_REF. Groups whose count
+    drops to zero are deleted.
+    """
+    if not deltas:
+        return
+
+    stmt = upsert(db, _agg)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["sub_project_id", "category_id", "cost_item_id", "month"],
+        set_={
+            "amount": _agg.c.amount + stmt.excluded.amount,
+            "record_count": _agg.c.record_count + stmt.excluded.record_count,
+        },
+    )
+    await db.execute(stmt, [
+        {
+            "sub_project_id": sp_id, "category_id": cat_id, "cost_item_id": ci_id,
+            "month": month, "amount": amount, "record_count": count,
+        }
+        for (sp_id, cat_id, ci_id, month), (amount, count) in deltas.items()
+    ])
+    if any(count < 0 for _, count in deltas.values()):
+        key_cols = tuple_(_agg.c.sub_project_id, _agg.c.category_id, _agg.c.cost_item_id, _agg.c.month)
+        await db.execute(delete(_agg).where(key_cols.in_(list(deltas)), _agg.c.record_count <= 0))
+
+
+async def retract_matching(db: AsyncSession, *criteria) -> set[int]:
+    """Remove expenditures matching any criterion; call before a cascading delete.
+
+    Returns the sub-project ids they belonged to, whose totals need a refresh.
+    """
+    result = await db.execute(
+        select(
+            Expenditure.sub_project_id, Expenditure.category_id, Expenditure.cost_item_id,
+            Expenditure.record_date, Expenditure.amount,
+        ).where(or_(*criteria))
+    )
+    rows = result.all()
+    await apply_expenditures(db, rows, sign=-1)
+    return {r.sub_project_id for r in rows}
+
+
+# Denormalized totals kept in step with the aggregates: (model, total column, aggregate key)
+TOTALS = (
+    (CostItem, CostItem.actual_amount, _agg.c.cost_item_id),
+    (SubProject, SubProject.actual_spent, _agg.c.sub_project_id),
+)
+
+
+def _totals_subquery(model, key, ids: Iterable[int] | None):
+    """(id, total) per row of ``model`` (only ``ids`` if given), 0 where it has no spend."""
+    query = (
+        select(model.id.label("id"), func.coalesce(func.sum(_agg.c.amount), 0).label("total"))
+        .outerjoin(_agg, key == model.id)
+        .group_by(model.id)
+    )
+    if ids is not None:
+        query = query.where(model.id.in_(list(ids)))
+    return query.subquery()
+
+
+def _drifted(column, totals):
+    return or_(column.is_(None), func.abs(column - totals.c.total) > AMOUNT_TOLERANCE)
+
+
+async def _sync_totals(db: AsyncSession, model, column, key, ids: Iterable[int] | None) -> int:
+    """One ``UPDATE ... FROM (SELECT ... GROUP BY)`` over the drifted rows. Returns rows changed."""
+    totals = _totals_subquery(model, key, ids)
+    result = await db.execute(
+        update(model)
+        .where(model.id == totals.c.id, _drifted(column, totals))
+        .values({column.key: totals.c.total})
+        # Expire the changed attributes of loaded objects, so the next query reloads them
+        .execution_options(synchronize_session="fetch")
+    )
+    return result.rowcount
+
+
+async def refresh_totals(db: AsyncSession, sub_project_ids: Iterable[int] = (), cost_item_ids: Iterable[int] = ()) -> int:
+    """Recompute CostItem.actual_amount / SubProject.actual_spent of the given ids from the aggregates.
+
+    One grouped statement per table, whatever the number of ids. Returns
+    the number of rows whose total changed.
+    """
+    changed = 0
+    for (model, column, key), ids in zip(TOTALS, (set(cost_item_ids), set(sub_project_ids))):
+        if ids:
+            changed += await _sync_totals(db, model, column, key, ids)
+    return changed
+
+
+async def verify_totals(db: AsyncSession) -> list[dict]:
+    """Every cost item / sub-project whose stored total differs from its aggregates."""
+    drift = []
+    for model, column, key in TOTALS:
+        totals = _totals_subquery(model, key, None)
+        result = await db.execute(
+            select(totals.c.id, column, totals.c.total)
+            .join(totals, model.id == totals.c.id)
+            .where(_drifted(column, totals))
+            .order_by(totals.c.id)
+        )
+        drift += [
+            {"table": model.__tablename__, "id": r[0], "stored": r[1], "expected": float(r[2])}
+            for r in result.all()
+        ]
+    return drift
+
+
+async def reconcile_totals(db: AsyncSession) -> list[dict]:
+    """Full reconcile: find every drifted total across the project and repair it. Returns the drift found."""
+    drift = await verify_totals(db)
+    if drift:
+        for model, column, key in TOTALS:
+            await _sync_totals(db, model, column, key, None)
+    return drift
+
+
+async def rebuild_aggregates(db: AsyncSession) -> int:
+    """Drop and re-derive the whole aggregate table. Returns the group count."""
+    await db.execute(delete(_agg))
+    await db.execute(_agg.insert().from_select(
+        ["sub_project_id", "category_id", "cost_item_id", "month", "amount", "record_count"],
+        _raw_groups_query(),
+    ))
+    result = await db.execute(select(func.count()).select_from(_agg))
+    return result.scalar()
+
+
+async def verify_aggregates(db: AsyncSession) -> list[dict]:
+    """Compare the aggregate table against raw expenditures; return mismatched groups."""
+    raw = {
+        (r.sub_project_id, r.category_id, r.cost_item_id, r.month): (float(r.amount), r.record_count)
+        for r in (await db.execute(_raw_groups_query())).all()
+    }
+    stored = {
+        (r.sub_project_id, r.category_id, r.cost_item_id, r.month): (float(r.amount), r.record_count)
+        for r in (await db.execute(select(_agg))).all()
+    }
+    mismatches = []
+    for key in raw.keys() | stored.keys():
+        expected = raw.get(key, (0.0, 0))
+        actual = stored.get(key, (0.0, 0))
+        if expected[1] != actual[1] or abs(expected[0] - actual[0]) > AMOUNT_TOLERANCE:
+            mismatches.append({
+                "sub_project_id": key[0], "category_id": key[1], "cost_item_id": key[2], "month": key[3],
+                "expected_amount": expected[0], "stored_amount": actual[0],
+                "expected_count": expected[1], "stored_count": actual[1],
+            })
+    return mismatches
+
+
+async def ensure_aggregates(db: AsyncSession):
+    """Rebuild on startup when the table is missing rows (new DB or pre-aggregate data)."""
+    raw_count = (await db.execute(select(func.count(Expenditure.id)))).scalar()
+    agg_count = (await db.execute(select(func.coalesce(func.sum(_agg.c.record_count), 0)))).scalar()
+    if raw_count != agg_count:
+        groups = await rebuild_aggregates(db)
+        print(f"[OK] Rebuilt expenditure aggregates: {raw_count} records -> {groups} groups")
+
+
+async def _main(command: str) -> int:
+    import app.models  # register every mapper before create_all
+    from app.database import async_session, init_db
+
+    await init_db()
+    async with async_session() as db:
+        if command == "rebuild":
+            groups = await rebuild_aggregates(db)
+            await db.commit()
+            print(f"[OK] Rebuilt {groups} aggregate groups")
+        mismatches = await verify_aggregates(db)
+        if command == "check":
+            drift = await verify_totals(db)
+        else:
+            drift = await reconcile_totals(db)
+            await db.commit()
+    for m in mismatches[:20]:
+        print(f"[MISMATCH] {m}")
+    print(f"[{'OK' if not mismatches else 'FAIL'}] {len(mismatches)} mismatched groups")
+    for d in drift[:20]:
+        print(f"[DRIFT] {d}")
+    if command == "check":
+        print(f"[{'OK' if not drift else 'FAIL'}] {len(drift)} drifted totals")
+        return 1 if mismatches or drift else 0
+    print(f"[OK] Repaired {len(drift)} drifted totals")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "check"
+    if cmd not in ("check", "rebuild", "reconcile"):
+        print("usage: python -m app.services.spend_aggregate [check|rebuild|reconcile]")
+        sys.exit(2)
+    sys.exit(asyncio.run(_main(cmd)))
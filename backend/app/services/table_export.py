@@ -0,0 +1,217 @@
+"""Streaming exports of the large tables as CSV, NDJSON or XLSX.
+
+Rows are read in keyset-ordered batches of ``BATCH_SIZE`` (the same seek as
+the paginated list endpoints), each in its own short session, and encoded
+batch by batch into the response, so memory stays flat whatever the table
+size. A batch per session rather than one long server-side cursor: an open
+SQLite read transaction would hold off every writer for as long as a slow
+client takes to download.
+
+XLSX uses openpyxl's write-only mode, which spools rows to a temp file; the
+zip container can only be finished once every row is in, so the file is
+then streamed from disk in chunks.
+"""
+import asyncio
+import csv
+import io
+import json
+import tempfile
+from typing import AsyncIterator
+
+from sqlalchemy import select
+
+from app.database import read_session
+from app.models.budget import Expenditure
+from app.models.cashflow import CashFlow
+from app.models.procurement import ProcurementRecord, WarehouseOutbound
+from app.utils.pagination import seek
+
+BATCH_SIZE = 1000
+FILE_CHUNK = 64 * 1024
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+FLOW_TYPE_LABELS = {"inflow": "流入(拨款)", "outflow": "流出(支出)"}
+
+
+# Per dataset: model, sort keys (ending in the primary key), the column the
+# start/end date filter applies to, the month column, sheet title, and
+# (field, header[, value formatter]) for each exported column.
+DATASETS = {
+    "expenditures": {
+        "model": Expenditure,
+        "keys": [Expenditure.record_date, Expenditure.id],
+        "descending": True,
+        "date": Expenditure.record_date,
+        "month": None,
+        "title": "支出记录",
+        "columns": [
+            ("id", "ID"),
+            ("record_date", "日期"),
+            ("sub_project_id", "子工程ID"),
+            ("category_id", "费用类别ID"),
+            ("cost_item_id", "成本项ID"),
+            ("amount", "金额(万元)"),
+            ("description", "说明"),
+            ("voucher_no", "凭证号"),
+            ("source", "来源"),
+        ],
+    },
+    "cashflow": {
+        "model": CashFlow,
+        "keys": [CashFlow.record_date, CashFlow.id],
+        "descending": True,
+        "date": CashFlow.record_date,
+        "month": None,
+        "title": "现金流记录",
+        "columns": [
+            ("record_date", "日期"),
+            ("flow_type", "类型", lambda v: FLOW_TYPE_LABELS.get(v, v)),
+            ("amount", "金额(万元)"),
+            ("payee", "收款方"),
+            ("category", "用途"),
+            ("description", "说明"),
+            ("voucher_no", "凭证号"),
+            ("status", "状态"),
+        ],
+    },
+    "procurement": {
+        "model": ProcurementRecord,
+        "keys": [ProcurementRecord.month, ProcurementRecord.seq, ProcurementRecord.id],
+        "descending": False,
+        "date": None,
+        "month": ProcurementRecord.month,
+        "title": "塔国采购明细",
+        "columns": [
+            ("month", "月份"),
+            ("seq", "序号"),
+            ("material_name", "物资名称"),
+            ("specification", "规格型号"),
+            ("unit", "单位"),
+            ("purchase_quantity", "采购数量"),
+            ("purchase_unit_price_somoni", "采购单价(索莫尼)"),
+            ("purchase_amount_somoni", "采购金额(索莫尼)"),
+            ("unit_price_rmb", "单价(元)"),
+            ("amount_rmb", "金额(元)"),
+            ("purchase_method", "采购方式"),
+            ("payment_method", "付款方式"),
+            ("usage_unit", "使用单位"),
+            ("project_name", "工程名称"),
+        ],
+    },
+    "warehouse": {
+        "model": WarehouseOutbound,
+        "keys": [WarehouseOutbound.apply_date, WarehouseOutbound.id],
+        "descending": True,
+        "date": WarehouseOutbound.apply_date,
+        "month": None,
+        "title": "出库明细",
+        "columns": [
+            ("apply_date", "申请日期"),
+            ("team", "使用区队"),
+            ("material_type", "物料类型"),
+            ("material_code", "物料编码"),
+            ("material_name", "物料名称"),
+            ("specification", "规格型号"),
+            ("unit", "单位"),
+            ("quantity", "出库数量"),
+            ("unit_price", "单价(元)"),
+            ("amount", "金额(元)"),
+            ("usage_unit", "使用单位"),
+            ("project_name", "工程名称"),
+        ],
+    },
+}
+
+
+def xlsx_available() -> bool:
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+async def iter_batches(dataset: str, start_date=None, end_date=None, month=None) -> AsyncIterator[list[list]]:
+    """Exported column values, BATCH_SIZE rows at a time, in the dataset's order."""
+    spec = DATASETS[dataset]
+    keys, descending = spec["keys"], spec["descending"]
+    model, columns = spec["model"], spec["columns"]
+    # Plain tuples of exactly the exported columns, sort keys appended
+    query = select(*(getattr(model, c[0]) for c in columns), *keys)
+    if start_date:
+        query = query.where(spec["date"] >= start_date)
+    if end_date:
+        query = query.where(spec["date"] <= end_date)
+    if month:
+        query = query.where(spec["month"] == month)
+    width = len(columns)
+    formatters = [(i, c[2]) for i, c in enumerate(columns) if len(c) > 2]
+
+    last = None
+    while True:
+        async with read_session() as db:
+            records = await seek(db, query, keys, descending, BATCH_SIZE, last)
+        rows = [list(r[:width]) for r in records]
+        for i, fmt in formatters:
+            for row in rows:
+                row[i] = fmt(row[i])
+        if records:
+            last = list(records[-1][width:])
+        if rows:
+            yield rows
+        if len(rows) < BATCH_SIZE:
+            return
+
+
+async def csv_chunks(dataset: str, batches: AsyncIterator[list[list]]) -> AsyncIterator[bytes]:
+    # BOM so Excel opens the Chinese headers as UTF-8
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow([c[1] for c in DATASETS[dataset]["columns"]])
+    yield ("\ufeff" + buf.getvalue()).encode("utf-8")
+    async for rows in batches:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows(rows)
+        yield buf.getvalue().encode("utf-8")
+
+
+async def ndjson_chunks(dataset: str, batches: AsyncIterator[list[list]]) -> AsyncIterator[bytes]:
+    fields = [c[0] for c in DATASETS[dataset]["columns"]]
+    async for rows in batches:
+        yield "".join(
+            json.dumps(dict(zip(fields, row)), ensure_ascii=False, default=str) + "\n" for row in rows
+        ).encode("utf-8")
+
+
+def _append_rows(ws, rows: list[list]):
+    for row in rows:
+        ws.append(row)
+
+
+async def xlsx_chunks(dataset: str, batches: AsyncIterator[list[list]]) -> AsyncIterator[bytes]:
+    from openpyxl import Workbook
+
+    spec = DATASETS[dataset]
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(spec["title"])
+    ws.append([c[1] for c in spec["columns"]])
+    async for rows in batches:
+        # openpyxl cell serialization is slow; keep it off the event loop
+        await asyncio.to_thread(_append_rows, ws, rows)
+
+    with tempfile.TemporaryFile() as tmp:
+        await asyncio.to_thread(wb.save, tmp)
+        tmp.seek(0)
+        while chunk := tmp.read(FILE_CHUNK):
+            yield chunk
+
+
+def stream(dataset: str, fmt: str, **filters) -> AsyncIterator[bytes]:
+    """Encoded export body for ``StreamingResponse``."""
+    encoder = {"csv": csv_chunks, "ndjson": ndjson_chunks, "xlsx": xlsx_chunks}[fmt]
+    return encoder(dataset, iter_batches(dataset, **filters))
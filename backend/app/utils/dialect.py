@@ -0,0 +1,40 @@
+"""SQL that differs between SQLite and PostgreSQL.
+
+The app runs on either (``DATABASE_URL``). Queries use these helpers instead
+of dialect-specific functions or constructs, so they compile correctly for
+whichever engine executes them.
+"""
+from sqlalchemy import String, func, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+
+class month_bucket(FunctionElement):
+    """``'YYYY-MM'`` of a date / datetime column."""
+    type = String()
+    inherit_cache = True
+    name = "month_bucket"
+
+
+# Formats are literals, not bound parameters, so the expression renders the
+# same in SELECT and GROUP BY (PostgreSQL requires that)
+@compiles(month_bucket, "sqlite")
+def _month_bucket_sqlite(element, compiler, **kw):
+    return compiler.process(func.strftime(literal_column("'%Y-%m'"), *element.clauses), **kw)
+
+
+@compiles(month_bucket, "postgresql")
+def _month_bucket_postgresql(element, compiler, **kw):
+    return compiler.process(func.to_char(*element.clauses, literal_column("'YYYY-MM'")), **kw)
+
+
+def dialect_name(db: AsyncSession) -> str:
+    return db.bind.dialect.name
+
+
+def upsert(db: AsyncSession, table):
+    """INSERT supporting ``on_conflict_do_update`` / ``on_conflict_do_nothing`` on the session's dialect."""
+    return (pg_insert if dialect_name(db) == "postgresql" else sqlite_insert)(table)
@@ -0,0 +1,154 @@
+"""Keyset (cursor) pagination for the large list endpoints.
+
+A page is read in a fixed sort order that ends in the primary key, e.g.
+``(record_date DESC, id DESC)``. The continuation token is the sort key of the
+last row on the page, as base64url-encoded JSON, and the next page is the
+row-value range ``(record_date, id) < (:date, :id)``. That seeks straight into
+the index holding the order, so page 2,000 costs the same as page 1, unlike
+``OFFSET`` which walks and discards every earlier row.
+
+A nullable sort key (``warehouse_outbound.apply_date``,
+``procurement_records.seq``) sorts NULL as its smallest value on every
+dialect: last when descending, first when ascending, which is SQLite's index
+order. Row values compare NULL as unknown, so the rows after such a cursor are
+read as a few consecutive runs instead (e.g. ``(apply_date, id) < (:d, :id)``
+and then ``apply_date IS NULL``). Each run is its own indexed seek, because
+one ``OR`` of them would scan.
+
+Tokens travel in the ``X-Next-Cursor`` response header, so the list bodies are
+unchanged and ``page``/``page_size`` keep working for existing callers.
+Totals are opt-in (``include_total``) and counted only up to ``TOTAL_CAP``
+rows; beyond that ``X-Total-Count`` is the cap and ``X-Total-Estimated`` is
+``true``.
+"""
+import base64
+import binascii
+import json
+from datetime import date
+
+from fastapi import HTTPException, Response
+from sqlalchemy import Select, select, func, tuple_, and_, Date
+from sqlalchemy.ext.asyncio import AsyncSession
+
+TOTAL_CAP = 10000
+PAGE_HEADERS = ["X-Next-Cursor", "X-Total-Count", "X-Total-Estimated"]
+
+
+def encode_cursor(values: list) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, date) else v for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, keys: list) -> list:
+    """Sort-key values from a token, typed like ``keys``. 400 on a malformed token."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError(token)
+        if any(v is None and not _nullable(k) for k, v in zip(keys, values)):
+            raise ValueError(token)
+        return [
+            date.fromisoformat(v) if v is not None and isinstance(k.type, Date) else v
+            for k, v in zip(keys, values)
+        ]
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
+
+def _nullable(key) -> bool:
+    return key.expression.nullable
+
+
+def key_order(keys: list, descending: bool) -> list:
+    """ORDER BY for ``keys``, NULL sorting as the smallest value."""
+    if descending:
+        return [k.desc().nulls_last() if _nullable(k) else k.desc() for k in keys]
+    return [k.asc().nulls_first() if _nullable(k) else k for k in keys]
+
+
+def _compare(keys: list, values: list, descending: bool):
+    if len(keys) == 1:
+        return keys[0] < values[0] if descending else keys[0] > values[0]
+    return tuple_(*keys) < tuple_(*values) if descending else tuple_(*keys) > tuple_(*values)
+
+
+def _row_value_exact(keys: list, values: list, descending: bool) -> bool:
+    """Whether one row-value comparison finds every row after ``values``."""
+    return all(v is not None for v in values) and not (descending and any(_nullable(k) for k in keys))
+
+
+def keyset_runs(keys: list, values: list, descending: bool, prefix: tuple = ()) -> list:
+    """Rows strictly after ``values`` in the ``keys`` order, as conditions to read in turn.
+
+    Each condition selects the next consecutive run of the order.
+    """
+    key, value = keys[0], values[0]
+    if value is None:
+        # The rest of key's NULL run; ascending, every non-NULL key follows it
+        runs = keyset_runs(keys[1:], values[1:], descending, (*prefix, key.is_(None)))
+        return runs if descending else runs + [and_(*prefix, key.is_not(None))]
+    if _row_value_exact(keys[1:], values[1:], descending):
+        runs = [and_(*prefix, _compare(keys, values, descending))]
+    else:
+        runs = keyset_runs(keys[1:], values[1:], descending, (*prefix, key == value))
+        runs.append(and_(*prefix, _compare([key], [value], descending)))
+    if descending and _nullable(key):
+        runs.append(and_(*prefix, key.is_(None)))
+    return runs
+
+
+async def seek(db: AsyncSession, query: Select, keys: list, descending: bool, limit: int, after: list | None = None) -> list:
+    """Up to ``limit`` result rows of ``query`` in ``keys`` order, after the sort-key values ``after``."""
+    order = key_order(keys, descending)
+    if after is None:
+        return (await db.execute(query.order_by(*order).limit(limit))).all()
+    rows = []
+    for run in keyset_runs(keys, after, descending):
+        result = await db.execute(query.where(run).order_by(*order).limit(limit - len(rows)))
+        rows += result.all()
+        if len(rows) >= limit:
+            break
+    return rows
+
+
+async def capped_count(db: AsyncSession, query: Select, keys: list) -> tuple[int, bool]:
+    """(count, estimated): the row count of ``query``, stopping at TOTAL_CAP."""
+    capped = query.with_only_columns(keys[-1]).limit(TOTAL_CAP + 1).subquery()
+    n = (await db.execute(select(func.count()).select_from(capped))).scalar()
+    return min(n, TOTAL_CAP), n > TOTAL_CAP
+
+
+async def fetch_page(
+    db: AsyncSession,
+    query: Select,
+    keys: list,
+    response: Response,
+    *,
+    descending: bool,
+    page_size: int,
+    cursor: str | None = None,
+    page: int = 1,
+    include_total: bool = False,
+) -> list:
+    """One page of ``query`` ordered by ``keys`` (last key must be unique).
+
+    ``cursor`` takes precedence over ``page``. Sets the pagination headers on
+    ``response`` and returns the ORM rows.
+    """
+    if include_total:
+        total, estimated = await capped_count(db, query, keys)
+        response.headers["X-Total-Count"] = str(total)
+        response.headers["X-Total-Estimated"] = "true" if estimated else "false"
+
+    # One extra row tells whether a next page exists without a count
+    if cursor:
+        rows = await seek(db, query, keys, descending, page_size + 1, decode_cursor(cursor, keys))
+    else:
+        if page > 1:
+            query = query.offset((page - 1) * page_size)
+        rows = await seek(db, query, keys, descending, page_size + 1)
+    rows = [r[0] for r in rows]
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        response.headers["X-Next-Cursor"] = encode_cursor([getattr(rows[-1], k.key) for k in keys])
+    return rows
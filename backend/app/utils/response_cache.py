@@ -0,0 +1,384 @@
+"""Read-through response cache for the polled overview endpoints.
+
+``@cached(name, ttl, tags)`` stores an endpoint's JSON body and serves it
+until ``ttl`` seconds pass or one of its tags is invalidated. Invalidation
+is automatic: whenever a commit changes tables (``database.change_versions``),
+the tags of those tables (``TABLE_TAGS``) are invalidated. An expenditure,
+cash flow, alert or procurement write therefore evicts the cached summaries
+built from it, whichever router, service or background job made it.
+
+Each tag has a generation counter. Invalidating a tag bumps it, and an entry
+is only served while the generations it was stored under are current. The
+generations are read *before* the endpoint computes, so a write committing
+mid-computation leaves the new entry stale, never silently wrong.
+
+Backends: an in-process LRU (default), or a Redis server shared by every
+worker process when ``CACHE_URL`` is set (``redis`` package required). With
+several processes on the in-process backend, a write only evicts its own
+process's entries and the others catch up within ``ttl``.
+
+``@conditional(tags)`` sends a weak ``ETag`` and answers a matching
+``If-None-Match`` with 304. On the shared backend the ETag is built from the
+generations, so the 304 comes before the endpoint runs: no query, no
+serialization, no body. Everywhere else the endpoint runs and the ETag is a
+hash of its body, which saves the transfer but not the query:
+
+- on the in-process backend, where another worker's write never bumps this
+  process's generations, so they cannot vouch for the data;
+- for endpoints reading from a replica (``READ_DATABASE_URL``), which may
+  still return pre-commit rows after the write bumped the generations. Those
+  bodies are not stored by ``@cached`` either.
+"""
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import secrets
+import time
+from collections import OrderedDict
+from datetime import date
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.database import change_versions, engine, read_engine
+from app.models.budget import BudgetCategory, CostItem, Expenditure, ExpenditureAggregate
+from app.models.project import Project, SubProject, MilestoneNode, ProgressRecord
+from app.models.alert import AlertLog
+from app.models.cashflow import CashFlow
+from app.models.procurement import CivilSettlement, ProcurementMonthlySummary, ProcurementRecord, WarehouseOutbound
+
+CACHE_HEADERS = ["X-Cache", "ETag"]
+
+# Table written -> tag invalidated
+TABLE_TAGS = {
+    **{m.__tablename__: "expenditure" for m in (Expenditure, ExpenditureAggregate)},
+    **{m.__tablename__: "budget" for m in (BudgetCategory, CostItem)},
+    **{m.__tablename__: "project" for m in (Project, SubProject, MilestoneNode, ProgressRecord)},
+    CashFlow.__tablename__: "cashflow",
+    AlertLog.__tablename__: "alert",
+    **{m.__tablename__: "procurement" for m in (CivilSettlement, ProcurementMonthlySummary, ProcurementRecord, WarehouseOutbound)},
+}
+
+
+class MemoryBackend:
+    """LRU of ``max_entries`` bodies in this process."""
+    name = "memory"
+    shared = False  # generations only see this process's writes
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries: OrderedDict[str, tuple[float, tuple, bytes]] = OrderedDict()  # key -> (expires, generations, body)
+        self._generations: dict[str, int] = {}
+        self.epoch = secrets.token_hex(4)  # generations restart with the process
+
+    def generations(self, tags: tuple[str, ...]) -> tuple:
+        return tuple(self._generations.get(t, 0) for t in tags)
+
+    def get(self, key: str, tags: tuple[str, ...]) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, generations, body = entry
+        if expires < time.monotonic() or generations != self.generations(tags):
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return body
+
+    def set(self, key: str, body: bytes, ttl: float, generations: tuple):
+        self._entries[key] = (time.monotonic() + ttl, generations, body)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, tags):
+        for tag in tags:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+
+    def info(self) -> dict:
+        return {"entries": len(self._entries), "max_entries": self.max_entries, "evictions": self.evictions}
+
+
+class RedisBackend:
+    """Entries and tag generations in Redis, shared by every worker process."""
+    name = "redis"
+    shared = True
+    PREFIX = "response_cache:"
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("CACHE_URL is set but the redis package is not installed (pip install redis)") from None
+
+        self.client = redis.from_url(url)
+        self.epoch = None
+
+    def _tag_keys(self, tags) -> list[str]:
+        return [f"{self.PREFIX}tag:{t}" for t in tags]
+
+    async def generations(self, tags: tuple[str, ...]) -> tuple:
+        if self.epoch is None:
+            # Generations restart if Redis loses its data; so does the epoch
+            await self.client.set(self.PREFIX + "epoch", secrets.token_hex(4), nx=True)
+        epoch, *values = await self.client.mget([self.PREFIX + "epoch", *self._tag_keys(tags)])
+        self.epoch = epoch.decode()
+        return tuple(int(v or 0) for v in values)
+
+    async def get(self, key: str, tags: tuple[str, ...]) -> bytes | None:
+        raw = await self.client.get(self.PREFIX + key)
+        if raw is None:
+            return None
+        head, body = raw.split(b"\n", 1)
+        if tuple(json.loads(head)) != await self.generations(tags):
+            return None
+        return body
+
+    async def set(self, key: str, body: bytes, ttl: float, generations: tuple):
+        value = json.dumps(list(generations)).encode() + b"\n" + body
+        await self.client.set(self.PREFIX + key, value, px=max(1, int(ttl * 1000)))
+
+    async def invalidate(self, tags):
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key in self._tag_keys(tags):
+                pipe.incr(key)
+            await pipe.execute()
+
+    def info(self) -> dict:
+        return {}
+
+
+async def _resolve(value):
+    return await value if inspect.isawaitable(value) else value
+
+
+class ResponseCache:
+    """Backend plus hit / miss / invalidation counters."""
+
+    def __init__(self):
+        self._backend = None
+        self.hits: dict[str, int] = {}
+        self.misses: dict[str, int] = {}
+        self.errors = 0
+        self.invalidations: dict[str, int] = {}
+
+    def open(self):
+        """Create the backend at startup, so a missing ``redis`` package fails there, not per request."""
+        if settings.CACHE_ENABLED and self._backend is None:
+            self._backend = self._create_backend()
+
+    @staticmethod
+    def _create_backend():
+        return RedisBackend(settings.CACHE_URL) if settings.CACHE_URL else MemoryBackend(settings.CACHE_MAX_ENTRIES)
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = self._create_backend()
+        return self._backend
+
+    async def lookup(self, name: str, key: str, tags: tuple[str, ...]) -> bytes | None:
+        try:
+            body = await _resolve(self.backend.get(key, tags))
+        except Exception as e:
+            self._error(e)
+            body = None
+        counter = self.hits if body is not None else self.misses
+        counter[name] = counter.get(name, 0) + 1
+        return body
+
+    async def generations(self, tags: tuple[str, ...]) -> tuple | None:
+        try:
+            return await _resolve(self.backend.generations(tags))
+        except Exception as e:
+            self._error(e)
+            return None
+
+    async def etag(self, tags: tuple[str, ...]) -> str | None:
+        """Weak ETag for data read from ``tags``; changes whenever one of them is invalidated.
+
+        None unless the backend is shared: per-process generations miss other workers' writes.
+        """
+        if not self.backend.shared:
+            return None
+        generations = await self.generations(tags)
+        if generations is None:
+            return None
+        version = "-".join(f"{t}{g}" for t, g in zip(tags, generations))
+        return f'W/"{settings.APP_VERSION}.{self.backend.epoch}.{version}"'
+
+    async def store(self, key: str, body: bytes, ttl: float, generations: tuple | None):
+        if generations is None:
+            return
+        try:
+            await _resolve(self.backend.set(key, body, ttl, generations))
+        except Exception as e:
+            self._error(e)
+
+    def invalidate(self, tags):
+        """Evict every entry under ``tags``; callable from sync code (session events)."""
+        tags = sorted(tags)
+        for tag in tags:
+            self.invalidations[tag] = self.invalidations.get(tag, 0) + 1
+        try:
+            pending = self.backend.invalidate(tags)
+        except Exception as e:
+            self._error(e)
+            return
+        if inspect.isawaitable(pending):
+            asyncio.get_running_loop().create_task(self._await_invalidation(pending))
+
+    async def _await_invalidation(self, pending):
+        try:
+            await pending
+        except Exception as e:
+            self._error(e)
+
+    def _error(self, e: Exception):
+        self.errors += 1
+        if self.errors == 1 or self.errors % 1000 == 0:
+            print(f"[WARN] Response cache backend error ({self.errors} so far): {type(e).__name__}: {e}")
+
+    def stats(self) -> dict:
+        names = sorted(self.hits.keys() | self.misses.keys())
+        hits, misses = sum(self.hits.values()), sum(self.misses.values())
+        return {
+            "enabled": settings.CACHE_ENABLED,
+            "backend": self.backend.name,
+            **self.backend.info(),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+            "errors": self.errors,
+            "endpoints": {
+                n: {"hits": self.hits.get(n, 0), "misses": self.misses.get(n, 0)} for n in names
+            },
+            "invalidations": dict(sorted(self.invalidations.items())),
+            "table_versions": change_versions.snapshot(),
+        }
+
+
+response_cache = ResponseCache()
+
+
+def _cache_key(name: str, kwargs: dict) -> str:
+    # Query parameters only: the session and the current user are not part of the response
+    params = sorted(
+        (k, v.isoformat() if isinstance(v, date) else v)
+        for k, v in kwargs.items()
+        if v is None or isinstance(v, (str, int, float, bool, date))
+    )
+    return name + "?" + json.dumps(params, separators=(",", ":"), ensure_ascii=False)
+
+
+def _encode(result) -> bytes:
+    # Same bytes FastAPI's JSONResponse would send
+    if isinstance(result, BaseModel):
+        return result.model_dump_json(by_alias=True).encode()
+    return json.dumps(
+        jsonable_encoder(result), ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+    ).encode()
+
+
+def _reads_replica(kwargs: dict) -> bool:
+    # The generations follow the primary's commits, not the replica's replay
+    # (the default SQLite read engine opens the same file, so it never lags)
+    return bool(settings.READ_DATABASE_URL) and read_engine is not engine and any(
+        isinstance(v, AsyncSession) and v.bind is read_engine for v in kwargs.values()
+    )
+
+
+def cached(name: str, ttl: float, tags: tuple[str, ...]):
+    """Serve the decorated endpoint from the response cache (place below the route decorator)."""
+    tags = tuple(sorted(tags))
+
+    def decorate(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            if not settings.CACHE_ENABLED or _reads_replica(kwargs):
+                return await endpoint(*args, **kwargs)
+            key = _cache_key(name, kwargs)
+            body = await response_cache.lookup(name, key, tags)
+            status = "HIT"
+            if body is None:
+                status = "MISS"
+                generations = await response_cache.generations(tags)
+                body = _encode(await endpoint(*args, **kwargs))
+                await response_cache.store(key, body, ttl, generations)
+            return Response(content=body, media_type="application/json", headers={"X-Cache": status})
+
+        return wrapper
+
+    return decorate
+
+
+def _etag_matches(header: str | None, etag: str) -> bool:
+    # Weak comparison: W/ prefixes are ignored
+    if not header:
+        return False
+    opaque = etag.removeprefix("W/")
+    return any(c == "*" or c.removeprefix("W/") == opaque for c in (c.strip() for c in header.split(",")))
+
+
+def conditional(*tags: str):
+    """ETag / If-None-Match for a GET endpoint whose data comes from ``tags`` (place below the route decorator).
+
+    The endpoint's own dependencies (authentication included) still run
+    first; only the query and serialization are skipped on a 304. Without
+    generation ETags (in-process backend, replica session) the endpoint
+    always runs and the ETag hashes its body.
+    """
+    tags = tuple(sorted(tags))
+
+    def decorate(endpoint):
+        signature = inspect.signature(endpoint)
+        params = list(signature.parameters.values())
+        # FastAPI injects one Request / Response per endpoint: reuse the endpoint's own if declared
+        names = {}
+        for cls, default in ((Request, "etag_request"), (Response, "etag_response")):
+            names[cls] = next((p.name for p in params if p.annotation is cls), default)
+            if names[cls] == default:
+                params.append(inspect.Parameter(default, inspect.Parameter.KEYWORD_ONLY, annotation=cls))
+        own = set(signature.parameters)
+
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            request, response = kwargs[names[Request]], kwargs[names[Response]]
+            kwargs = {k: v for k, v in kwargs.items() if k in own}
+            if not settings.CACHE_ENABLED:
+                return await endpoint(*args, **kwargs)
+            etag = None if _reads_replica(kwargs) else await response_cache.etag(tags)
+            if etag is None:
+                result = await endpoint(*args, **kwargs)
+                body = result.body if isinstance(result, Response) else _encode(result)
+                etag = f'W/"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+            else:
+                result = None
+            headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+            if _etag_matches(request.headers.get("if-none-match"), etag):
+                return Response(status_code=304, headers=headers)
+            if result is None:
+                result = await endpoint(*args, **kwargs)
+            # A returned Response (e.g. from @cached) is sent as is; otherwise FastAPI merges ``response``
+            (result if isinstance(result, Response) else response).headers.update(headers)
+            return result
+
+        wrapper.__signature__ = signature.replace(parameters=params)
+        return wrapper
+
+    return decorate
+
+
+def _on_tables_changed(tables: set[str]):
+    tags = {TABLE_TAGS[t] for t in tables if t in TABLE_TAGS}
+    if tags:
+        response_cache.invalidate(tags)
+
+
+change_versions.subscribe(_on_tables_changed)
@@ -1,4 +1,22 @@
-"""Security utilities for authentication and authorization."""
+"""Security utilities for authentication and authorization.
+
+``get_current_user`` keeps an in-process cache of verified tokens: token ->
+its user, detached from any session, for ``AUTH_CACHE_TTL`` seconds (never
+past the token's own expiry). A cached request neither decodes the JWT nor
+queries ``users``. Any committed write to ``users`` (role change,
+deactivation, deletion) clears the cache through ``change_versions``. Other
+processes pick such a change up within the TTL. Handlers must treat the
+returned user as read-only, since it is shared between requests.
+
+bcrypt hashing and verification (``BCRYPT_ROUNDS``, about 0.3 s at the default
+cost) run on a pool of ``PASSWORD_HASH_WORKERS`` threads, so a burst of logins
+queues there instead of stalling the event loop. A hash made with another
+cost still verifies and is replaced on that user's next successful login.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -6,11 +24,10 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from app.config import settings
-from app.database import get_db
+from app.database import async_session, change_versions
 
 # Fix passlib + bcrypt 4.1+ compatibility
 import bcrypt as _bcrypt_mod
@@ -19,16 +36,47 @@ if not hasattr(_bcrypt_mod, '__about__'):
         __version__ = getattr(_bcrypt_mod, '__version__', '4.0.0')
     _bcrypt_mod.__about__ = _About()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min = max = default: hashes of any other cost report ``needs_update``
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+_hash_executor: ThreadPoolExecutor | None = None
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
 
+def _get_hash_executor() -> ThreadPoolExecutor:
+    global _hash_executor
+    if _hash_executor is None:
+        _hash_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+    return _hash_executor
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+
+def shutdown_hash_executor():
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False, cancel_futures=True)
+        _hash_executor = None
+
+
+async def _run_hashing(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_get_hash_executor(), fn, *args)
+
+
+async def hash_password(password: str) -> str:
+    return await _run_hashing(pwd_context.hash, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run_hashing(pwd_context.verify, plain_password, hashed_password)
+
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """(valid, replacement hash) — the replacement is set when ``hashed_password`` uses another cost."""
+    return await _run_hashing(pwd_context.verify_and_update, plain_password, hashed_password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -38,13 +86,54 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_db),
-):
+_auth_cache: OrderedDict = OrderedDict()  # token -> (valid until, monotonic clock; detached User)
+
+
+def clear_auth_cache():
+    _auth_cache.clear()
+
+
+def _on_tables_changed(tables: set[str]):
+    if "users" in tables:
+        clear_auth_cache()
+
+
+change_versions.subscribe(_on_tables_changed)
+
+
+def _cached_user(token: str):
+    entry = _auth_cache.get(token)
+    if entry is None:
+        return None
+    valid_until, user = entry
+    if valid_until < time.monotonic():
+        del _auth_cache[token]
+        return None
+    _auth_cache.move_to_end(token)
+    return user
+
+
+def _cache_user(token: str, payload: dict, user, users_version: int):
+    ttl = settings.AUTH_CACHE_TTL
+    if ttl <= 0 or change_versions.version("users") != users_version:
+        return  # users changed while this one was loading
+    if "exp" in payload:
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl <= 0:
+        return
+    _auth_cache[token] = (time.monotonic() + ttl, user)
+    while len(_auth_cache) > settings.AUTH_CACHE_MAX_ENTRIES:
+        _auth_cache.popitem(last=False)
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
     """Get current authenticated user from JWT token."""
     from app.models.user import User
 
+    user = _cached_user(token)
+    if user is not None:
+        return user
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="无法验证凭据",
@@ -61,10 +150,15 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
 
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
+    users_version = change_versions.version("users")
+    async with async_session() as db:
+        result = await db.execute(select(User).where(User.id == user_id))
+        user = result.scalar_one_or_none()
+        if user is not None:
+            db.expunge(user)
     if user is None or not user.is_active:
         raise credentials_exception
+    _cache_user(token, payload, user, users_version)
     return user
 
 
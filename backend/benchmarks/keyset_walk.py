@@ -0,0 +1,94 @@
+"""Cursor-walk check for the keyset-paginated lists and exports.
+
+Seeds a throwaway SQLite database through the app's own startup, clears some
+sort keys to NULL (``warehouse_outbound.apply_date``,
+``procurement_records.seq``), then follows ``X-Next-Cursor`` through every
+page at several page sizes, so page boundaries land inside the NULL runs, and
+streams the exports in small batches. Exits 1 unless each walk returns every
+row once, in the documented order (NULL sorts as the smallest value).
+
+Run from ``backend/``::
+
+    python -m benchmarks.keyset_walk
+"""
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+
+PAGE_SIZES = [7, 50, 500]
+EXPORT_BATCH = 100
+
+
+def _walk(client, headers, path: str, page_size: int) -> list[int]:
+    ids, params = [], {"page_size": page_size}
+    while True:
+        resp = client.get(path, params=params, headers=headers)
+        resp.raise_for_status()
+        ids += [r["id"] for r in resp.json()]
+        cursor = resp.headers.get("X-Next-Cursor")
+        if not cursor:
+            return ids
+        params = {"page_size": page_size, "cursor": cursor}
+
+
+def main() -> int:
+    fd, db_path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    os.remove(db_path)
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{db_path}"
+    os.environ["ALERT_SCAN_ENABLED"] = "false"
+    os.environ["CACHE_ENABLED"] = "false"
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.services import table_export
+
+    failures = []
+    try:
+        with TestClient(app) as client:
+            token = client.post("/api/auth/login", json={"username": "admin", "password": "admin123"}).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+
+            conn = sqlite3.connect(db_path)
+            conn.execute("UPDATE warehouse_outbound SET apply_date = NULL WHERE id % 97 = 0 OR id <= 3")
+            conn.execute("UPDATE procurement_records SET seq = NULL WHERE id % 13 = 0")
+            conn.commit()
+            outbound = conn.execute("SELECT id, apply_date FROM warehouse_outbound").fetchall()
+            records = conn.execute("SELECT id, month, seq FROM procurement_records").fetchall()
+            conn.close()
+
+            expected = {
+                "/api/settlement/warehouse/outbound": [
+                    r[0] for r in sorted(outbound, key=lambda r: (r[1] is not None, r[1] or "", r[0]), reverse=True)
+                ],
+                "/api/settlement/procurement/records": [
+                    r[0] for r in sorted(records, key=lambda r: (r[1], r[2] is not None, r[2] or 0, r[0]))
+                ],
+            }
+            for path, want in expected.items():
+                for size in PAGE_SIZES:
+                    got = _walk(client, headers, path, size)
+                    if got != want:
+                        failures.append(f"{path} page_size={size}: {len(got)} of {len(want)} rows, order {'ok' if sorted(got) == sorted(want) else 'differs'}")
+
+            table_export.BATCH_SIZE = EXPORT_BATCH
+            for dataset, n in (("warehouse", len(outbound)), ("procurement", len(records))):
+                resp = client.get(f"/api/export/{dataset}", params={"format": "ndjson"}, headers=headers)
+                rows = [json.loads(line) for line in resp.text.splitlines() if line.strip()]
+                if len(rows) != n:
+                    failures.append(f"export {dataset}: {len(rows)} of {n} rows")
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+    for failure in failures:
+        print(f"[FAIL] {failure}")
+    print(f"[{'OK' if not failures else 'FAIL'}] {len(outbound)} outbound and {len(records)} procurement rows walked, {len(failures)} mismatches")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""Monthly report latency vs. number of sub-projects.
+
+Builds a throwaway SQLite database per size, fills it with synthetic
+sub-projects and a year of expenditures, and times build_monthly_report.
+
+Run from ``backend/``::
+
+    python -m benchmarks.monthly_report
+    python -m benchmarks.monthly_report 200 1000 5000
+"""
+import asyncio
+import datetime
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+
+import app.models  # register every mapper before create_all
+from app.database import Base
+from app.models.project import Project, SubProject
+from app.models.budget import BudgetCategory, Expenditure
+from app.services.report_engine import build_monthly_report
+from app.services.spend_aggregate import rebuild_aggregates
+
+DEFAULT_SIZES = [200, 500, 1000, 2000, 5000]
+EXPENDITURES_PER_SUB_PROJECT = 12
+RUNS = 5
+
+
+async def _seed(db: AsyncSession, n_sub_projects: int):
+    rng = random.Random(n_sub_projects)
+    await db.execute(insert(Project.__table__), [{
+        "id": 1, "name": "bench", "total_budget": 56397.84, "reserve_rate": 0.07,
+    }])
+    cats = []
+    for l1 in range(1, 7):
+        cats.append({"id": l1, "name": f"L1-{l1}", "level": 1, "budget_amount": 10000, "sort_order": l1})
+        for j in range(8):
+            cid = 100 + l1 * 10 + j
+            cats.append({"id": cid, "name": f"L2-{cid}", "level": 2, "parent_id": l1, "budget_amount": 1000, "sort_order": j})
+    await db.execute(insert(BudgetCategory.__table__), cats)
+    l2_ids = [c["id"] for c in cats if c["level"] == 2]
+
+    sps, exps = [], []
+    for i in range(1, n_sub_projects + 1):
+        start = datetime.date(2025, 1, 1) + datetime.timedelta(days=rng.randint(0, 180))
+        sps.append({
+            "id": i, "project_id": 1, "name": f"SP-{i}", "category": "矿建工程",
+            "allocated_budget": rng.uniform(10, 500), "actual_spent": 0,
+            "progress_percent": rng.uniform(0, 100), "status": "in_progress",
+            "planned_start": start, "planned_end": start + datetime.timedelta(days=rng.randint(90, 720)),
+            "sort_order": i,
+        })
+        for _ in range(EXPENDITURES_PER_SUB_PROJECT):
+            exps.append({
+                "sub_project_id": i, "category_id": rng.choice(l2_ids),
+                "record_date": datetime.date(2025, rng.randint(1, 12), rng.randint(1, 28)),
+                "amount": rng.uniform(0.5, 40), "source": "manual",
+            })
+    await db.execute(insert(SubProject.__table__), sps)
+    await db.execute(insert(Expenditure.__table__), exps)
+    await rebuild_aggregates(db)
+    await db.commit()
+
+
+async def bench(n_sub_projects: int) -> tuple[float, float, int]:
+    """Return (median ms, max ms, SQL statements per report) for one size."""
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with session() as db:
+            await _seed(db, n_sub_projects)
+
+        statements = 0
+
+        def _count(*_):
+            nonlocal statements
+            statements += 1
+
+        event.listen(engine.sync_engine, "before_cursor_execute", _count)
+        timings = []
+        async with session() as db:
+            for _ in range(RUNS):
+                t0 = time.perf_counter()
+                await build_monthly_report(db, 2025, 12)
+                timings.append((time.perf_counter() - t0) * 1000)
+        return statistics.median(timings), max(timings), statements // RUNS
+    finally:
+        await engine.dispose()
+        os.remove(path)
+
+
+async def main(sizes: list[int]):
+    print(f"{'sub_projects':>12} {'median_ms':>10} {'max_ms':>10} {'queries':>8}")
+    for n in sizes:
+        median_ms, max_ms, queries = await bench(n)
+        print(f"{n:>12} {median_ms:>10.1f} {max_ms:>10.1f} {queries:>8}")
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or DEFAULT_SIZES
+    asyncio.run(main(sizes))
@@ -0,0 +1,162 @@
+"""EXPLAIN QUERY PLAN check for every router query.
+
+Seeds a throwaway SQLite database through the app's own startup, calls every
+GET route (plus the filtered variants and write paths below), records each SQL
+statement the routers issue and runs EXPLAIN QUERY PLAN on it. Exits 1 when a
+filtered statement (or a LIMIT that sorts the whole table) does a bare
+``SCAN`` of one of the large tables, or when a statement cannot be
+explained at all; unfiltered reads of a whole table may scan, and
+``LIKE '%...%'`` filters cannot use a B-tree index.
+
+Run from ``backend/``::
+
+    python -m benchmarks.query_plans
+"""
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+LARGE_TABLES = {
+    "expenditures", "expenditure_aggregates", "cash_flows", "alert_logs",
+    "procurement_records", "warehouse_outbound", "cost_items", "progress_records",
+}
+
+GET_VARIANTS = {
+    "/api/expenditures": [
+        {"sub_project_id": 1}, {"cost_item_id": 1}, {"category_id": 7},
+        {"start_date": "2025-01-01", "end_date": "2025-06-30"}, {"sub_project_id": 1, "start_date": "2025-01-01"},
+        {"cursor": "WyIyMDI1LTA2LTAxIiwxMDAwXQ"}, {"sub_project_id": 1, "cursor": "WyIyMDI1LTA2LTAxIiwxMDAwXQ"},
+    ],
+    "/api/expenditures/summary": [{"sub_project_id": 1}],
+    "/api/budget/cost-items": [{"sub_project_id": 1}, {"category_id": 7}],
+    "/api/cashflow": [{"flow_type": "outflow"}, {"status": "pending"}, {"start_date": "2025-01-01"}],
+    "/api/alerts": [{"level": "red"}, {"is_resolved": "false"}],
+    "/api/settlement/procurement/records": [
+        {"month": 3}, {"cursor": "WzMsMTAsMTAwXQ"}, {"month": 3, "cursor": "WzMsMTAsMTAwXQ"}, {"cursor": "WzMsbnVsbCwxMDBd"},
+    ],
+    "/api/settlement/procurement/records/count": [{"month": 3}],
+    "/api/settlement/warehouse/outbound": [
+        {"start_date": "2025-01-01", "end_date": "2025-12-31"}, {"include_total": "true"},
+        {"cursor": "WyIyMDI1LTA2LTAxIiwxMDAwXQ"}, {"start_date": "2025-01-01", "cursor": "WyIyMDI1LTA2LTAxIiwxMDAwXQ"},
+        {"cursor": "W251bGwsMTAwMF0"},
+    ],
+    "/api/settlement/warehouse/outbound/count": [{"start_date": "2025-01-01"}],
+    "/api/settlement/search": [{"q": "钢管"}, {"q": "电缆", "month": 1}, {"q": "螺栓", "start_date": "2025-03-01"}],
+    "/api/reports/monthly": [{"year": 2025, "month": 12}],
+    "/api/reports/batch": [{"start": "2025-01", "end": "2025-12"}],
+    "/api/export/{dataset}": [{"start_date": "2025-01-01"}, {"month": 3}],
+}
+
+# Path parameters to fill in instead of "1"
+PATH_VALUES = {
+    "/api/export/{dataset}": ["expenditures", "cashflow", "procurement", "warehouse"],
+}
+
+WRITES = [
+    ("post", "/api/expenditures", {"sub_project_id": 1, "cost_item_id": 1, "record_date": "2025-06-01", "amount": 1.0}),
+    ("post", "/api/projects/progress", {"sub_project_id": 1, "record_date": "2025-06-01", "percent": 10}),
+    ("post", "/api/alerts/check", None),
+    ("delete", "/api/expenditures/{last_expenditure}", None),
+]
+
+_BARE_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+
+
+def _offending(plan_details: list[str], sql: str) -> list[str]:
+    """Bare scans of a large table that an index should have avoided."""
+    upper = sql.upper()
+    if " LIKE " in upper:
+        return []
+    # A scan is only a fallback when the statement filters, or sorts the whole table for a top-N
+    filtered = " WHERE " in upper
+    top_n = " LIMIT " in upper and any("USE TEMP B-TREE FOR ORDER BY" in d for d in plan_details)
+    if not (filtered or top_n):
+        return []
+    bad = []
+    for detail in plan_details:
+        m = _BARE_SCAN.match(detail.strip())
+        if m and m.group(1) in LARGE_TABLES:
+            bad.append(detail.strip())
+    return bad
+
+
+def main() -> int:
+    fd, db_path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    os.remove(db_path)
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{db_path}"
+    os.environ["ALERT_SCAN_ENABLED"] = "false"
+
+    from fastapi.routing import APIRoute
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+    from app.main import app
+    from app.database import engine, read_engine
+
+    statements: list[tuple[str, tuple, str]] = []
+    current = {"route": ""}
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+            statements.append((statement, tuple(parameters or ()), current["route"]))
+
+    try:
+        with TestClient(app) as client:
+            token = client.post("/api/auth/login", json={"username": "admin", "password": "admin123"}).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            for e in {engine, read_engine}:
+                event.listen(e.sync_engine, "before_cursor_execute", _record)
+
+            for route in app.routes:
+                if not isinstance(route, APIRoute) or "GET" not in route.methods or not route.path.startswith("/api"):
+                    continue
+                paths = [re.sub(r"\{\w+\}", value, route.path) for value in PATH_VALUES.get(route.path, ["1"])]
+                for path in paths:
+                    for params in [{}] + GET_VARIANTS.get(route.path, []):
+                        current["route"] = f"GET {path} {params or ''}"
+                        resp = client.get(path, params=params, headers=headers)
+                        if resp.status_code >= 500:
+                            print(f"[WARN] {current['route']} -> {resp.status_code}")
+
+            last_id = None
+            for method, path, body in WRITES:
+                path = path.replace("{last_expenditure}", str(last_id))
+                current["route"] = f"{method.upper()} {path}"
+                resp = getattr(client, method)(path, json=body, headers=headers) if body else getattr(client, method)(path, headers=headers)
+                if path == "/api/expenditures" and resp.status_code == 200:
+                    last_id = resp.json()["id"]
+            for e in {engine, read_engine}:
+                event.remove(e.sync_engine, "before_cursor_execute", _record)
+
+        failures, errors = {}, {}
+        conn = sqlite3.connect(db_path)
+        for sql, params, route in statements:
+            key = " ".join(sql.split())
+            try:
+                plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+            except sqlite3.Error as e:
+                # A statement the planner cannot explain was not checked: fail on it
+                errors.setdefault(key, (route, str(e)))
+                continue
+            bad = _offending(plan, sql)
+            if bad:
+                failures.setdefault(key, (route, bad))
+        conn.close()
+    finally:
+        if os.path.exists(db_path):
+            os.remove(db_path)
+
+    for sql, (route, bad) in failures.items():
+        print(f"[SCAN] {route}\n       {'; '.join(bad)}\n       {sql[:300]}")
+    for sql, (route, error) in errors.items():
+        print(f"[ERROR] {route}\n       {error}\n       {sql[:300]}")
+    ok = not failures and not errors
+    print(f"[{'OK' if ok else 'FAIL'}] {len(statements) - len(errors)} statements checked, "
+          f"{len(failures)} full table scans, {len(errors)} not explainable")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
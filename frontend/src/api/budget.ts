@@ -50,6 +50,9 @@ export const expenditureApi = {
       headers: { 'Content-Type': 'multipart/form-data' }
     })
   },
+  getImport(id: number) {
+    return api.get(`/expenditures/imports/${id}`)
+  },
   delete(id: number) {
     return api.delete(`/expenditures/${id}`)
   }
@@ -28,4 +28,10 @@ export const settlementApi = {
   warehouseOutboundStats() {
     return api.get('/settlement/warehouse/outbound/stats')
   },
+  searchMaterials(params: any) {
+    return api.get('/settlement/search', { params })
+  },
+  exportData(dataset: 'procurement' | 'warehouse', params?: any) {
+    return api.get(`/export/${dataset}`, { params, responseType: 'blob' })
+  },
 }
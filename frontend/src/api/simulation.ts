@@ -7,6 +7,9 @@ export const simulationApi = {
   sensitivity(data: any) {
     return api.post('/simulation/sensitivity', data)
   },
+  monteCarlo(data: any) {
+    return api.post('/simulation/montecarlo', data)
+  },
   createScenario(data: any) {
     return api.post('/simulation/scenarios', data)
   },
@@ -18,6 +21,15 @@ export const simulationApi = {
   },
   deleteScenario(id: number) {
     return api.delete(`/simulation/scenarios/${id}`)
+  },
+  submitJob(data: any) {
+    return api.post('/simulation/jobs', data)
+  },
+  getJob(id: number) {
+    return api.get(`/simulation/jobs/${id}`)
+  },
+  cancelJob(id: number) {
+    return api.post(`/simulation/jobs/${id}/cancel`)
   }
 }
 